@@ -0,0 +1,439 @@
+# -*- coding: utf-8 -*-
+"""
+Micro-benchmarks du seeder (sans réseau ni BD, sauf `load` qui mesure
+les écritures sur la BD de config.json dans une table jetable).
+
+Usage :
+    python bench.py marc [--records N] [--repeat R] [--snapshot FICHIER]
+    python bench.py rows [--records N]
+    python bench.py json [--records N] [--repeat R]
+    python bench.py consoles [--records N]
+    python bench.py load [--records N]
+
+Les notices sont synthétiques (forme d'une notice Koha réelle : ~40 champs
+dont les exemplaires 952), ou lues depuis un snapshot (--snapshot).
+"""
+
+from __future__ import annotations
+from typing import Any, Callable, Dict, List
+
+import argparse
+import gc
+import json
+import random
+import time
+import tracemalloc
+
+import marc_in_json_helper as marc
+
+
+# ==============================
+# Notices de test
+# ==============================
+
+def _field(tag, **subfields):
+    return {tag: {"ind1": " ", "ind2": " ",
+                  "subfields": [{code: value} for code, value in subfields.items()]}}
+
+
+def synthetic_record(i: int, item_type: str = "JEU") -> Dict[str, Any]:
+    rnd = random.Random(i)
+    fields = [
+        {"001": str(i)},
+        {"003": "CaQMUL"},
+        {"005": "20240102030405.0"},
+        {"008": "240102s2001    xxu           000 0 eng d"},
+        _field("020", a=f"97800000{i:05d}"),
+        _field("040", a="CaQMUL", b="fre", c="CaQMUL"),
+        _field("041", a="eng", b="fre"),
+        _field("082", a="794.8"),
+        _field("110", a=rnd.choice(["Nintendo", "Sega", "Sony", "Capcom"])),
+        _field("245", a=f"Titre {i} /", b="sous-titre", c="Studio"),
+        _field("246", a=f"Autre titre {i}"),
+        _field("250", a="Edition collector"),
+        _field("264", a="Kyoto", b="Nintendo", c="2001"),
+        _field("300", a="1 disque", b="son, coul.", e="1 livret"),
+        _field("336", a="logiciel", b="cop"),
+        _field("337", a="ordinateur", b="c"),
+        _field("338", a="disque", b="cd"),
+        _field("500", a="Note generale."),
+        _field("500", a="Autre note."),
+        _field("520", a="Resume " + "x" * 200),
+        _field("538", **{"a": "Manette requise", "9": "5001, 5002"}),
+        _field("650", a="Jeux video", x="Aventure"),
+        _field("650", a="Jeux video", x="Action"),
+        _field("650", a="Jeux video", z="Japon"),
+        _field("700", a="Miyamoto, Shigeru"),
+        _field("700", a="Tezuka, Takashi"),
+        _field("753", a=rnd.choice(["Nintendo 64", "Wii; Wii U", "Xbox, PlayStation 2"])),
+    ]
+    for copy in range(rnd.randint(1, 6)):
+        fields.append(_field("952", **{"0": "0", "1": "0", "4": "0", "7": "0",
+                                       "a": "LUDOV", "b": "LUDOV", "c": "GEN",
+                                       "d": "2024-01-02", "o": f"JV-{i}-{copy}",
+                                       "p": f"3{i:08d}{copy}", "y": item_type}))
+    fields.append(_field("942", c=item_type, n="0"))
+    fields.append(_field("999", c=str(i), d=str(i)))
+    return {"leader": "01234ngm a2200301 i 4500", "fields": fields}
+
+
+def load_records(args) -> List[Dict[str, Any]]:
+    if args.snapshot:
+        import snapshot
+        records = list(snapshot.SnapshotReader(args.snapshot).records())
+        return records[:args.records] if args.records else records
+    return [synthetic_record(i) for i in range(1, (args.records or 20000) + 1)]
+
+
+# ==============================
+# Mesure
+# ==============================
+
+def measure(fn: Callable[[Any], Any], records: List[Any], repeat: int) -> float:
+    """Meilleur débit (notices/s) sur `repeat` passes."""
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for record in records:
+            fn(record)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return len(records) / best if best else float("inf")
+
+
+def bench_marc(args):
+    """Même plan évalué de trois façons : scan linéaire, index, plan compilé."""
+    records = load_records(args)
+    plans = {
+        "jeu": marc.GAME_PLAN,
+        "accessoire": marc.ACCESSOIRE_PLAN,
+        "console": marc.CONSOLE_PLAN,
+    }
+    strategies = {
+        "scan": lambda plan: plan.interpret,
+        "index": lambda plan: (lambda record: plan.interpret(marc.index_record(record))),
+        "compile": lambda plan: plan,
+    }
+
+    print(f"\n{'='*60}")
+    print(f"BENCH MARC : {len(records)} notices, meilleure de {args.repeat} passes")
+    print(f"{'='*60}")
+    print(f"{'plan':<12}" + "".join(f"{name:>12}" for name in strategies) + "   (notices/s)")
+    for name, plan in plans.items():
+        fns = {label: make(plan) for label, make in strategies.items()}
+        reference = [fns["scan"](r) for r in records[:200]]
+        for label, fn in fns.items():
+            if [fn(r) for r in records[:200]] != reference:
+                raise SystemExit(f"{name}/{label}: resultats differents du scan")
+        rates = [measure(fn, records, args.repeat) for fn in fns.values()]
+        print(f"{name:<12}" + "".join(f"{rate:>12.0f}" for rate in rates))
+
+
+_GAME_DICT_KEYS = ("biblio_id", "titre", "author", "platforms", "required_accessories", "timestamp")
+
+
+def _as_dict(row):
+    """Ancienne forme : un dict par jeu."""
+    return {key: getattr(row, key) for key in _GAME_DICT_KEYS}
+
+
+def _trace(build: Callable[[], List[Any]]):
+    gc.collect()
+    tracemalloc.start()
+    started = time.perf_counter()
+    kept = build()
+    elapsed = time.perf_counter() - started
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return kept, current, peak, elapsed
+
+
+def bench_rows(args):
+    """Mémoire retenue par les jeux extraits : dicts vs rows.GameRow (__slots__)."""
+    count = args.records or 100000
+
+    def records():
+        return (synthetic_record(i) for i in range(1, count + 1))
+
+    variants = {
+        "dict": lambda: [_as_dict(marc.extract_game_row(r)) for r in records()],
+        "GameRow": lambda: [marc.extract_game_row(r) for r in records()],
+    }
+    print(f"\n{'='*60}")
+    print(f"BENCH ROWS : {count} jeux synthetiques (tracemalloc)")
+    print(f"{'='*60}")
+    for name, build in variants.items():
+        kept, current, peak, elapsed = _trace(build)
+        print(f"{name:<10}: retenu {current / 1024 / 1024:7.1f} Mo ({current / len(kept):5.0f} o/jeu), "
+              f"pic {peak / 1024 / 1024:7.1f} Mo, {elapsed:5.1f} s")
+        del kept
+
+
+def bench_json(args):
+    """Décodage d'une page MARC-in-JSON par backend (json en flux, orjson, msgspec typé)."""
+    import json_stream
+
+    count = args.records or 1000
+    page = json.dumps([synthetic_record(i) for i in range(1, count + 1)]).encode("utf-8")
+    chunks = [page[i:i + json_stream.CHUNK_SIZE] for i in range(0, len(page), json_stream.CHUNK_SIZE)]
+
+    print(f"\n{'='*60}")
+    print(f"BENCH JSON : page de {count} notices ({len(page) / 1024 / 1024:.1f} Mo), "
+          f"meilleure de {args.repeat} passes")
+    print(f"{'='*60}")
+    reference = None
+    for backend in json_stream.BACKENDS:
+        if json_stream.set_backend(backend) != backend:
+            print(f"{backend:<8}: non installe")
+            continue
+        if backend == "json":
+            decode = lambda: list(json_stream.iter_json_records(chunks))
+        else:
+            decode = lambda: json_stream.decode_records(page, marc=True)
+        records = decode()
+        if reference is None:
+            reference = records
+        elif records != reference:
+            raise SystemExit(f"{backend}: resultats differents")
+        best = min(_timed(decode) for _ in range(args.repeat))
+        print(f"{backend:<8}: {best * 1000:8.1f} ms  ({count / best:>9.0f} notices/s)")
+
+
+class _CountingCursor:
+    """Curseur MySQL simulé (console_type / console_stock) qui compte les allers-retours."""
+
+    def __init__(self, conn, dictionary=False):
+        self.conn = conn
+        self.dictionary = dictionary
+        self.rows = []
+        self.rowcount = 0
+        self.lastrowid = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        pass
+
+    def execute(self, sql, params=()):
+        self.conn.round_trips += 1
+        self._run(" ".join(sql.split()), list(params))
+
+    def executemany(self, sql, seq):
+        seq = list(seq)
+        sql = " ".join(sql.split())
+        # mysql.connector réécrit un INSERT ... VALUES en un seul INSERT multi-lignes
+        self.conn.round_trips += 1 if sql.startswith("INSERT INTO") else len(seq)
+        for params in seq:
+            self._run(sql, list(params))
+
+    def _run(self, sql, params):
+        types, stock = self.conn.types, self.conn.stock
+        sql = sql.replace("`", "")
+        self.rows = []
+        if sql.startswith("SELECT 1 FROM console_stock"):
+            self.rows = [(1,)] if stock else []
+        elif sql.startswith("SHOW WARNINGS"):
+            self.rows = []
+        elif sql.startswith("LOAD DATA LOCAL INFILE") and "INTO TABLE console_stock " in sql:
+            # TSV de db.load_rows : (id, console_type_id, biblio_id, name, lastUpdatedAt)
+            with open(params[0], encoding="utf-8") as f:
+                for line in f:
+                    values = [None if v == "\\N" else v for v in line.rstrip("\n").split("\t")]
+                    stock[int(values[0])] = [int(values[0]), int(values[1]), int(values[2])] + values[3:]
+        elif sql.startswith("SELECT id, name FROM console_type"):
+            self.rows = [{"id": i, "name": n} if self.dictionary else (i, n) for n, i in types.items()]
+        elif sql.startswith("SELECT id FROM console_type WHERE name"):
+            found = types.get(params[0])
+            self.rows = [] if found is None else [{"id": found} if self.dictionary else (found,)]
+        elif sql.startswith("INSERT") and "INTO console_type (" in sql:
+            for name in params:
+                if name not in types:
+                    types[name] = self.lastrowid = len(types) + 1
+        elif sql.startswith("SELECT id FROM console_stock"):
+            self.rows = [(i,) for i in params if i in stock]
+        elif sql.startswith("INSERT INTO console_stock") or sql.startswith("INSERT INTO `console_stock`"):
+            # (id, console_type_id, biblio_id, name, lastUpdatedAt) par ligne, éventuellement multi-lignes
+            for i in range(0, len(params), 5):
+                self.rowcount = 2 if params[i] in stock else 1
+                stock[params[i]] = params[i:i + 5]
+
+    def fetchone(self):
+        return self.rows[0] if self.rows else None
+
+    def fetchall(self):
+        return self.rows
+
+
+class _CountingConnection:
+    def __init__(self):
+        self.types: Dict[str, int] = {}
+        self.stock: Dict[int, Any] = {}
+        self.round_trips = 0
+
+    def cursor(self, dictionary=False):
+        return _CountingCursor(self, dictionary)
+
+    def commit(self):
+        self.round_trips += 1
+
+    def rollback(self):
+        self.round_trips += 1
+
+
+def _insert_console_per_row(conn, consoles):
+    """Ancienne boucle de db.insert_console : un SELECT type, un INSERT type et un upsert par console."""
+    cursor = conn.cursor(dictionary=True)
+    try:
+        for console in consoles:
+            name = (console.title or "").strip()
+            if console.subtitle:
+                name += " " + console.subtitle.strip()
+            if not console.biblio_id or not name:
+                continue
+            cursor.execute("SELECT id FROM console_type WHERE name = %s", (name,))
+            result = cursor.fetchone()
+            if result:
+                console_type_id = result["id"]
+            else:
+                cursor.execute("INSERT INTO console_type (name) VALUES (%s)", (name,))
+                console_type_id = cursor.lastrowid
+            cursor.execute("""
+                INSERT INTO console_stock
+                    (id, console_type_id, biblio_id, name, is_active, createdAt, lastUpdatedAt)
+                VALUES
+                    (%s, %s, %s, %s, 1, NOW(), %s)
+                ON DUPLICATE KEY UPDATE
+                    console_type_id = VALUES(console_type_id),
+                    biblio_id = VALUES(biblio_id),
+                    name = VALUES(name),
+                    lastUpdatedAt = VALUES(lastUpdatedAt)
+            """, (console.biblio_id, console_type_id, console.biblio_id, name, console.timestamp))
+        conn.commit()
+    finally:
+        cursor.close()
+
+
+def bench_consoles(args):
+    """Allers-retours MySQL par console pour db.insert_console (BD simulée)."""
+    import contextlib
+    import io
+    import db
+    from rows import ConsoleRow
+
+    count = args.records or 2000
+    models = ["Nintendo 64", "Wii", "Wii U", "PlayStation 2", "Xbox", "Mega Drive", "Game Boy"]
+    consoles = [ConsoleRow(i, models[i % len(models)], f"rev {i % 40}", "2024-01-02 03:04:05")
+                for i in range(1, count + 1)]
+
+    print(f"\n{'='*60}")
+    print(f"BENCH CONSOLES : {count} consoles, {len({(c.title, c.subtitle) for c in consoles})} types")
+    print(f"{'='*60}")
+    load_data = db.DB_LOAD_DATA
+    variants = (("par console", _insert_console_per_row, False),
+                ("upsert", db.insert_console, False),
+                ("LOAD DATA", db.insert_console, True))
+    try:
+        for variant, insert, use_load_data in variants:
+            db.DB_LOAD_DATA = use_load_data
+            conn = _CountingConnection()
+            for label in ("BD vide", "reseed"):
+                conn.round_trips = 0
+                started = time.perf_counter()
+                with contextlib.redirect_stdout(io.StringIO()):
+                    insert(conn, consoles)
+                elapsed = time.perf_counter() - started
+                if len(conn.stock) != count:
+                    raise SystemExit(f"{variant}: {len(conn.stock)} exemplaires en base au lieu de {count}")
+                print(f"{variant:<12} {label:<8}: {conn.round_trips:6d} allers-retours "
+                      f"({conn.round_trips / count:.3f} par console), {elapsed * 1000:7.1f} ms hors reseau")
+    finally:
+        db.DB_LOAD_DATA = load_data
+
+
+def bench_load(args):
+    """Chargement d'une table jeux vide : upsert_rows vs load_rows, sur la BD de config.json."""
+    import contextlib
+    import hashlib
+    import io
+    import db
+
+    count = args.records or 50000
+    rows = []
+    for i in range(1, count + 1):
+        values = (i, f"Jeu {i} : edition {i % 7}", f"Studio {i % 300}", "Wii", 5, None, None,
+                  json.dumps([i % 50, i % 13]))
+        rows.append(values + (hashlib.md5(repr(values).encode()).hexdigest(), "2024-01-02 03:04:05"))
+
+    try:
+        conn = db.create_connection()
+    except ConnectionError as e:
+        raise SystemExit(f"bench load : BD de config.json injoignable ({e})")
+    db.use_database(conn)
+    scratch = "bench_games"
+    load_data = db.DB_LOAD_DATA
+    db.DB_LOAD_DATA = True
+    print(f"\n{'='*60}")
+    print(f"BENCH CHARGEMENT : {count} jeux dans une table vide ({scratch})")
+    print(f"{'='*60}")
+    try:
+        with conn.cursor() as cur:
+            cur.execute(f"DROP TABLE IF EXISTS `{scratch}`")
+            cur.execute(f"CREATE TABLE `{scratch}` LIKE `games`")
+        for label, write in (
+                ("upsert_rows", lambda: db.upsert_rows(conn, scratch, db.GAME_COLUMNS, rows, db.GAME_UPDATE)),
+                ("load_rows", lambda: db.load_rows(conn, scratch, db.GAME_COLUMNS, rows))):
+            with conn.cursor() as cur:
+                cur.execute(f"TRUNCATE TABLE `{scratch}`")
+            started = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                done = write()
+            elapsed = time.perf_counter() - started
+            if done is False:
+                print(f"{label:<12}: indisponible (local_infile refuse ou avertissements)")
+                continue
+            print(f"{label:<12}: {elapsed:7.2f} s  ({count / elapsed:>9.0f} lignes/s)")
+    finally:
+        db.DB_LOAD_DATA = load_data
+        with conn.cursor() as cur:
+            cur.execute(f"DROP TABLE IF EXISTS `{scratch}`")
+        conn.close()
+
+
+def _timed(fn):
+    started = time.perf_counter()
+    fn()
+    return time.perf_counter() - started
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Micro-benchmarks LUDOV Seeder")
+    sub = parser.add_subparsers(dest="bench", required=True)
+    p = sub.add_parser("marc", help="Extraction MARC : scan lineaire, index, plan compile")
+    p.add_argument("--records", type=int, default=0, help="Nombre de notices (defaut 20000)")
+    p.add_argument("--repeat", type=int, default=3)
+    p.add_argument("--snapshot", metavar="FICHIER", help="Notices lues depuis un snapshot")
+    p.set_defaults(func=bench_marc)
+    p = sub.add_parser("rows", help="Memoire par ligne : dict vs __slots__")
+    p.add_argument("--records", type=int, default=0, help="Nombre de notices (defaut 100000)")
+    p.set_defaults(func=bench_rows)
+    p = sub.add_parser("json", help="Decodage d'une page : json / orjson / msgspec")
+    p.add_argument("--records", type=int, default=0, help="Notices par page (defaut 1000)")
+    p.add_argument("--repeat", type=int, default=5)
+    p.set_defaults(func=bench_json)
+    p = sub.add_parser("consoles", help="Allers-retours MySQL de db.insert_console")
+    p.add_argument("--records", type=int, default=0, help="Nombre de consoles (defaut 2000)")
+    p.set_defaults(func=bench_consoles)
+    p = sub.add_parser("load", help="Table vide : upsert multi-lignes vs LOAD DATA (BD reelle)")
+    p.add_argument("--records", type=int, default=0, help="Nombre de jeux (defaut 50000)")
+    p.set_defaults(func=bench_load)
+
+    args = parser.parse_args(argv)
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+"""
+Checkpoints durables pour reprendre un seed interrompu (--resume).
+
+Le fichier JSON (écrit atomiquement) contient :
+- mode   : type de run ("seed" ou "covers")
+- done   : étapes terminées (ex: "wipe", "mapping", "ingest_CONSOLE", "CONSOLE", ...)
+- cursors: curseur par étape (ex: {"ingest_JEU": {"page": 7}, "covers": {"last_id": 812}})
+
+Les pages du catalogue déjà téléchargées sont conservées dans un dossier
+« spool » à côté du fichier : à la reprise, elles sont rejouées depuis le
+disque et le téléchargement continue à la page suivante.
+"""
+
+from __future__ import annotations
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import gzip
+import json
+import os
+import shutil
+
+DEFAULT_CHECKPOINT_PATH = "seed_checkpoint.json"
+
+
+def _atomic_write(path: str, data: bytes):
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+class Checkpoint:
+    def __init__(self, path: str = DEFAULT_CHECKPOINT_PATH):
+        self.path = path
+        self.spool_dir = path + ".d"
+        self.state: Dict[str, Any] = {}
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                self.state = json.load(f)
+
+    # ---------- cycle de vie ----------
+
+    def exists(self) -> bool:
+        return bool(self.state)
+
+    @property
+    def mode(self) -> Optional[str]:
+        return self.state.get("mode")
+
+    def start(self, mode: str):
+        """Démarre un nouveau run (écrase tout checkpoint précédent)."""
+        self.clear()
+        self.state = {
+            "mode": mode,
+            "started_at": datetime.now(timezone.utc).isoformat(),
+            "done": [],
+            "cursors": {},
+        }
+        self.save()
+
+    def save(self):
+        self.state["updated_at"] = datetime.now(timezone.utc).isoformat()
+        _atomic_write(self.path, json.dumps(self.state, indent=2).encode("utf-8"))
+
+    def clear(self):
+        """Run terminé : supprime le checkpoint et le spool."""
+        self.state = {}
+        if os.path.exists(self.path):
+            os.remove(self.path)
+        shutil.rmtree(self.spool_dir, ignore_errors=True)
+
+    # ---------- étapes / curseurs ----------
+
+    def is_done(self, stage: str) -> bool:
+        return stage in self.state.get("done", [])
+
+    def mark_done(self, stage: str):
+        if not self.state or self.is_done(stage):
+            return
+        self.state["done"].append(stage)
+        self.save()
+
+    def cursor(self, stage: str) -> Dict[str, Any]:
+        return dict(self.state.get("cursors", {}).get(stage) or {})
+
+    def set_cursor(self, stage: str, **cursor):
+        if not self.state:
+            return
+        self.state["cursors"][stage] = cursor
+        self.save()
+
+    # ---------- données conservées ----------
+
+    def _spool_path(self, name: str) -> str:
+        os.makedirs(self.spool_dir, exist_ok=True)
+        return os.path.join(self.spool_dir, name)
+
+    def save_json(self, name: str, data: Any):
+        _atomic_write(self._spool_path(name + ".json.gz"),
+                      gzip.compress(json.dumps(data).encode("utf-8")))
+
+    def load_json(self, name: str) -> Optional[Any]:
+        path = os.path.join(self.spool_dir, name + ".json.gz")
+        if not os.path.exists(path):
+            return None
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            return json.load(f)
+
+    def spool_page(self, stage: str, page: int, records: List[Dict[str, Any]], **cursor):
+        """Conserve une page téléchargée puis avance le curseur de l'étape."""
+        self.save_json(f"{stage}_page_{page:06d}", records)
+        self.set_cursor(stage, page=page, **cursor)
+
+    def spooled_pages(self, stage: str) -> Iterator[Tuple[int, List[Dict[str, Any]]]]:
+        """Rejoue, dans l'ordre, les pages conservées jusqu'au curseur de l'étape."""
+        last = self.cursor(stage).get("page", 0)
+        for page in range(1, last + 1):
+            records = self.load_json(f"{stage}_page_{page:06d}")
+            if records is None:
+                raise RuntimeError(f"Checkpoint incoherent: page {page} absente du spool")
+            yield page, records
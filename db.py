@@ -1,14 +1,23 @@
+import hashlib
 import json
+import os
+import tempfile
+import threading
+import time
 import mysql.connector
+import mysql.connector.pooling
+from contextlib import contextmanager
 from mysql.connector import Error
-from typing import Any, Dict
+from typing import Any, Dict, List, Sequence
 
 FILE_PATH = "config.json"
 REQUIRED_KEYS = ["DB_HOST", "DB_PORT", "DB_USER", "DB_PASSWORD", "DB_NAME"]
-SQL_SCHEMA = r"""
-SET NAMES utf8mb4;
-SET FOREIGN_KEY_CHECKS=0;
-
+# Schéma courant complet, une instruction par élément, dans l'ordre des clés
+# étrangères : sur une base neuve chaque table est créée une seule fois, clés,
+# index et contraintes compris. Toute modification ici doit aussi être ajoutée
+# à MIGRATIONS pour les bases existantes.
+SCHEMA = [
+"""
 CREATE TABLE IF NOT EXISTS `users` (
   `id` INT AUTO_INCREMENT NOT NULL UNIQUE,
   `firstname` VARCHAR(50) NOT NULL,
@@ -20,16 +29,18 @@ CREATE TABLE IF NOT EXISTS `users` (
   `createdAt` DATETIME NOT NULL,
   `lastLogin` DATETIME DEFAULT NULL,
   PRIMARY KEY (`id`)
-) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
-
-CREATE TABLE IF NOT EXISTS `console_type` ( 
-    `id` INT AUTO_INCREMENT NOT NULL UNIQUE,
-    `name` VARCHAR(255) NOT NULL UNIQUE,
-    `picture` LONGTEXT,
-    `description` TEXT,
-    PRIMARY KEY (`id`)
-) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
-
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+""",
+"""
+CREATE TABLE IF NOT EXISTS `console_type` (
+  `id` INT AUTO_INCREMENT NOT NULL UNIQUE,
+  `name` VARCHAR(255) NOT NULL UNIQUE,
+  `picture` LONGTEXT,
+  `description` TEXT,
+  PRIMARY KEY (`id`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+""",
+"""
 CREATE TABLE IF NOT EXISTS `console_stock` (
   `id` INT AUTO_INCREMENT NOT NULL UNIQUE,
   `console_type_id` INT NOT NULL,
@@ -40,13 +51,15 @@ CREATE TABLE IF NOT EXISTS `console_stock` (
   `holding` TINYINT NOT NULL DEFAULT 0,
   `createdAt` DATETIME NOT NULL DEFAULT NOW(),
   `lastUpdatedAt` DATETIME NOT NULL DEFAULT NOW() ON UPDATE NOW(),
-    PRIMARY KEY (`id`),
-    FOREIGN KEY (`console_type_id`) REFERENCES `console_type`(`id`) 
-        ON UPDATE CASCADE ON DELETE RESTRICT,
-    INDEX `idx_console_type` (`console_type_id`),
-    INDEX `idx_active` (`is_active`)
-) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
-
+  PRIMARY KEY (`id`),
+  INDEX `idx_console_type` (`console_type_id`),
+  INDEX `idx_active` (`is_active`),
+  INDEX `ix_stock_biblio` (`biblio_id`),
+  FOREIGN KEY (`console_type_id`) REFERENCES `console_type`(`id`)
+    ON UPDATE CASCADE ON DELETE RESTRICT
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+""",
+"""
 CREATE TABLE IF NOT EXISTS `games` (
   `id` INT AUTO_INCREMENT NOT NULL UNIQUE,
   `titre` TEXT NOT NULL,
@@ -59,11 +72,19 @@ CREATE TABLE IF NOT EXISTS `games` (
   `picture` LONGTEXT,
   `holding` TINYINT NOT NULL DEFAULT 0,
   `required_accessories` JSON DEFAULT NULL,
+  `source_hash` CHAR(32) DEFAULT NULL,
+  `is_active` TINYINT NOT NULL DEFAULT 1,
   `createdAt` DATETIME NOT NULL,
   `lastUpdatedAt` DATETIME DEFAULT NOW(),
-  PRIMARY KEY (`id`)
-) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
-
+  PRIMARY KEY (`id`),
+  UNIQUE KEY `uq_games_biblio` (`biblio_id`),
+  INDEX `ix_games_console_type` (`console_type_id`),
+  CONSTRAINT `games_fk_console_type`
+    FOREIGN KEY (`console_type_id`) REFERENCES `console_type`(`id`)
+    ON UPDATE CASCADE ON DELETE SET NULL
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+""",
+"""
 CREATE TABLE IF NOT EXISTS `stations` (
   `id` INT AUTO_INCREMENT NOT NULL UNIQUE,
   `name` VARCHAR(255) NULL,
@@ -72,13 +93,15 @@ CREATE TABLE IF NOT EXISTS `stations` (
   `lastUpdatedAt` DATETIME NOT NULL,
   `createdAt` DATETIME NOT NULL,
   PRIMARY KEY (`id`)
-) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
-
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+""",
+"""
 CREATE TABLE IF NOT EXISTS `policies` (
   `policies` LONGTEXT,
   `lastUpdatedAt` DATETIME NOT NULL
-) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
-
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+""",
+"""
 CREATE TABLE IF NOT EXISTS `reservation` (
   `id` VARCHAR(255) NOT NULL UNIQUE,
   `console_id` INT NOT NULL,
@@ -107,20 +130,35 @@ CREATE TABLE IF NOT EXISTS `reservation` (
   KEY `ix_res_game2` (`game2_id`),
   KEY `ix_res_game3` (`game3_id`),
   KEY `ix_res_cours` (`cours_id`),
-  KEY `ix_res_station` (`station`)
-) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
-
+  KEY `ix_res_station` (`station`),
+  KEY `idx_reminder_pending` (`reminder_enabled`, `reminder_sent`, `date`, `time`),
+  CONSTRAINT `reservation_fk1` FOREIGN KEY (`user_id`) REFERENCES `users`(`id`)
+    ON UPDATE CASCADE ON DELETE RESTRICT,
+  CONSTRAINT `reservation_fk3` FOREIGN KEY (`console_id`) REFERENCES `console_stock`(`id`)
+    ON UPDATE CASCADE ON DELETE RESTRICT,
+  CONSTRAINT `reservation_fk4` FOREIGN KEY (`game1_id`) REFERENCES `games`(`id`)
+    ON UPDATE CASCADE ON DELETE RESTRICT,
+  CONSTRAINT `reservation_fk5` FOREIGN KEY (`game2_id`) REFERENCES `games`(`id`)
+    ON UPDATE CASCADE ON DELETE RESTRICT,
+  CONSTRAINT `reservation_fk6` FOREIGN KEY (`game3_id`) REFERENCES `games`(`id`)
+    ON UPDATE CASCADE ON DELETE RESTRICT
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+""",
+"""
 CREATE TABLE IF NOT EXISTS `accessoires` (
   `id` INT AUTO_INCREMENT UNIQUE NOT NULL,
   `name` TEXT NOT NULL,
   `consoles` JSON NOT NULL,
   `koha_id` INT NOT NULL,
   `hidden` TINYINT NOT NULL DEFAULT 0,
+  `source_hash` CHAR(32) DEFAULT NULL,
   `lastUpdatedAt` DATETIME NOT NULL,
   `createdAt` DATETIME NOT NULL,
-  PRIMARY KEY (`id`)
-) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
-
+  PRIMARY KEY (`id`),
+  UNIQUE KEY `uq_accessoires_koha` (`koha_id`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+""",
+"""
 CREATE TABLE IF NOT EXISTS `reservation_hold` (
   `id` VARCHAR(255) NOT NULL UNIQUE,
   `user_id` INT NOT NULL,
@@ -142,9 +180,25 @@ CREATE TABLE IF NOT EXISTS `reservation_hold` (
   KEY `ix_hold_game1` (`game1_id`),
   KEY `ix_hold_game2` (`game2_id`),
   KEY `ix_hold_game3` (`game3_id`),
-  KEY `ix_hold_station` (`station_id`)
-) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
-
+  KEY `ix_hold_station` (`station_id`),
+  CONSTRAINT `reservation_hold_fk1` FOREIGN KEY (`user_id`) REFERENCES `users`(`id`)
+    ON UPDATE CASCADE ON DELETE RESTRICT,
+  CONSTRAINT `reservation_hold_fk2` FOREIGN KEY (`console_id`) REFERENCES `console_stock`(`id`)
+    ON UPDATE CASCADE ON DELETE RESTRICT,
+  CONSTRAINT `reservation_hold_fk3` FOREIGN KEY (`game1_id`) REFERENCES `games`(`id`)
+    ON UPDATE CASCADE ON DELETE SET NULL,
+  CONSTRAINT `reservation_hold_fk4` FOREIGN KEY (`game2_id`) REFERENCES `games`(`id`)
+    ON UPDATE CASCADE ON DELETE SET NULL,
+  CONSTRAINT `reservation_hold_fk5` FOREIGN KEY (`game3_id`) REFERENCES `games`(`id`)
+    ON UPDATE CASCADE ON DELETE SET NULL,
+  CONSTRAINT `reservation_hold_fk6` FOREIGN KEY (`station_id`) REFERENCES `stations`(`id`)
+    ON UPDATE CASCADE ON DELETE SET NULL,
+  CONSTRAINT `reservation_hold_console_type_id_fk`
+    FOREIGN KEY (`console_type_id`) REFERENCES `console_type`(`id`)
+    ON UPDATE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+""",
+"""
 CREATE TABLE IF NOT EXISTS `otp` (
   `id` INT AUTO_INCREMENT PRIMARY KEY,
   `user_id` INT NOT NULL,
@@ -153,43 +207,48 @@ CREATE TABLE IF NOT EXISTS `otp` (
   `expires_at` DATETIME NOT NULL,
   `is_used` BOOLEAN NOT NULL DEFAULT FALSE,
   FOREIGN KEY (`user_id`) REFERENCES users(`id`)
-);
-
+)
+""",
+"""
 CREATE TABLE IF NOT EXISTS `cours` (
   `id` INT AUTO_INCREMENT PRIMARY KEY,
   `code_cours` VARCHAR(7) NOT NULL,
   `nom_cours` VARCHAR(255) NOT NULL
-);
-
-CREATE TABLE `weekly_availabilities` (
-    `weekly_id` INT AUTO_INCREMENT PRIMARY KEY,
-    `start_date` DATE NULL,
-    `end_date` DATE NULL,
-    `day_of_week` VARCHAR(10) NOT NULL,
-    `enabled` BOOLEAN NOT NULL,
-    `always_available` TINYINT(1) NOT NULL DEFAULT 0
-);
-
-CREATE TABLE `specific_dates` (
-    `id` INT AUTO_INCREMENT PRIMARY KEY,
-    `date` DATE NOT NULL,
-    `start_hour` VARCHAR(2) NOT NULL,
-    `start_minute` VARCHAR(2) NOT NULL,
-    `end_hour` VARCHAR(2) NOT NULL,
-    `end_minute` VARCHAR(2) NOT NULL,
-    `is_exception` BOOLEAN NOT NULL
-);
-
-CREATE TABLE `hour_ranges` (
-    `range_id` INT AUTO_INCREMENT PRIMARY KEY,
-    `weekly_id` INT NOT NULL,
-    `start_hour` VARCHAR(2) NOT NULL,
-    `start_minute` VARCHAR(2) NOT NULL,
-    `end_hour` VARCHAR(2) NOT NULL,
-    `end_minute` VARCHAR(2) NOT NULL,
-    FOREIGN KEY (`weekly_id`) REFERENCES `weekly_availabilities`(`weekly_id`) ON DELETE CASCADE
-);
-
+)
+""",
+"""
+CREATE TABLE IF NOT EXISTS `weekly_availabilities` (
+  `weekly_id` INT AUTO_INCREMENT PRIMARY KEY,
+  `start_date` DATE NULL,
+  `end_date` DATE NULL,
+  `day_of_week` VARCHAR(10) NOT NULL,
+  `enabled` BOOLEAN NOT NULL,
+  `always_available` TINYINT(1) NOT NULL DEFAULT 0
+)
+""",
+"""
+CREATE TABLE IF NOT EXISTS `specific_dates` (
+  `id` INT AUTO_INCREMENT PRIMARY KEY,
+  `date` DATE NOT NULL,
+  `start_hour` VARCHAR(2) NOT NULL,
+  `start_minute` VARCHAR(2) NOT NULL,
+  `end_hour` VARCHAR(2) NOT NULL,
+  `end_minute` VARCHAR(2) NOT NULL,
+  `is_exception` BOOLEAN NOT NULL
+)
+""",
+"""
+CREATE TABLE IF NOT EXISTS `hour_ranges` (
+  `range_id` INT AUTO_INCREMENT PRIMARY KEY,
+  `weekly_id` INT NOT NULL,
+  `start_hour` VARCHAR(2) NOT NULL,
+  `start_minute` VARCHAR(2) NOT NULL,
+  `end_hour` VARCHAR(2) NOT NULL,
+  `end_minute` VARCHAR(2) NOT NULL,
+  FOREIGN KEY (`weekly_id`) REFERENCES `weekly_availabilities`(`weekly_id`) ON DELETE CASCADE
+)
+""",
+"""
 CREATE TABLE IF NOT EXISTS `email_logs` (
   `id` INT AUTO_INCREMENT PRIMARY KEY,
   `reservation_id` VARCHAR(255) NOT NULL,
@@ -201,107 +260,35 @@ CREATE TABLE IF NOT EXISTS `email_logs` (
   KEY idx_reservation (reservation_id),
   KEY idx_status (status),
   KEY idx_created (created_at)
-) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
-
--- ============
--- FOREIGN KEYS
--- ============
-
--- reservation.user_id -> users.id
-ALTER TABLE `reservation`
-  ADD CONSTRAINT `reservation_fk1`
-  FOREIGN KEY (`user_id`) REFERENCES `users`(`id`)
-  ON UPDATE CASCADE ON DELETE RESTRICT;
-
--- reservation.console_id -> console_stock.id
-ALTER TABLE `reservation`
-  ADD CONSTRAINT `reservation_fk3`
-  FOREIGN KEY (`console_id`) REFERENCES `console_stock`(`id`)
-  ON UPDATE CASCADE ON DELETE RESTRICT;
-
--- reservation.game1_id -> games.id
-ALTER TABLE `reservation`
-    ADD CONSTRAINT `reservation_fk4`
-    FOREIGN KEY (`game1_id`) REFERENCES `games`(`id`)
-    ON UPDATE CASCADE ON DELETE RESTRICT;
-
--- reservation.game2_id -> games.id
-ALTER TABLE `reservation`
-    ADD CONSTRAINT `reservation_fk5`
-    FOREIGN KEY (`game2_id`) REFERENCES `games`(`id`)
-    ON UPDATE CASCADE ON DELETE RESTRICT;
-
--- reservation.game3_id -> games.id
-ALTER TABLE `reservation`
-    ADD CONSTRAINT `reservation_fk6`
-    FOREIGN KEY (`game3_id`) REFERENCES `games`(`id`)
-    ON UPDATE CASCADE ON DELETE RESTRICT;
-
--- reservation_hold.user_id -> users.id
-ALTER TABLE `reservation_hold`
-  ADD CONSTRAINT `reservation_hold_fk1`
-  FOREIGN KEY (`user_id`) REFERENCES `users`(`id`)
-  ON UPDATE CASCADE ON DELETE RESTRICT;
-
--- reservation_hold.console_id -> console_stock.id (CORRIGÉ)
-ALTER TABLE `reservation_hold`
-  ADD CONSTRAINT `reservation_hold_fk2`
-  FOREIGN KEY (`console_id`) REFERENCES `console_stock`(`id`)
-  ON UPDATE CASCADE ON DELETE RESTRICT;
-
--- reservation_hold.game1_id -> games.id
-ALTER TABLE `reservation_hold`
-  ADD CONSTRAINT `reservation_hold_fk3`
-  FOREIGN KEY (`game1_id`) REFERENCES `games`(`id`)
-  ON UPDATE CASCADE ON DELETE SET NULL;
-
--- reservation_hold.game2_id -> games.id
-ALTER TABLE `reservation_hold`
-  ADD CONSTRAINT `reservation_hold_fk4`
-  FOREIGN KEY (`game2_id`) REFERENCES `games`(`id`)
-  ON UPDATE CASCADE ON DELETE SET NULL;
-
--- reservation_hold.game3_id -> games.id
-ALTER TABLE `reservation_hold`
-  ADD CONSTRAINT `reservation_hold_fk5`
-  FOREIGN KEY (`game3_id`) REFERENCES `games`(`id`)
-  ON UPDATE CASCADE ON DELETE SET NULL;
-
--- reservation_hold.station_id -> stations.id
-ALTER TABLE `reservation_hold`
-  ADD CONSTRAINT `reservation_hold_fk6`
-  FOREIGN KEY (`station_id`) REFERENCES `stations`(`id`)
-  ON UPDATE CASCADE ON DELETE SET NULL;
-
-ALTER TABLE `games`
-  ADD CONSTRAINT `games_fk_console_type`
-  FOREIGN KEY (`console_type_id`) REFERENCES `console_type`(`id`)
-  ON UPDATE CASCADE ON DELETE SET NULL;
-
-ALTER TABLE `reservation_hold`
-    ADD CONSTRAINT `reservation_hold_console_type_id_fk`
-    FOREIGN KEY (`console_type_id`) REFERENCES `console_type`(`id`)
-    ON UPDATE CASCADE;
-
-ALTER TABLE games
-  ADD UNIQUE KEY uq_games_biblio (biblio_id),
-  ADD INDEX ix_games_console_type (console_type_id);
-
-CREATE INDEX ix_stock_biblio ON console_stock(biblio_id);
-
-ALTER TABLE `accessoires`
-  ADD UNIQUE KEY `uq_accessoires_koha` (`koha_id`);
-
-CREATE INDEX idx_reminder_pending
-  ON reservation(reminder_enabled, reminder_sent, date, time);
-
--- ============
--- VIEWS
--- ============
-
--- Vue pour afficher les consoles disponibles par type
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+""",
+# État persistant du seeder (high-water mark, run shardé en cours, ...)
+"""
+CREATE TABLE IF NOT EXISTS `seeder_state` (
+  `name` VARCHAR(64) NOT NULL,
+  `value` TEXT,
+  `updatedAt` DATETIME NOT NULL DEFAULT NOW() ON UPDATE NOW(),
+  PRIMARY KEY (`name`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+""",
+"""
+CREATE TABLE IF NOT EXISTS `seed_shards` (
+  `run_id` VARCHAR(64) NOT NULL,
+  `shard_no` INT NOT NULL,
+  `lo` INT NOT NULL,
+  `hi` INT NOT NULL,
+  `status` ENUM('pending', 'running', 'done') NOT NULL DEFAULT 'pending',
+  `owner` VARCHAR(255) DEFAULT NULL,
+  `records` INT DEFAULT NULL,
+  `updatedAt` DATETIME NOT NULL DEFAULT NOW() ON UPDATE NOW(),
+  PRIMARY KEY (`run_id`, `shard_no`),
+  KEY `ix_shards_status` (`run_id`, `status`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+""",
+# Vue pour afficher les consoles disponibles par type
+"""
 CREATE OR REPLACE VIEW `console_catalog` AS
-SELECT 
+SELECT
     ct.id as console_type_id,
     ct.name,
     ct.picture,
@@ -310,7 +297,7 @@ SELECT
     SUM(CASE WHEN cs.is_active = 1 AND cs.holding = 0 THEN 1 ELSE 0 END) as active_units,
     SUM(CASE WHEN cs.is_active = 0 THEN 1 ELSE 0 END) as inactive_units
 FROM console_type ct
-LEFT JOIN console_stock cs 
+LEFT JOIN console_stock cs
     ON ct.id = cs.console_type_id
 WHERE EXISTS (
     SELECT 1
@@ -321,13 +308,12 @@ WHERE EXISTS (
         '$'
     )
 )
-GROUP BY 
+GROUP BY
     ct.id, ct.name
-ORDER BY 
-    ct.name;
-
-SET FOREIGN_KEY_CHECKS=1;
-"""
+ORDER BY
+    ct.name
+""",
+]
 
 SYSTEM_SCHEMAS = {"mysql", "information_schema", "performance_schema", "sys"}
 
@@ -341,25 +327,173 @@ def get_config(path: str = FILE_PATH) -> Dict[str, Any]:
     return data
 
 CONFIG = get_config()
+# Tables vides (reseed) : LOAD DATA LOCAL INFILE plutôt que des upserts (repli automatique si refusé)
+DB_LOAD_DATA = bool(CONFIG.get("DB_LOAD_DATA", True))
+# Seul dossier que le client accepte d'envoyer au serveur (allow_local_infile_in_path) :
+# un serveur malveillant ne peut pas réclamer d'autre fichier local
+LOAD_DATA_DIR = os.path.join(tempfile.gettempdir(), "ludov_seeder_load_data")
+
+# Pool de connexions (étapes concurrentes) : taille, attente max d'une connexion libre,
+# et variables de session appliquées à chaque connexion, celle de create_connection()
+# comprise : elle écrit aussi (upserts en série, shards, covers) à côté des connexions
+# du pool et des autres workers (READ COMMITTED : moins de verrous de plage entre
+# écrivains concurrents sur games & cie)
+DB_POOL_SIZE = int(CONFIG.get("DB_POOL_SIZE") or 4)
+DB_POOL_TIMEOUT = float(CONFIG.get("DB_POOL_TIMEOUT") or 60)
+DB_SESSION = CONFIG.get("DB_SESSION") or {
+    "transaction_isolation": "READ-COMMITTED",
+    "innodb_lock_wait_timeout": 30,
+}
+
+def _connect_args():
+    args = dict(
+        host=CONFIG["DB_HOST"],
+        port=CONFIG["DB_PORT"],
+        user=CONFIG["DB_USER"],
+        password=CONFIG["DB_PASSWORD"],
+        database=CONFIG["DB_NAME"],
+        auth_plugin='mysql_native_password',
+    )
+    if DB_LOAD_DATA:
+        os.makedirs(LOAD_DATA_DIR, exist_ok=True)
+        args["allow_local_infile_in_path"] = LOAD_DATA_DIR
+    return args
+
+def apply_session(conn, settings=None):
+    """SET SESSION des variables DB_SESSION (une requête)."""
+    settings = DB_SESSION if settings is None else settings
+    if not settings:
+        return
+    with conn.cursor() as cur:
+        cur.execute("SET SESSION " + ", ".join(f"{name} = %s" for name in settings), list(settings.values()))
 
 def create_connection() -> mysql.connector.MySQLConnection:
     """Crée une connexion MySQL en utilisant les paramètres du fichier config.json."""
     try:
-        conn = mysql.connector.connect(
-            host=CONFIG["DB_HOST"],
-            port=CONFIG["DB_PORT"],
-            user=CONFIG["DB_USER"],
-            password=CONFIG["DB_PASSWORD"],
-            database=CONFIG["DB_NAME"],
-            auth_plugin='mysql_native_password'
-        )
+        conn = mysql.connector.connect(**_connect_args())
         if conn.is_connected():
+            apply_session(conn)
             return conn
         else:
             raise ConnectionError("❌ Failed to connect to the database.")
     except Error as e:
         raise ConnectionError(f"Database connection error: {e}")
 
+class ConnectionPool:
+    """
+    Pool de connexions MySQL (mysql.connector.pooling) partagé par les
+    étapes concurrentes : chaque thread emprunte sa connexion via
+    `with pool.connection() as conn:`.
+    - attente bornée quand toutes les connexions sont prises (le pool
+      mysql.connector, lui, échoue tout de suite) ;
+    - contrôle de santé à l'emprunt : la requête de session sert de ping
+      (ping explicite si aucune variable de session), reconnexion si la
+      connexion est morte ;
+    - rollback si le bloc lève, puis retour au pool.
+    """
+
+    def __init__(self, size: int = DB_POOL_SIZE, timeout: float = DB_POOL_TIMEOUT, session=None):
+        self.size = max(1, min(int(size), mysql.connector.pooling.CNX_POOL_MAXSIZE))
+        self.timeout = timeout
+        self.session = DB_SESSION if session is None else session
+        self.pool = mysql.connector.pooling.MySQLConnectionPool(
+            pool_name="ludov_seeder", pool_size=self.size, **_connect_args())
+        self._slots = threading.BoundedSemaphore(self.size)
+        self._lock = threading.Lock()
+        self._created = time.perf_counter()
+        self._in_use = 0
+        self.stats = {"checkouts": 0, "waits": 0, "wait_seconds": 0.0, "max_wait_seconds": 0.0,
+                      "busy_seconds": 0.0, "peak_in_use": 0, "reconnects": 0}
+
+    @contextmanager
+    def connection(self):
+        started = time.perf_counter()
+        if not self._slots.acquire(timeout=self.timeout):
+            raise ConnectionError(f"Aucune connexion libre apres {self.timeout:.0f} s (DB_POOL_SIZE={self.size})")
+        waited = time.perf_counter() - started
+        conn = None
+        try:
+            conn = self.pool.get_connection()
+            try:
+                self._check(conn)
+            except Error:
+                conn.reconnect(attempts=2, delay=1)
+                self._check(conn)
+                with self._lock:
+                    self.stats["reconnects"] += 1
+            with self._lock:
+                s = self.stats
+                s["checkouts"] += 1
+                s["wait_seconds"] += waited
+                s["max_wait_seconds"] = max(s["max_wait_seconds"], waited)
+                if waited > 0.001:
+                    s["waits"] += 1
+                self._in_use += 1
+                s["peak_in_use"] = max(s["peak_in_use"], self._in_use)
+            held = time.perf_counter()
+            try:
+                yield conn
+            except BaseException:
+                try:
+                    conn.rollback()
+                except Error:
+                    pass  # connexion perdue : l'erreur du bloc est la seule utile
+                raise
+            finally:
+                with self._lock:
+                    self._in_use -= 1
+                    self.stats["busy_seconds"] += time.perf_counter() - held
+        finally:
+            if conn is not None:
+                conn.close()  # retour au pool
+            self._slots.release()
+
+    def _check(self, conn):
+        if self.session:
+            apply_session(conn, self.session)
+        else:
+            conn.ping()
+
+    def utilization(self) -> float:
+        """Part du temps où les connexions du pool étaient empruntées."""
+        elapsed = time.perf_counter() - self._created
+        return self.stats["busy_seconds"] / (self.size * elapsed) if elapsed > 0 else 0.0
+
+    def print_stats(self):
+        s = self.stats
+        if not s["checkouts"]:
+            return
+        print(f"\n{'='*60}")
+        print("STATISTIQUES POOL MYSQL")
+        print(f"{'='*60}")
+        print(f"Taille du pool        : {self.size} (pic simultane {s['peak_in_use']})")
+        print(f"Emprunts              : {s['checkouts']} ({s['waits']} avec attente, "
+              f"{s['reconnects']} reconnexions)")
+        print(f"Attente               : {s['wait_seconds']:.1f} s au total, "
+              f"max {s['max_wait_seconds'] * 1000:.0f} ms")
+        print(f"Utilisation           : {self.utilization():.0%}")
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_pool() -> ConnectionPool:
+    """Pool partagé du processus, créé au premier emprunt."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ConnectionPool()
+        return _pool
+
+@contextmanager
+def pooled():
+    """`with db.pooled() as conn:` : emprunte une connexion du pool partagé."""
+    with get_pool().connection() as conn:
+        yield conn
+
+def print_pool_stats():
+    if _pool is not None:
+        _pool.print_stats()
+
 def ensure_database(conn):
     dbname = CONFIG["DB_NAME"]
     if dbname in SYSTEM_SCHEMAS:
@@ -443,55 +577,376 @@ def confirm_and_wipe(conn):
         except Error: pass
         cur.close()
 
-def run_embedded_sql(conn):
-    cur = conn.cursor()
+# ==============================
+# Migrations versionnées
+# ==============================
+#
+# schema_version garde une ligne par migration appliquée. Une base neuve
+# reçoit SCHEMA (déjà à jour) et toutes les versions sont enregistrées d'un
+# coup ; une base existante ne rejoue que les migrations manquantes. La
+# version 1 rattrape les bases créées par l'ancien SQL embarqué (avant
+# schema_version) : tout y est idempotent.
+
+SCHEMA_VERSION_DDL = """
+CREATE TABLE IF NOT EXISTS `schema_version` (
+  `version` INT NOT NULL,
+  `description` VARCHAR(255) NOT NULL,
+  `fingerprint` CHAR(32) NOT NULL,
+  `appliedAt` DATETIME NOT NULL DEFAULT NOW(),
+  PRIMARY KEY (`version`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+"""
+
+def add_missing_columns(columns):
+    """
+    Étape de migration : ajoute les colonnes (table, colonne, définition)
+    absentes, en un seul ALTER TABLE par table. Pour les bases dont l'état
+    exact n'est pas connu (créées avant schema_version).
+    """
+    def step(cur):
+        tables = sorted({t for t, _, _ in columns})
+        marks = ", ".join(["%s"] * len(tables))
+        cur.execute(f"""
+            SELECT TABLE_NAME, COLUMN_NAME FROM INFORMATION_SCHEMA.COLUMNS
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME IN ({marks})
+        """, tables)
+        present = set(cur.fetchall())
+        for name in tables:
+            missing = [(c, d) for t, c, d in columns if t == name and (t, c) not in present]
+            if missing:
+                cur.execute(f"ALTER TABLE `{name}` " + ", ".join(f"ADD COLUMN `{c}` {d}" for c, d in missing))
+                print(f">>> Colonnes ajoutees a {name} : {', '.join(c for c, _ in missing)}")
+    return step
+
+# (version, description, étapes) ; une étape est une requête SQL ou une
+# fonction(cursor). Ne jamais modifier une migration publiée : en ajouter une.
+MIGRATIONS = [
+    (1, "Schema initial (tables, cles, index, vue)", SCHEMA),
+    (2, "Colonnes IGDB et seeder de games / accessoires", [add_missing_columns([
+        ("games", "platform", "VARCHAR(255) DEFAULT NULL"),
+        ("games", "platform_id", "INT NULL"),
+        ("games", "console_koha_id", "INT DEFAULT NULL"),
+        ("games", "source_hash", "CHAR(32) DEFAULT NULL"),
+        ("games", "is_active", "TINYINT NOT NULL DEFAULT 1"),
+        ("accessoires", "source_hash", "CHAR(32) DEFAULT NULL"),
+    ])]),
+]
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+def _fingerprint():
+    """Empreinte du schéma attendu par ce code (SCHEMA + liste des migrations)."""
+    h = hashlib.md5()
+    for statement in SCHEMA:
+        h.update(" ".join(statement.split()).encode("utf-8"))
+    for version, description, _ in MIGRATIONS:
+        h.update(f"{version}:{description}".encode("utf-8"))
+    return h.hexdigest()
+
+SCHEMA_FINGERPRINT = _fingerprint()
+
+def _schema_state(cur):
+    """(version, empreinte) enregistrées ; (None, None) si schema_version n'existe pas."""
     try:
-        statements = [s.strip() for s in SQL_SCHEMA.split(";") if s.strip()]
-        for stmt in statements:
-            try:
-                cur.execute(stmt)
-            except Error as e:
-                print_sql_error(f"Erreur sur la requête : {stmt[:80]}...", e)
-        print("✓ SQL embarqué exécuté.")
-    finally:
-        cur.close()
+        cur.execute("SELECT version, fingerprint FROM schema_version ORDER BY version DESC LIMIT 1")
+    except Error as e:
+        if e.errno == 1146:  # ER_NO_SUCH_TABLE
+            return None, None
+        raise
+    row = cur.fetchone()
+    return (row[0], row[1]) if row else (0, None)
+
+def _run_steps(cur, steps):
+    for step in steps:
+        if callable(step):
+            step(cur)
+        else:
+            cur.execute(step)
 
-def insertGameIntoDatabase(conn, games_data):
+def _record(cur, versions):
+    cur.executemany("""
+        INSERT INTO schema_version (version, description, fingerprint)
+        VALUES (%s, %s, %s)
+        ON DUPLICATE KEY UPDATE fingerprint = VALUES(fingerprint)
+    """, [(v, d, SCHEMA_FINGERPRINT) for v, d, _ in versions])
+
+def migrate(conn):
     """
-    games_data attend des tuples de 8 valeurs:
-    (biblio_id, titre, author, platform, platform_id, console_koha_id, console_type_id, createdAt)
+    Amène la base au schéma courant. Sur une base à jour : une seule requête
+    (version + empreinte), aucun DDL. Un verrou nommé sérialise les processus
+    (workers shardés) qui démarrent en même temps sur une base à migrer.
     """
-    sql = """
-    INSERT INTO games
-        (biblio_id, titre, author, platform, platform_id, console_koha_id, console_type_id, required_accessories, createdAt)
-    VALUES
-        (%s, %s, %s, %s, %s, %s, %s, %s, %s)
-    ON DUPLICATE KEY UPDATE
-        titre = VALUES(titre),
-        author = VALUES(author),
-        platform = VALUES(platform),
-        platform_id = VALUES(platform_id),
-        console_koha_id = VALUES(console_koha_id),
-        console_type_id = VALUES(console_type_id),
-        required_accessories = VALUES(required_accessories),
-        lastUpdatedAt = NOW()
+    with conn.cursor() as cur:
+        version, fingerprint = _schema_state(cur)
+        if version == LATEST_VERSION and fingerprint == SCHEMA_FINGERPRINT:
+            print(f"✓ Schema a jour (version {version})")
+            return version
+        if version is not None and version > LATEST_VERSION:
+            print(f"ATTENTION: schema en version {version}, ce seeder ne connait que {LATEST_VERSION}.")
+            return version
+
+        cur.execute("SELECT GET_LOCK('ludov_seeder_schema', 300)")
+        if cur.fetchone()[0] != 1:
+            raise RuntimeError("Migration du schema deja en cours ailleurs (verrou non obtenu).")
+        try:
+            version, fingerprint = _schema_state(cur)
+            if version is None:
+                cur.execute("SELECT COUNT(*) FROM INFORMATION_SCHEMA.TABLES "
+                            "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'games'")
+                fresh = cur.fetchone()[0] == 0
+                cur.execute(SCHEMA_VERSION_DDL)
+                version = 0
+                if fresh:
+                    # Base vide : SCHEMA est déjà le schéma courant, chaque table est créée une fois
+                    _run_steps(cur, SCHEMA)
+                    _record(cur, MIGRATIONS)
+                    conn.commit()
+                    print(f"✓ Schema cree (version {LATEST_VERSION})")
+                    return LATEST_VERSION
+            pending = [m for m in MIGRATIONS if m[0] > version]
+            for number, description, steps in pending:
+                print(f">>> Migration {number} : {description}")
+                _run_steps(cur, steps)
+                _record(cur, [(number, description, steps)])
+                conn.commit()
+            if not pending and fingerprint != SCHEMA_FINGERPRINT:
+                print("ATTENTION: SCHEMA a change sans nouvelle migration ; empreinte mise a jour.")
+                _record(cur, MIGRATIONS[-1:])
+                conn.commit()
+            print(f"✓ Schema a jour (version {LATEST_VERSION})")
+            return LATEST_VERSION
+        finally:
+            cur.execute("SELECT RELEASE_LOCK('ludov_seeder_schema')")
+            cur.fetchone()
+
+def row_hash(values):
+    """Empreinte stable (md5 hex) des colonnes écrites d'une ligne."""
+    data = json.dumps(values, ensure_ascii=False, separators=(",", ":"), default=str)
+    return hashlib.md5(data.encode("utf-8")).hexdigest()
+
+def load_source_hashes(conn, table, key, keys, chunk=1000):
+    """Retourne {clé: source_hash} des lignes existantes de `table` (requêtes IN par paquets)."""
+    keys = list(keys)
+    hashes = {}
+    with conn.cursor() as cur:
+        for i in range(0, len(keys), chunk):
+            part = keys[i:i + chunk]
+            marks = ", ".join(["%s"] * len(part))
+            cur.execute(f"SELECT `{key}`, source_hash FROM `{table}` WHERE `{key}` IN ({marks})", part)
+            for k, h in cur.fetchall():
+                hashes[int(k)] = h
+    return hashes
+
+def skip_unchanged(conn, table, key, params, key_of, hash_of):
+    """
+    Filtre `params` sur les lignes nouvelles ou modifiées (source_hash différent).
+    Retourne (params à écrire, stats {'inserted', 'updated', 'unchanged'}).
     """
+    existing = load_source_hashes(conn, table, key, {key_of(p) for p in params})
+    stats = {"inserted": 0, "updated": 0, "unchanged": 0}
+    changed = []
+    for p in params:
+        old = existing.get(key_of(p), False)
+        if old is False:
+            stats["inserted"] += 1
+        elif old == hash_of(p):
+            stats["unchanged"] += 1
+            continue
+        else:
+            stats["updated"] += 1
+        changed.append(p)
+    return changed, stats
+
+def print_write_stats(label, stats):
+    print(f">>> {label}: {stats['inserted']} insérés, {stats['updated']} mis à jour, "
+          f"{stats['unchanged']} inchangés (ignorés)")
+
+# Tables écrites par le seed ; redirigées vers les copies fantômes pendant
+# un reseed blue/green (voir shadow_writes)
+TABLES = {"games": "games", "accessoires": "accessoires", "console_stock": "console_stock"}
+
+def table(name):
+    return TABLES[name]
+
+# Upserts par lots : taille d'un INSERT multi-lignes et nombre de lots par commit.
+# Des transactions courtes gardent les verrous sur games & cie brefs pendant que l'app tourne.
+DB_BATCH_SIZE = int(CONFIG.get("DB_BATCH_SIZE") or 500)
+DB_COMMIT_EVERY = int(CONFIG.get("DB_COMMIT_EVERY") or 1)
+
+def upsert_rows(conn, table, columns: Sequence[str], rows: List[Sequence[Any]], update: Sequence[str],
+                row_sql=None, label=None, batch_size=None, commit_every=None):
+    """
+    INSERT INTO table (columns) VALUES (...), (...), ... ON DUPLICATE KEY UPDATE update
+    par lots de `batch_size` lignes, un commit tous les `commit_every` lots.
+    `row_sql` : gabarit d'une ligne (défaut "(%s, ..., %s)"), ex: "(%s, CAST(%s AS JSON), NOW())".
+    Une erreur annule tout ce qui n'est pas encore committé (le lot en cours
+    et, avec commit_every > 1, les lots précédents depuis le dernier commit)
+    puis remonte ; les lots déjà committés restent.
+    Retourne {'rows', 'batches', 'seconds', 'max_batch_seconds'}.
+    """
+    batch_size = max(1, batch_size or DB_BATCH_SIZE)
+    commit_every = max(1, commit_every or DB_COMMIT_EVERY)
+    row_sql = row_sql or "(" + ", ".join(["%s"] * len(columns)) + ")"
+    head = f"INSERT INTO `{table}` ({', '.join(columns)}) VALUES "
+    tail = " ON DUPLICATE KEY UPDATE " + ", ".join(update)
+    stats = {"rows": 0, "batches": 0, "seconds": 0.0, "max_batch_seconds": 0.0}
+    pending = 0
+    try:
+        with conn.cursor() as cur:
+            for i in range(0, len(rows), batch_size):
+                part = rows[i:i + batch_size]
+                started = time.perf_counter()
+                cur.execute(head + ", ".join([row_sql] * len(part)) + tail,
+                            [value for row in part for value in row])
+                pending += 1
+                if pending >= commit_every:
+                    conn.commit()
+                    pending = 0
+                elapsed = time.perf_counter() - started
+                stats["rows"] += len(part)
+                stats["batches"] += 1
+                stats["seconds"] += elapsed
+                stats["max_batch_seconds"] = max(stats["max_batch_seconds"], elapsed)
+            if pending:
+                conn.commit()
+    except Error:
+        conn.rollback()
+        raise
+    if stats["batches"]:
+        print(f">>> {label or table}: {stats['rows']} lignes en {stats['batches']} lots "
+              f"(moy {stats['seconds'] / stats['batches'] * 1000:.0f} ms, "
+              f"max {stats['max_batch_seconds'] * 1000:.0f} ms)")
+    return stats
+
+GAME_COLUMNS = ("biblio_id", "titre", "author", "platform", "platform_id", "console_koha_id",
+                "console_type_id", "required_accessories", "source_hash", "createdAt")
+GAME_UPDATE = (
+    "titre = VALUES(titre)",
+    "author = VALUES(author)",
+    "platform = VALUES(platform)",
+    "platform_id = VALUES(platform_id)",
+    "console_koha_id = VALUES(console_koha_id)",
+    "console_type_id = VALUES(console_type_id)",
+    "required_accessories = VALUES(required_accessories)",
+    "source_hash = VALUES(source_hash)",
+    "is_active = 1",
+    "lastUpdatedAt = NOW()",
+)
+
+# ER_NOT_ALLOWED_COMMAND, ER_CLIENT_LOCAL_FILES_DISABLED, CR_LOAD_DATA_LOCAL_INFILE_REJECTED :
+# LOAD DATA LOCAL désactivé côté serveur ou client, inutile de réessayer pendant ce run
+LOAD_DATA_REFUSED_ERRNOS = (1148, 3948, 2068)
+_load_data_refused = False
+
+def table_is_empty(conn, table):
     with conn.cursor() as cur:
-        cur.executemany(sql, games_data)
-    conn.commit()
-    print(f">>> {len(games_data)} jeux insérés/mis à jour")
+        cur.execute(f"SELECT 1 FROM `{table}` LIMIT 1")
+        return not cur.fetchall()
+
+def _tsv(value):
+    if value is None:
+        return "\\N"
+    return (str(int(value) if isinstance(value, bool) else value)
+            .replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n").replace("\r", "\\r"))
+
+def load_rows(conn, table, columns: Sequence[str], rows, set_sql=None, label=None):
+    """
+    Chargement en bloc d'une table vide au début du run : les lignes sont écrites dans un
+    TSV temporaire puis ingérées par LOAD DATA LOCAL INFILE (REPLACE : la
+    dernière ligne d'une clé l'emporte, comme l'upsert).
+    Retourne False sans rien écrire si le chargement est désactivé, refusé
+    (local_infile=OFF : plus tenté pendant ce run) ou en erreur (rollback,
+    seul cet appel se replie) : l'appelant passe par upsert_rows.
+    LOAD DATA LOCAL convertit les erreurs de conversion / troncature en
+    avertissements : s'il y en a, le chargement est annulé (rollback) et
+    False est retourné aussi, l'upsert strict signalera la ligne fautive.
+    """
+    global _load_data_refused
+    if not DB_LOAD_DATA or _load_data_refused:
+        return False
+    started = time.perf_counter()
+    os.makedirs(LOAD_DATA_DIR, exist_ok=True)
+    with tempfile.NamedTemporaryFile("w", encoding="utf-8", newline="\n", suffix=".tsv", delete=False,
+                                     dir=LOAD_DATA_DIR) as f:
+        path = f.name
+        count = 0
+        for row in rows:
+            f.write("\t".join(_tsv(value) for value in row) + "\n")
+            count += 1
+    try:
+        sql = (r"LOAD DATA LOCAL INFILE %s REPLACE INTO TABLE `" + table + r"` CHARACTER SET utf8mb4 "
+               r"FIELDS TERMINATED BY '\t' ESCAPED BY '\\' LINES TERMINATED BY '\n' "
+               f"({', '.join(columns)})" + (f" SET {set_sql}" if set_sql else ""))
+        try:
+            with conn.cursor() as cur:
+                cur.execute(sql, (path,))
+                cur.execute("SHOW WARNINGS LIMIT 5")
+                warnings = cur.fetchall()
+            if warnings:
+                conn.rollback()
+                level, code, message = warnings[0][:3]
+                print(f"LOAD DATA sur {table} : avertissements ({level} {code}: {message}), "
+                      f"chargement annulé, repli sur les upserts")
+                return False
+            conn.commit()
+        except Error as e:
+            conn.rollback()
+            if e.errno in LOAD_DATA_REFUSED_ERRNOS:
+                _load_data_refused = True
+                print_sql_error(f"LOAD DATA LOCAL refusé sur {table}, repli sur les upserts pour ce run", e)
+            else:
+                print_sql_error(f"LOAD DATA en échec sur {table}, chargement annulé, repli sur les upserts", e)
+            return False
+        size = os.path.getsize(path)
+    finally:
+        os.remove(path)
+    print(f">>> {label or table}: {count} lignes chargées par LOAD DATA en "
+          f"{time.perf_counter() - started:.2f} s ({size / 1024 / 1024:.1f} Mo)")
+    return True
+
+def insertGameIntoDatabase(conn, games_data, table_empty=None):
+    """
+    games_data : rows.GameRow résolus (extraction.resolve_game). Colonnes écrites :
+    (biblio_id, titre, author, platform, platform_id, console_koha_id, console_type_id,
+     required_accessories, source_hash, createdAt) ; createdAt = timestamp déjà converti en DATETIME.
+    Les jeux dont source_hash n'a pas changé ne sont pas réécrits.
+    table_empty : la table était-elle vide au début du run (LOAD DATA) ;
+    un appelant qui écrit par lots le détermine une fois (défaut : vérifié ici).
+    Retourne {'inserted', 'updated', 'unchanged'}.
+    """
+    params = []
+    for g in games_data:
+        values = (g.biblio_id, g.titre, g.author, g.platform, g.platform_id, g.console_koha_id,
+                  g.console_type_id, json.dumps(g.required_accessories) if g.required_accessories else None)
+        # createdAt (005) n'est écrit qu'à l'insertion : hors empreinte
+        params.append(values + (row_hash(values[1:]), g.timestamp))
+
+    if table_empty is None:
+        table_empty = table_is_empty(conn, table("games"))
+    if table_empty and load_rows(conn, table("games"), GAME_COLUMNS, params, label="Chargement jeux"):
+        stats = {"inserted": len(params), "updated": 0, "unchanged": 0}
+        print_write_stats("Jeux", stats)
+        return stats
+
+    params, stats = skip_unchanged(conn, table("games"), "biblio_id", params,
+                                   key_of=lambda p: int(p[0]), hash_of=lambda p: p[8])
+    upsert_rows(conn, table("games"), GAME_COLUMNS, params, GAME_UPDATE, label="Upsert jeux")
+    print_write_stats("Jeux", stats)
+    return stats
 
 
 def insert_console(conn, consoles):
     """
-    Insère les consoles depuis Koha en créant automatiquement les console_type
-    et les console_stock associés
+    Insère les consoles depuis Koha (rows.ConsoleRow) en créant automatiquement
+    les console_type et les console_stock associés.
+    Requêtes en bloc : une lecture des console_type, un INSERT des types
+    manquants, une lecture des exemplaires existants, puis l'upsert
+    console_stock en lots multi-lignes.
     """
     if not consoles:
         print("⚠️ Aucune console à insérer")
         return
     
-    cursor = conn.cursor(dictionary=True)
+    cursor = conn.cursor()
     
     try:
         stats = {
@@ -502,61 +957,71 @@ def insert_console(conn, consoles):
             "errors": 0
         }
         
+        units = []
         for console in consoles:
-            biblio_id = console.get("biblio_id")
-            name = console.get("title", "").strip()
-            if console.get("subtitle"):
-                name += " " + console.get("subtitle", "").strip()
-            timestamp = console.get("timestamp")
+            biblio_id = console.biblio_id
+            name = (console.title or "").strip()
+            if console.subtitle:
+                name += " " + console.subtitle.strip()
             
             if not biblio_id or not name:
                 stats["errors"] += 1
                 continue
-            
-            try:
-                cursor.execute(
-                    "SELECT id FROM console_type WHERE name = %s",
-                    (name,)
-                )
-                result = cursor.fetchone()
-                
-                if result:
-                    console_type_id = result['id']
-                    stats["types_existing"] += 1
-                else:
-                    # 2. Créer le console_type s'il n'existe pas
-                    cursor.execute("""
-                        INSERT INTO console_type (name)
-                        VALUES (%s)
-                    """, (name,))
-                    console_type_id = cursor.lastrowid
-                    stats["types_created"] += 1
-                    print(f"   ✓ Nouveau type créé: {name} (ID: {console_type_id})")
-                
-                # 3. Insérer ou mettre à jour le console_stock (CORRIGÉ)
-                cursor.execute("""
-                    INSERT INTO console_stock
-                        (id, console_type_id, biblio_id, name, is_active, createdAt, lastUpdatedAt)
-                    VALUES
-                        (%s, %s, %s, %s, 1, NOW(), %s)
-                    ON DUPLICATE KEY UPDATE
-                        console_type_id = VALUES(console_type_id),
-                        biblio_id = VALUES(biblio_id),
-                        name = VALUES(name),
-                        lastUpdatedAt = VALUES(lastUpdatedAt)
-                """, (biblio_id, console_type_id, biblio_id, name, timestamp))
-                
-                if cursor.rowcount == 1:
-                    stats["stocks_inserted"] += 1
-                else:
-                    stats["stocks_updated"] += 1
-                
-            except mysql.connector.Error as err:
-                print(f"   ❌ Erreur pour console {biblio_id} ({name}): {err}")
-                stats["errors"] += 1
-                continue
+            units.append((biblio_id, name, console.timestamp))
         
-        conn.commit()
+        # 1. Types : une lecture, puis un INSERT pour tous les manquants
+        type_map = get_console_type_id_map(conn)
+        missing = []
+        for _, name, _ in units:
+            key = name.lower()
+            if key in type_map:
+                stats["types_existing"] += 1
+            else:
+                type_map[key] = None
+                missing.append(name)
+                stats["types_created"] += 1
+        if missing:
+            # multi-lignes explicite : executemany ne regroupe pas les INSERT IGNORE
+            cursor.execute("INSERT IGNORE INTO console_type (name) VALUES " + ", ".join(["(%s)"] * len(missing)),
+                           missing)
+            type_map = get_console_type_id_map(conn)
+            for name in missing:
+                if type_map.get(name.lower()) is None:
+                    # Nom égal à un type existant pour la collation (accents) mais pas pour lower()
+                    cursor.execute("SELECT id FROM console_type WHERE name = %s", (name,))
+                    type_map[name.lower()] = cursor.fetchone()[0]
+                print(f"   ✓ Nouveau type créé: {name} (ID: {type_map[name.lower()]})")
+        
+        # 2. Exemplaires déjà en base (id = biblio_id) : stats inséré / mis à jour
+        existing = set()
+        ids = [biblio_id for biblio_id, _, _ in units]
+        for i in range(0, len(ids), DB_BATCH_SIZE):
+            part = ids[i:i + DB_BATCH_SIZE]
+            cursor.execute(f"SELECT id FROM `{table('console_stock')}` WHERE id IN ({', '.join(['%s'] * len(part))})", part)
+            existing.update(row[0] for row in cursor.fetchall())
+        
+        # 3. Upsert console_stock en lots multi-lignes
+        params = []
+        for biblio_id, name, timestamp in units:
+            params.append((biblio_id, type_map[name.lower()], biblio_id, name, timestamp))
+            if biblio_id in existing:
+                stats["stocks_updated"] += 1
+            else:
+                stats["stocks_inserted"] += 1
+                existing.add(biblio_id)
+        conn.commit()  # types créés
+        loaded = stats["stocks_updated"] == 0 and table_is_empty(conn, table("console_stock")) and load_rows(
+            conn, table("console_stock"), ("id", "console_type_id", "biblio_id", "name", "lastUpdatedAt"),
+            params, label="Chargement console_stock")
+        if not loaded:
+            upsert_rows(conn, table("console_stock"),
+                        ("id", "console_type_id", "biblio_id", "name", "is_active", "createdAt", "lastUpdatedAt"),
+                        params,
+                        ("console_type_id = VALUES(console_type_id)",
+                         "biblio_id = VALUES(biblio_id)",
+                         "name = VALUES(name)",
+                         "lastUpdatedAt = VALUES(lastUpdatedAt)"),
+                        row_sql="(%s, %s, %s, %s, 1, NOW(), %s)", label="Upsert console_stock")
         
         # Affichage des statistiques
         print(f"\n{'='*60}")
@@ -578,9 +1043,10 @@ def insert_console(conn, consoles):
     
     print("=== SEED CONSOLES KOHA: terminé ===\n")
 
-def insert_accessoires(conn, accessoires):
+def insert_accessoires(conn, accessoires, table_empty=None):
     """
-    Upsert des accessoires liés à leurs console_type_id.
+    Upsert des accessoires (rows.AccessoryRow) liés à leurs console_type_id.
+    table_empty : comme pour insertGameIntoDatabase.
     Nécessite:
       - la table console_type déjà remplie
       - un index unique sur accessoires.koha_id
@@ -593,10 +1059,10 @@ def insert_accessoires(conn, accessoires):
 
     tuples, skipped = [], 0
     for d in accessoires:
-        name = (d.get("name") or "").strip()
-        koha_id = d.get("koha_id")
-        platforms = d.get("platforms") or []
-        hidden = d.get("hidden", 0)
+        name = (d.name or "").strip()
+        koha_id = d.koha_id
+        platforms = d.platforms or []
+        hidden = d.hidden or 0
 
         if not name or koha_id in (None, ""):
             skipped += 1
@@ -616,37 +1082,469 @@ def insert_accessoires(conn, accessoires):
 
         console_json = json.dumps(ids) if ids else "null"
 
-        tuples.append((name, console_json, koha_id, hidden))
+        tuples.append((name, console_json, koha_id, hidden, row_hash((name, console_json, hidden))))
 
     if not tuples:
         print("⚠️ Rien d’insérable (skipped: %d)" % skipped)
         return
 
-    sql = """
-        INSERT INTO accessoires
-            (name, consoles, koha_id, hidden, lastUpdatedAt, createdAt)
-        VALUES
-            (%s, CAST(%s AS JSON), %s, %s, NOW(), NOW())
-        ON DUPLICATE KEY UPDATE
-            name = VALUES(name),
-            consoles = CAST(VALUES(consoles) AS JSON),
-            hidden = VALUES(hidden),
-            lastUpdatedAt = NOW()
-    """
+    if table_empty is None:
+        table_empty = table_is_empty(conn, table("accessoires"))
+    if table_empty and load_rows(
+            conn, table("accessoires"), ("name", "consoles", "koha_id", "hidden", "source_hash"), tuples,
+            set_sql="lastUpdatedAt = NOW(), createdAt = NOW()", label="Chargement accessoires"):
+        stats = {"inserted": len(tuples), "updated": 0, "unchanged": 0}
+        print_write_stats("Accessoires", stats)
+        print("=== SEED ACCESSOIRES KOHA: terminé ===\n")
+        return stats
+
+    tuples, stats = skip_unchanged(conn, table("accessoires"), "koha_id", tuples,
+                                   key_of=lambda t: t[2], hash_of=lambda t: t[4])
 
-    BATCH = 500
-    affected = 0
     try:
-        with conn.cursor() as cur:
-            for i in range(0, len(tuples), BATCH):
-                cur.executemany(sql, tuples[i:i+BATCH])
-                affected += cur.rowcount
-        conn.commit()
-        print(f"✅ Upsert accessoires: {affected} lignes (skipped: {skipped})")
+        upsert_rows(conn, table("accessoires"),
+                    ("name", "consoles", "koha_id", "hidden", "source_hash", "lastUpdatedAt", "createdAt"),
+                    tuples,
+                    ("name = VALUES(name)",
+                     "consoles = CAST(VALUES(consoles) AS JSON)",
+                     "hidden = VALUES(hidden)",
+                     "source_hash = VALUES(source_hash)",
+                     "lastUpdatedAt = NOW()"),
+                    row_sql="(%s, CAST(%s AS JSON), %s, %s, %s, NOW(), NOW())", label="Upsert accessoires")
+        print(f"✅ Upsert accessoires: {len(tuples)} lignes (skipped: {skipped})")
+        print_write_stats("Accessoires", stats)
     except mysql.connector.Error as err:
         print(f"❌ Erreur MySQL pendant l'upsert accessoires : {err}")
         conn.rollback()
     print("=== SEED ACCESSOIRES KOHA: terminé ===\n")
+    return stats
+
+
+def get_game_covers(conn):
+    """Retourne [(biblio_id, picture)] des jeux ayant une vraie cover."""
+    with conn.cursor() as cur:
+        cur.execute("""
+            SELECT biblio_id, picture
+            FROM games
+            WHERE picture IS NOT NULL AND picture <> '' AND picture <> '/placeholder_games.jpg'
+        """)
+        return cur.fetchall()
+
+def write_game_covers(conn, covers, key="id", batch=None):
+    """
+    Écrit des covers [(clé, picture)] par lots : un seul
+    UPDATE games SET picture = CASE clé WHEN ... END WHERE clé IN (...)
+    et un commit par lot, au lieu d'un UPDATE + commit par jeu.
+    `key` : id ou biblio_id. Retourne le nombre de covers écrites.
+    """
+    batch = max(1, batch or DB_BATCH_SIZE)
+    total = 0
+    part = []
+
+    def flush():
+        cases = " ".join(["WHEN %s THEN %s"] * len(part))
+        marks = ", ".join(["%s"] * len(part))
+        params = [v for k, picture in part for v in (k, picture)] + [k for k, _ in part]
+        with conn.cursor() as cur:
+            cur.execute(f"""
+                UPDATE `{table('games')}`
+                SET picture = CASE `{key}` {cases} END, lastUpdatedAt = NOW()
+                WHERE `{key}` IN ({marks})
+            """, params)
+        conn.commit()
+
+    for k, picture in covers:
+        part.append((k, picture))
+        if len(part) >= batch:
+            flush()
+            total += len(part)
+            part = []
+    if part:
+        flush()
+        total += len(part)
+    return total
+
+def apply_game_covers(conn, covers):
+    """Applique des covers (biblio_id, picture) déjà résolues, par lots."""
+    total = write_game_covers(conn, covers, key="biblio_id")
+    print(f">>> {total} covers appliquees")
+    return total
+
+# Réconciliation : notices retirées de Koha, par item_type.
+# `referenced` : lignes qu'une FK (ON DELETE RESTRICT) interdit de supprimer ;
+# celles-là sont désactivées (`retire`), les autres supprimées.
+RECONCILE_TABLES = {
+    "CONSOLE": {
+        "table": "console_stock", "key": "biblio_id", "active": "is_active = 1",
+        "retire": "is_active = 0",
+        "referenced": "EXISTS (SELECT 1 FROM reservation r WHERE r.console_id = t.id)"
+                      " OR EXISTS (SELECT 1 FROM reservation_hold h WHERE h.console_id = t.id)",
+    },
+    # reservation.accessory_ids est du JSON sans FK : on masque toujours
+    "ACCESSOIRE": {
+        "table": "accessoires", "key": "koha_id", "active": "hidden = 0",
+        "retire": "hidden = 1, source_hash = NULL",
+        "referenced": "TRUE",
+    },
+    "JEU": {
+        "table": "games", "key": "biblio_id", "active": "is_active = 1",
+        "retire": "is_active = 0, source_hash = NULL",
+        "referenced": "EXISTS (SELECT 1 FROM reservation r"
+                      " WHERE r.game1_id = t.id OR r.game2_id = t.id OR r.game3_id = t.id)"
+                      " OR EXISTS (SELECT 1 FROM reservation_hold h"
+                      " WHERE h.game1_id = t.id OR h.game2_id = t.id OR h.game3_id = t.id)",
+    },
+}
+
+def iter_active_keys(conn, item_type, chunk=10000):
+    """Génère les clés Koha (biblio_id / koha_id) des lignes actives, par paquets."""
+    spec = RECONCILE_TABLES[item_type]
+    with conn.cursor() as cur:
+        cur.execute(f"SELECT `{spec['key']}` FROM `{spec['table']}` WHERE {spec['active']}")
+        while True:
+            rows = cur.fetchmany(chunk)
+            if not rows:
+                break
+            for (key,) in rows:
+                if key is not None:
+                    yield int(key)
+
+def retire_rows(conn, item_type, keys, batch=500):
+    """
+    Retire les lignes dont la clé a disparu de Koha : suppression, ou
+    désactivation si elles sont encore référencées. Un commit par lot.
+    Retourne {'deleted', 'retired'}.
+    """
+    spec = RECONCILE_TABLES[item_type]
+    table, key = spec["table"], spec["key"]
+    keys = sorted(keys)
+    stats = {"deleted": 0, "retired": 0}
+    with conn.cursor() as cur:
+        for i in range(0, len(keys), batch):
+            part = keys[i:i + batch]
+            marks = ", ".join(["%s"] * len(part))
+            cur.execute(f"""
+                UPDATE `{table}` t SET {spec['retire']}
+                WHERE t.`{key}` IN ({marks}) AND ({spec['referenced']})
+            """, part)
+            stats["retired"] += cur.rowcount
+            cur.execute(f"""
+                DELETE t FROM `{table}` t
+                WHERE t.`{key}` IN ({marks}) AND NOT ({spec['referenced']})
+            """, part)
+            stats["deleted"] += cur.rowcount
+            conn.commit()
+    return stats
+
+# ==============================
+# Reseed blue/green : tables fantômes + RENAME TABLE atomique
+# ==============================
+
+SHADOW_SUFFIX = "__new"
+OLD_SUFFIX = "__old"
+# item_type -> colonnes gérées par l'application (covers, état), reprises des tables live
+SHADOW_CARRY = {
+    "CONSOLE": ("picture", "is_active", "holding"),
+    "ACCESSOIRE": (),
+    "JEU": ("picture", "holding"),
+}
+
+@contextmanager
+def shadow_writes():
+    """Redirige les écritures du seed (insert_*, lectures associées) vers les tables __new."""
+    TABLES.update({name: name + SHADOW_SUFFIX for name in TABLES})
+    try:
+        yield
+    finally:
+        TABLES.update({name: name for name in TABLES})
+
+def _foreign_keys(conn, where, params):
+    """Clés étrangères du schéma courant : [{name, table, columns, ref_table, ref_columns, on_update, on_delete}]."""
+    with conn.cursor() as cur:
+        cur.execute(f"""
+            SELECT k.CONSTRAINT_NAME, k.TABLE_NAME, k.COLUMN_NAME, k.REFERENCED_TABLE_NAME,
+                   k.REFERENCED_COLUMN_NAME, r.UPDATE_RULE, r.DELETE_RULE
+            FROM INFORMATION_SCHEMA.KEY_COLUMN_USAGE k
+            JOIN INFORMATION_SCHEMA.REFERENTIAL_CONSTRAINTS r
+              ON r.CONSTRAINT_SCHEMA = k.CONSTRAINT_SCHEMA AND r.CONSTRAINT_NAME = k.CONSTRAINT_NAME
+             AND r.TABLE_NAME = k.TABLE_NAME
+            WHERE k.CONSTRAINT_SCHEMA = DATABASE() AND k.REFERENCED_TABLE_NAME IS NOT NULL AND {where}
+            ORDER BY k.TABLE_NAME, k.CONSTRAINT_NAME, k.ORDINAL_POSITION
+        """, params)
+        fks = {}
+        for name, tbl, col, ref_table, ref_col, on_update, on_delete in cur.fetchall():
+            fk = fks.setdefault((tbl, name), {
+                "name": name, "table": tbl, "columns": [], "ref_table": ref_table,
+                "ref_columns": [], "on_update": on_update, "on_delete": on_delete,
+            })
+            fk["columns"].append(col)
+            fk["ref_columns"].append(ref_col)
+    return list(fks.values())
+
+def _fk_sql(fk, ref_table):
+    cols = ", ".join(f"`{c}`" for c in fk["columns"])
+    refs = ", ".join(f"`{c}`" for c in fk["ref_columns"])
+    return (f"FOREIGN KEY ({cols}) REFERENCES `{ref_table}` ({refs}) "
+            f"ON UPDATE {fk['on_update']} ON DELETE {fk['on_delete']}")
+
+def create_shadow_tables(conn):
+    """
+    (Re)crée games__new, accessoires__new et console_stock__new vides, même
+    structure que les tables live (CREATE TABLE LIKE + leurs clés étrangères).
+    Les AUTO_INCREMENT démarrent après le max live : carry_over_shadow peut
+    ensuite redonner aux lignes connues leur id live sans collision.
+    """
+    with conn.cursor() as cur:
+        for spec in RECONCILE_TABLES.values():
+            live = spec["table"]
+            shadow = live + SHADOW_SUFFIX
+            cur.execute(f"DROP TABLE IF EXISTS `{shadow}`")
+            cur.execute(f"CREATE TABLE `{shadow}` LIKE `{live}`")
+            for fk in _foreign_keys(conn, "k.TABLE_NAME = %s", (live,)):
+                cur.execute(f"ALTER TABLE `{shadow}` ADD {_fk_sql(fk, fk['ref_table'])}")
+            cur.execute(f"SELECT COALESCE(MAX(id), 0) + 1 FROM `{live}`")
+            cur.execute(f"ALTER TABLE `{shadow}` AUTO_INCREMENT = {int(cur.fetchone()[0])}")
+    conn.commit()
+    print(">>> Tables fantomes creees : " + ", ".join(s["table"] + SHADOW_SUFFIX for s in RECONCILE_TABLES.values()))
+
+def carry_over_shadow(conn, batch=500):
+    """
+    Après le remplissage des tables fantômes :
+    - les lignes déjà connues reprennent leur id live (les réservations pointent
+      sur ces id) et les colonnes gérées par l'app (SHADOW_CARRY : covers, état) ;
+    - les lignes live absentes de Koha mais encore référencées (voir
+      RECONCILE_TABLES) sont recopiées, désactivées, pour ne pas casser les FK.
+    Retourne {item_type: nombre de lignes recopiées}.
+    """
+    carried = {}
+    with conn.cursor() as cur:
+        for item_type, spec in RECONCILE_TABLES.items():
+            live, key = spec["table"], spec["key"]
+            shadow = live + SHADOW_SUFFIX
+            sets = ", ".join(["n.id = t.id"] + [f"n.`{c}` = t.`{c}`" for c in SHADOW_CARRY[item_type]])
+            cur.execute(f"UPDATE `{shadow}` n JOIN `{live}` t ON t.`{key}` = n.`{key}` SET {sets}")
+            conn.commit()
+
+            cur.execute(f"""
+                SELECT t.`{key}` FROM `{live}` t
+                WHERE NOT EXISTS (SELECT 1 FROM `{shadow}` n WHERE n.`{key}` = t.`{key}`)
+                  AND ({spec['referenced']})
+            """)
+            keys = [row[0] for row in cur.fetchall()]
+            for i in range(0, len(keys), batch):
+                part = keys[i:i + batch]
+                marks = ", ".join(["%s"] * len(part))
+                cur.execute(f"INSERT INTO `{shadow}` SELECT * FROM `{live}` WHERE `{key}` IN ({marks})", part)
+                cur.execute(f"UPDATE `{shadow}` t SET {spec['retire']} WHERE t.`{key}` IN ({marks})", part)
+                conn.commit()
+            carried[item_type] = len(keys)
+    return carried
+
+def validate_shadow(conn, min_ratio):
+    """
+    Compare les comptes live / fantôme. Retourne (ok, {table: (live, fantôme)}) ;
+    ok=False si une table fantôme est vide ou sous `min_ratio` x live.
+    """
+    counts, ok = {}, True
+    with conn.cursor() as cur:
+        for spec in RECONCILE_TABLES.values():
+            live = spec["table"]
+            cur.execute(f"SELECT (SELECT COUNT(*) FROM `{live}`), (SELECT COUNT(*) FROM `{live + SHADOW_SUFFIX}`)")
+            n_live, n_shadow = cur.fetchone()
+            counts[live] = (int(n_live), int(n_shadow))
+            if n_shadow == 0 or n_shadow < n_live * min_ratio:
+                ok = False
+    return ok, counts
+
+def _child_foreign_keys(conn, referenced):
+    """Clés étrangères des autres tables (reservation, reservation_hold) vers les tables `referenced`."""
+    names = [spec["table"] for spec in RECONCILE_TABLES.values()]
+    own = [n + suffix for n in names for suffix in ("", SHADOW_SUFFIX, OLD_SUFFIX)]
+    return _foreign_keys(conn, f"k.REFERENCED_TABLE_NAME IN ({', '.join(['%s'] * len(referenced))}) "
+                               f"AND k.TABLE_NAME NOT IN ({', '.join(['%s'] * len(own))})",
+                         list(referenced) + own)
+
+def _orphans(conn, fks, target_of):
+    """{'table.contrainte': n} des lignes enfants dont la clé manque dans target_of[ref_table]."""
+    orphans = {}
+    with conn.cursor() as cur:
+        for fk in fks:
+            match = " AND ".join(f"p.`{r}` = c.`{c}`" for c, r in zip(fk["columns"], fk["ref_columns"]))
+            present = " AND ".join(f"c.`{c}` IS NOT NULL" for c in fk["columns"])
+            cur.execute(f"""
+                SELECT COUNT(*) FROM `{fk['table']}` c
+                WHERE {present}
+                  AND NOT EXISTS (SELECT 1 FROM `{target_of[fk['ref_table']]}` p WHERE {match})
+            """)
+            count = int(cur.fetchone()[0])
+            if count:
+                orphans[f"{fk['table']}.{fk['name']}"] = count
+    return orphans
+
+def shadow_orphans(conn):
+    """Lignes de reservation / reservation_hold qui pointeraient hors des tables fantômes après bascule."""
+    names = [spec["table"] for spec in RECONCILE_TABLES.values()]
+    return _orphans(conn, _child_foreign_keys(conn, names), {n: n + SHADOW_SUFFIX for n in names})
+
+def _swap(conn, renames, moved_away):
+    """
+    RENAME TABLE atomique, puis rattache aux tables live les clés étrangères
+    des autres tables (reservation, reservation_hold) : InnoDB les a fait
+    suivre les tables renommées `moved_away`. Un seul ALTER TABLE par table
+    enfant (DROP + ADD) : pas de fenêtre sans contrainte. Les FK ajoutées
+    avec FOREIGN_KEY_CHECKS=0 ne vérifiant pas l'existant, les lignes écrites
+    entre RENAME et ALTER sont contrôlées ensuite.
+    """
+    started = time.perf_counter()
+    with conn.cursor() as cur:
+        cur.execute("RENAME TABLE " + ", ".join(f"`{a}` TO `{b}`" for a, b in renames))
+        swapped = time.perf_counter() - started
+        fks = _child_foreign_keys(conn, list(moved_away))
+        by_table = {}
+        for fk in fks:
+            by_table.setdefault(fk["table"], []).append(fk)
+        cur.execute("SET FOREIGN_KEY_CHECKS=0")
+        try:
+            for child, child_fks in by_table.items():
+                clauses = [f"DROP FOREIGN KEY `{fk['name']}`" for fk in child_fks]
+                clauses += [f"ADD CONSTRAINT `{fk['name']}` {_fk_sql(fk, moved_away[fk['ref_table']])}"
+                            for fk in child_fks]
+                cur.execute(f"ALTER TABLE `{child}` " + ", ".join(clauses))
+        finally:
+            cur.execute("SET FOREIGN_KEY_CHECKS=1")
+    conn.commit()
+    print(f">>> Bascule RENAME TABLE en {swapped * 1000:.0f} ms, {len(fks)} cles etrangeres rattachees")
+    for child_fk, count in _orphans(conn, fks, moved_away).items():
+        print(f"ATTENTION: {count} lignes de {child_fk} pointent vers un id absent des tables live")
+
+def swap_shadow_tables(conn):
+    """Bascule live -> __old et __new -> live ; l'ancien __old est supprimé, le nouveau gardé pour rollback."""
+    names = [spec["table"] for spec in RECONCILE_TABLES.values()]
+    with conn.cursor() as cur:
+        for name in names:
+            cur.execute(f"DROP TABLE IF EXISTS `{name + OLD_SUFFIX}`")
+    renames = []
+    for name in names:
+        renames += [(name, name + OLD_SUFFIX), (name + SHADOW_SUFFIX, name)]
+    _swap(conn, renames, {name + OLD_SUFFIX: name for name in names})
+
+def rollback_shadow_swap(conn):
+    """Remet en service les tables __old de la dernière bascule (les tables écartées deviennent __new)."""
+    names = [spec["table"] for spec in RECONCILE_TABLES.values()]
+    with conn.cursor() as cur:
+        for name in names:
+            cur.execute("SELECT 1 FROM INFORMATION_SCHEMA.TABLES WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s",
+                        (name + OLD_SUFFIX,))
+            if not cur.fetchall():
+                print(f"Aucune table {name + OLD_SUFFIX} : rien a restaurer.")
+                return False
+        for name in names:
+            cur.execute(f"DROP TABLE IF EXISTS `{name + SHADOW_SUFFIX}`")
+    renames = []
+    for name in names:
+        renames += [(name, name + SHADOW_SUFFIX), (name + OLD_SUFFIX, name)]
+    _swap(conn, renames, {name + SHADOW_SUFFIX: name for name in names})
+    return True
+
+def get_state(conn, name):
+    """Retourne la valeur enregistrée pour `name` dans seeder_state, ou None."""
+    with conn.cursor() as cur:
+        cur.execute("SELECT value FROM seeder_state WHERE name = %s", (name,))
+        row = cur.fetchone()
+    return row[0] if row else None
+
+def set_state(conn, name, value):
+    with conn.cursor() as cur:
+        cur.execute("""
+            INSERT INTO seeder_state (name, value)
+            VALUES (%s, %s)
+            ON DUPLICATE KEY UPDATE value = VALUES(value)
+        """, (name, value))
+    conn.commit()
+
+
+def create_shards(conn, run_id, ranges):
+    """Enregistre les shards [lo, hi) d'un run (idempotent : une reprise ne les recrée pas)."""
+    with conn.cursor() as cur:
+        cur.executemany("""
+            INSERT IGNORE INTO seed_shards (run_id, shard_no, lo, hi)
+            VALUES (%s, %s, %s, %s)
+        """, [(run_id, i, lo, hi) for i, (lo, hi) in enumerate(ranges)])
+    conn.commit()
+
+def claim_shard(conn, run_id, owner):
+    """Réserve atomiquement le prochain shard en attente. Retourne (shard_no, lo, hi) ou None."""
+    with conn.cursor() as cur:
+        cur.execute("""
+            UPDATE seed_shards
+            SET status = 'running', owner = %s
+            WHERE run_id = %s AND status = 'pending'
+            ORDER BY shard_no
+            LIMIT 1
+        """, (owner, run_id))
+        claimed = cur.rowcount
+        conn.commit()
+        if not claimed:
+            return None
+        cur.execute("""
+            SELECT shard_no, lo, hi FROM seed_shards
+            WHERE run_id = %s AND owner = %s AND status = 'running'
+            ORDER BY shard_no
+            LIMIT 1
+        """, (run_id, owner))
+        return cur.fetchone()
+
+def touch_shard(conn, run_id, shard_no, owner, records):
+    """Battement de cœur d'un shard en cours : repousse sa détection comme 'sans nouvelles'."""
+    with conn.cursor() as cur:
+        cur.execute("""
+            UPDATE seed_shards SET updatedAt = NOW(), records = %s
+            WHERE run_id = %s AND shard_no = %s AND owner = %s AND status = 'running'
+        """, (records, run_id, shard_no, owner))
+    conn.commit()
+
+def complete_shard(conn, run_id, shard_no, owner, records):
+    """Marque le shard terminé s'il appartient encore à `owner`. Retourne False sinon."""
+    with conn.cursor() as cur:
+        cur.execute("""
+            UPDATE seed_shards SET status = 'done', records = %s
+            WHERE run_id = %s AND shard_no = %s AND owner = %s AND status = 'running'
+        """, (records, run_id, shard_no, owner))
+        completed = cur.rowcount
+    conn.commit()
+    return completed > 0
+
+def requeue_shards(conn, run_id, owner=None, stale_minutes=None):
+    """Remet en attente les shards 'running' d'un worker mort (owner) ou sans nouvelles depuis stale_minutes."""
+    sql = "UPDATE seed_shards SET status = 'pending', owner = NULL WHERE run_id = %s AND status = 'running'"
+    params = [run_id]
+    if owner is not None:
+        sql += " AND owner = %s"
+        params.append(owner)
+    if stale_minutes is not None:
+        sql += " AND updatedAt < NOW() - INTERVAL %s MINUTE"
+        params.append(stale_minutes)
+    with conn.cursor() as cur:
+        cur.execute(sql, params)
+        requeued = cur.rowcount
+    conn.commit()
+    return requeued
+
+def shard_progress(conn, run_id):
+    """Retourne {'pending': n, 'running': n, 'done': n, 'records': n} pour un run."""
+    progress = {"pending": 0, "running": 0, "done": 0, "records": 0}
+    with conn.cursor() as cur:
+        cur.execute("""
+            SELECT status, COUNT(*), COALESCE(SUM(records), 0)
+            FROM seed_shards WHERE run_id = %s GROUP BY status
+        """, (run_id,))
+        for status, count, records in cur.fetchall():
+            progress[status] = int(count)
+            progress["records"] += int(records)
+    # Termine la transaction de lecture : même si DB_SESSION repasse en REPEATABLE READ,
+    # le prochain appel voit les shards terminés par les autres workers
+    conn.commit()
+    return progress
 
 
 def print_sql_error(prefix, e: Error):
@@ -667,7 +1565,7 @@ def get_console_type_id_map(conn):
 def get_known_accessory_ids(conn):
     ids = set()
     with conn.cursor() as cur:
-        cur.execute("SELECT koha_id FROM accessoires")
+        cur.execute(f"SELECT koha_id FROM `{table('accessoires')}`")
         for (kid,) in cur.fetchall():
             if kid is not None:
                 ids.add(int(kid))
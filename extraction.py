@@ -0,0 +1,213 @@
+# -*- coding: utf-8 -*-
+"""
+Extraction des lignes jeux / accessoires, en série ou dans un pool de processus.
+
+Le travail par notice (plan MARC, résolution de plateforme, 005 -> DATETIME)
+est du pur CPU : avec EXTRACT_WORKERS > 1, les notices partent par paquets
+vers un ProcessPoolExecutor. Chaque worker reçoit une seule fois, à son
+démarrage, les tables en lecture seule (platform_mapping,
+PLATFORM_NAME_TO_IGDB, type_map, known_acc_ids, fuseau horaire) et renvoie
+des lignes à __slots__ (rows.py, picklées en tuples) plutôt que des dicts.
+Dans l'autre sens, seules les zones lues par le plan MARC sont envoyées
+(pas les 952 d'exemplaires, etc.).
+
+Résultats :
+- jeu        : (GameRow, resolved) ; resolved=False si type_map n'était pas
+               encore connu (la résolution se fait alors dans finish)
+- accessoire : AccessoryRow
+"""
+
+from __future__ import annotations
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+import multiprocessing
+
+import marc_in_json_helper as marc
+from rows import AccessoryRow, GameRow
+
+DEFAULT_CHUNK_SIZE = 256
+
+
+# ==============================
+# Extraction / résolution (série)
+# ==============================
+
+def iso_005_to_datetime(iso_005, tz):
+    # 005 ~ "YYYYMMDDhhmmss.s" -> on tolère, sinon NOW()
+    try:
+        core = iso_005.split('.')[0]
+        dt = datetime.strptime(core, "%Y%m%d%H%M%S")
+        return dt.strftime("%Y-%m-%d %H:%M:%S")
+    except Exception:
+        return datetime.now(tz).strftime("%Y-%m-%d %H:%M:%S")
+
+
+def extract_game(record, tz) -> Optional[GameRow]:
+    """GameRow avec timestamp déjà converti en DATETIME MySQL, ou None."""
+    row = marc.extract_game_row(record)
+    if row is not None:
+        row.timestamp = iso_005_to_datetime(row.timestamp, tz)
+    return row
+
+
+def extract_accessory(record) -> AccessoryRow:
+    return marc.extract_accessoire_row(record)
+
+
+def resolve_platforms(biblio_id, platforms, platform_mapping, type_map, name_to_igdb):
+    """
+    Retourne (platform_name, platform_id, console_koha_id, console_type_id, via_ludov).
+    Priorité: platform_mapping (Ludov) -> 753$a (première plateforme reconnue).
+    """
+    # 1) Mapping Ludov si dispo
+    pm = platform_mapping.get(str(biblio_id))
+    if pm:
+        name = pm.get("console")
+        igdb_id = pm.get("igdb_id")
+        koha_console_id = pm.get("koha_console_id")
+        ctid = type_map.get((name or "").strip().lower())
+        return (name, int(igdb_id) if igdb_id is not None else None,
+                int(koha_console_id) if koha_console_id is not None else None,
+                int(ctid) if ctid is not None else None, True)
+
+    # 2) Sinon 753$a (choisir la première reconnue)
+    for candidate in platforms or ():
+        name = candidate.strip()
+        if not name:
+            continue
+        igdb_id = name_to_igdb.get(name)  # mapping existant
+        ctid = type_map.get(name.strip().lower())
+        if igdb_id or ctid:
+            return (name,
+                    int(igdb_id) if igdb_id is not None else None,
+                    None,
+                    int(ctid) if ctid is not None else None,
+                    False)
+    return (None, None, None, None, None)
+
+
+def resolve_game(row: GameRow, lookups: Dict[str, Any]) -> GameRow:
+    """Complète les colonnes plateforme/accessoires ; lookups doit contenir type_map et known_acc_ids."""
+    (row.platform, row.platform_id, row.console_koha_id, row.console_type_id,
+     row.via_ludov) = resolve_platforms(row.biblio_id, row.platforms, lookups["platform_mapping"],
+                                        lookups["type_map"], lookups["name_to_igdb"])
+    known_acc_ids = lookups["known_acc_ids"]
+    row.required_accessories = [i for i in row.required_accessories if i in known_acc_ids]
+    return row
+
+
+# ==============================
+# Workers
+# ==============================
+
+_LOOKUPS: Dict[str, Any] = {}
+
+
+def _init_worker(lookups: Dict[str, Any]):
+    _LOOKUPS.clear()
+    _LOOKUPS.update(lookups)
+
+
+def _games_chunk(records):
+    tz = _LOOKUPS.get("timezone")
+    resolve = "type_map" in _LOOKUPS
+    out = []
+    for record in records:
+        row = extract_game(record, tz)
+        if row is not None:
+            if resolve:
+                resolve_game(row, _LOOKUPS)
+            out.append((row, resolve))
+    return out
+
+
+def _accessories_chunk(records):
+    return [extract_accessory(record) for record in records]
+
+
+# tâche, plan (pour n'envoyer que les tags utiles)
+_TASKS = {
+    "games": (_games_chunk, marc.GAME_PLAN),
+    "accessories": (_accessories_chunk, marc.ACCESSOIRE_PLAN),
+}
+
+
+def _slim(record, wanted):
+    """Copie réduite aux tags du plan : le pickle vers les workers reste petit."""
+    if isinstance(record, marc.MarcIndex):
+        fields = [{tag: value} for tag, value in record.control.items() if tag in wanted]
+        for tag in wanted:
+            fields.extend({tag: field} for field in record.data.get(tag, ()))
+        return {"fields": fields}
+    keys = wanted.keys()
+    return {"fields": [item for item in record.get("fields", ()) if not keys.isdisjoint(item)]}
+
+
+class ExtractionStream:
+    """
+    Envoie les notices au pool par paquets et rend les résultats dans
+    l'ordre d'arrivée des notices. Au plus `max_in_flight` paquets en vol :
+    add() attend le plus ancien au-delà, la mémoire reste bornée.
+    """
+
+    def __init__(self, executor: ProcessPoolExecutor, task: Callable, wanted: Dict[str, Any],
+                 chunk_size: int, max_in_flight: int):
+        self.executor = executor
+        self.task = task
+        self.wanted = wanted
+        self.chunk_size = chunk_size
+        self.max_in_flight = max_in_flight
+        self.chunk: List[Any] = []
+        self.in_flight = deque()
+
+    def add(self, record) -> List[Any]:
+        self.chunk.append(_slim(record, self.wanted))
+        if len(self.chunk) >= self.chunk_size:
+            self._submit()
+        ready = []
+        while self.in_flight and (len(self.in_flight) > self.max_in_flight or self.in_flight[0].done()):
+            ready.extend(self.in_flight.popleft().result())
+        return ready
+
+    def _submit(self):
+        self.in_flight.append(self.executor.submit(self.task, self.chunk))
+        self.chunk = []
+
+    def drain(self) -> List[Any]:
+        if self.chunk:
+            self._submit()
+        ready = []
+        while self.in_flight:
+            ready.extend(self.in_flight.popleft().result())
+        return ready
+
+
+class ExtractionPool:
+    """Pool de processus d'extraction ; les lookups sont chargés une fois par worker."""
+
+    def __init__(self, workers: int, lookups: Dict[str, Any], chunk_size: int = DEFAULT_CHUNK_SIZE):
+        self.workers = workers
+        self.chunk_size = chunk_size
+        # spawn : mêmes workers sous Linux, Windows et l'exécutable PyInstaller
+        self.executor = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(lookups,),
+        )
+
+    def stream(self, kind: str) -> ExtractionStream:
+        task, plan = _TASKS[kind]
+        return ExtractionStream(self.executor, task, plan.wanted, self.chunk_size, self.workers * 2)
+
+    def close(self):
+        self.executor.shutdown(wait=True, cancel_futures=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
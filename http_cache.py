@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+"""
+Cache disque HTTP à revalidation conditionnelle (ETag / Last-Modified).
+
+Chaque réponse 200 qui porte un validateur est conservée sur disque
+(corps + métadonnées). Au prochain appel, la requête part avec
+If-None-Match / If-Modified-Since ; un 304 est servi depuis le disque.
+Les réponses sans validateur ne sont pas conservées (rien à revalider).
+
+Le dossier est borné à `max_bytes` : au-delà, les entrées les moins
+récemment utilisées (date de modification, rafraîchie à chaque hit) sont
+supprimées.
+"""
+
+from __future__ import annotations
+from typing import Any, Dict, Optional
+
+import hashlib
+import json
+import os
+import threading
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+DEFAULT_CACHE_DIR = os.path.join(".ludov_cache", "http")
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+# En-têtes qui décrivent le transfert et non le contenu décodé stocké
+_TRANSFER_HEADERS = {"content-encoding", "content-length", "transfer-encoding", "connection"}
+
+
+class HttpCache:
+    def __init__(self, directory: str = DEFAULT_CACHE_DIR, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+        # get() est appelé depuis les threads de préchargement du paginator
+        self._lock = threading.Lock()
+        self._size = sum(size for _, size, _ in self._entries())
+        self.stats = {"hits": 0, "misses": 0, "stored": 0, "evicted": 0, "bytes_saved": 0}
+
+    def _count(self, key: str, value: int = 1):
+        with self._lock:
+            self.stats[key] += value
+
+    def _entries(self):
+        """(base, taille corps + méta, dernier accès) de chaque entrée du dossier."""
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(".body"):
+                continue
+            base = os.path.join(self.directory, name[:-len(".body")])
+            try:
+                body = os.stat(base + ".body")
+                meta = os.path.getsize(base + ".json") if os.path.exists(base + ".json") else 0
+            except OSError:
+                continue
+            entries.append((base, body.st_size + meta, body.st_mtime))
+        return entries
+
+    def _evict(self):
+        """Supprime les entrées les plus anciennes jusqu'à repasser sous max_bytes."""
+        with self._lock:
+            if self._size <= self.max_bytes:
+                return
+            entries = sorted(self._entries(), key=lambda e: e[2])
+            self._size = sum(size for _, size, _ in entries)
+            for base, size, _ in entries:
+                if self._size <= self.max_bytes:
+                    break
+                for path in (base + ".json", base + ".body"):
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        pass
+                self._size -= size
+                self.stats["evicted"] += 1
+
+    def _paths(self, url: str, params: Optional[Dict[str, Any]], headers: Dict[str, str]):
+        raw = json.dumps({
+            "url": url,
+            "params": sorted((params or {}).items()),
+            "accept": headers.get("Accept"),
+        }, sort_keys=True, default=str)
+        key = hashlib.sha256(raw.encode("utf-8")).hexdigest()
+        base = os.path.join(self.directory, key)
+        return base + ".json", base + ".body"
+
+    def _load(self, meta_path: str, body_path: str):
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            if os.path.exists(body_path):
+                return meta
+        except (OSError, ValueError):
+            pass
+        return None
+
+    def _store(self, resp: requests.Response, meta_path: str, body_path: str):
+        meta = {
+            "url": resp.url,
+            "etag": resp.headers.get("ETag"),
+            "last_modified": resp.headers.get("Last-Modified"),
+            "encoding": resp.encoding,
+            "headers": {k: v for k, v in resp.headers.items() if k.lower() not in _TRANSFER_HEADERS},
+        }
+        # Écriture atomique : un run interrompu ne laisse pas de corps tronqué
+        written = 0
+        for path, data in ((body_path, resp.content),
+                           (meta_path, json.dumps(meta).encode("utf-8"))):
+            tmp = path + ".tmp"
+            with open(tmp, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+            written += len(data)
+        with self._lock:
+            self._size += written
+            self.stats["stored"] += 1
+        self._evict()
+
+    @staticmethod
+    def _from_disk(resp: requests.Response, meta: Dict[str, Any], body: bytes) -> requests.Response:
+        cached = requests.Response()
+        cached.status_code = 200
+        cached.reason = "OK (cache)"
+        cached.url = meta.get("url") or resp.url
+        cached.headers = CaseInsensitiveDict(meta.get("headers") or {})
+        cached.encoding = meta.get("encoding")
+        cached.request = resp.request
+        cached.elapsed = resp.elapsed
+        cached._content = body
+        cached.from_cache = True
+        return cached
+
+    def get(self, client, url: str, params=None, headers=None, **kwargs) -> requests.Response:
+        """GET conditionnel via `client` (HttpClient) ; 304 -> corps lu sur disque."""
+        headers = dict(headers or {})
+        meta_path, body_path = self._paths(url, params, headers)
+        meta = self._load(meta_path, body_path)
+        if meta:
+            if meta.get("etag"):
+                headers["If-None-Match"] = meta["etag"]
+            if meta.get("last_modified"):
+                headers["If-Modified-Since"] = meta["last_modified"]
+
+        resp = client.request("GET", url, params=params, headers=headers, **kwargs)
+
+        if resp.status_code == 304 and meta:
+            with open(body_path, "rb") as f:
+                body = f.read()
+            try:
+                os.utime(body_path)  # récemment utilisée : évincée en dernier
+            except OSError:
+                pass
+            with self._lock:
+                self.stats["hits"] += 1
+                self.stats["bytes_saved"] += len(body)
+            return self._from_disk(resp, meta, body)
+
+        self._count("misses")
+        if resp.status_code == 200 and (resp.headers.get("ETag") or resp.headers.get("Last-Modified")):
+            try:
+                self._store(resp, meta_path, body_path)
+            except OSError as e:
+                print(f"Cache HTTP: ecriture impossible ({e})")
+        return resp
+
+    def print_stats(self):
+        s = self.stats
+        if not (s["hits"] or s["misses"]):
+            return
+        print(f"Cache HTTP: {s['hits']} hits (304) / {s['misses']} miss / "
+              f"{s['stored']} stockes / {s['evicted']} evinces / "
+              f"{s['bytes_saved'] / 1024:.0f} Ko economises")
@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+"""
+Couche HTTP partagée pour les appels Koha, Ludov, Twitch et IGDB.
+
+Une seule requests.Session sert tout le processus : urllib3 garde un pool
+de connexions keep-alive par hôte, ce qui évite une poignée de main
+TCP+TLS à chaque requête (ex: les milliers d'appels IGDB de la boucle
+des covers).
+
+Clés optionnelles de config.json :
+- HTTP_POOL_CONNECTIONS : nombre d'hôtes conservés en pool (défaut 10)
+- HTTP_POOL_MAXSIZE     : connexions keep-alive par hôte (défaut 10)
+- HTTP_CONNECT_TIMEOUT  : timeout de connexion en secondes (défaut 10)
+- HTTP_READ_TIMEOUT     : timeout de lecture en secondes (défaut 60)
+- HTTP_RETRIES          : réessais sur erreur de connexion (défaut 0)
+- HTTP_CACHE            : cache disque conditionnel pour get(cached=True) (défaut true)
+- HTTP_CACHE_DIR        : dossier du cache (défaut .ludov_cache/http)
+- HTTP_CACHE_MAX_MB     : taille maximale du cache, évince les plus anciens (défaut 512)
+"""
+
+from __future__ import annotations
+from typing import Any, Dict, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from http_cache import DEFAULT_CACHE_DIR, DEFAULT_MAX_BYTES, HttpCache
+
+USER_AGENT = "LUDOVSeeder/2.0"
+
+DEFAULT_POOL_CONNECTIONS = 10
+DEFAULT_POOL_MAXSIZE = 10
+DEFAULT_CONNECT_TIMEOUT = 10.0
+DEFAULT_READ_TIMEOUT = 60.0
+DEFAULT_RETRIES = 0
+
+
+class HttpClient:
+    """Session HTTP partagée avec pools keep-alive par hôte et compteurs."""
+
+    def __init__(self,
+                 pool_connections: int = DEFAULT_POOL_CONNECTIONS,
+                 pool_maxsize: int = DEFAULT_POOL_MAXSIZE,
+                 connect_timeout: float = DEFAULT_CONNECT_TIMEOUT,
+                 read_timeout: float = DEFAULT_READ_TIMEOUT,
+                 retries: int = DEFAULT_RETRIES,
+                 cache: Optional[HttpCache] = None):
+        self.timeout = (connect_timeout, read_timeout)
+        self.cache = cache
+        self.adapter = HTTPAdapter(
+            pool_connections=pool_connections,
+            pool_maxsize=pool_maxsize,
+            max_retries=retries,
+        )
+        self.session = requests.Session()
+        self.session.mount("https://", self.adapter)
+        self.session.mount("http://", self.adapter)
+        self.session.headers.update({
+            "User-Agent": USER_AGENT,
+            "Accept-Encoding": "gzip",
+        })
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        kwargs.setdefault("timeout", self.timeout)
+        return self.session.request(method, url, **kwargs)
+
+    def get(self, url: str, cached: bool = False, **kwargs) -> requests.Response:
+        """GET ; cached=True passe par le cache disque conditionnel s'il est actif."""
+        if cached and self.cache is not None and not kwargs.get("stream"):
+            return self.cache.get(self, url, **kwargs)
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.request("POST", url, **kwargs)
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """Retourne {hôte: {'requests', 'connections', 'reused'}} pour chaque pool actif."""
+        out: Dict[str, Dict[str, int]] = {}
+        pools = self.adapter.poolmanager.pools
+        for key in list(pools.keys()):
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            host = f"{pool.scheme}://{pool.host}"
+            requests_count = getattr(pool, "num_requests", 0)
+            connections = getattr(pool, "num_connections", 0)
+            entry = out.setdefault(host, {"requests": 0, "connections": 0, "reused": 0})
+            entry["requests"] += requests_count
+            entry["connections"] += connections
+            entry["reused"] += max(requests_count - connections, 0)
+        return out
+
+    def print_stats(self):
+        stats = self.stats()
+        if not stats:
+            return
+        print(f"\n{'='*60}")
+        print("STATISTIQUES CONNEXIONS HTTP")
+        print(f"{'='*60}")
+        for host, s in sorted(stats.items()):
+            print(f"{host:<35}: {s['requests']} requetes / "
+                  f"{s['connections']} connexions ({s['reused']} reutilisees)")
+        if self.cache is not None:
+            self.cache.print_stats()
+
+    def close(self):
+        self.session.close()
+
+
+def from_config(config: Dict[str, Any]) -> HttpClient:
+    """Construit le client partagé à partir des clés HTTP_* de config.json."""
+    def opt(key: str, default):
+        value: Optional[Any] = config.get(key)
+        return type(default)(value) if value not in (None, "") else default
+
+    cache = None
+    if config.get("HTTP_CACHE", True):
+        try:
+            cache = HttpCache(config.get("HTTP_CACHE_DIR") or DEFAULT_CACHE_DIR,
+                              int(opt("HTTP_CACHE_MAX_MB", DEFAULT_MAX_BYTES // (1024 * 1024)) * 1024 * 1024))
+        except OSError as e:
+            print(f"Cache HTTP desactive: {e}")
+
+    return HttpClient(
+        pool_connections=opt("HTTP_POOL_CONNECTIONS", DEFAULT_POOL_CONNECTIONS),
+        pool_maxsize=opt("HTTP_POOL_MAXSIZE", DEFAULT_POOL_MAXSIZE),
+        connect_timeout=opt("HTTP_CONNECT_TIMEOUT", DEFAULT_CONNECT_TIMEOUT),
+        read_timeout=opt("HTTP_READ_TIMEOUT", DEFAULT_READ_TIMEOUT),
+        retries=opt("HTTP_RETRIES", DEFAULT_RETRIES),
+        cache=cache,
+    )
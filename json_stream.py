@@ -0,0 +1,267 @@
+# -*- coding: utf-8 -*-
+"""
+Lecture incrémentale de réponses JSON volumineuses.
+
+iter_json_records(chunks) décode un tableau JSON élément par élément à
+partir d'un flux d'octets (ex: resp.iter_content()), sans jamais
+matérialiser le tableau complet : la mémoire reste bornée par la taille
+d'un enregistrement et d'un chunk, peu importe la taille du catalogue.
+
+Décodeur au choix (set_backend, clé JSON_BACKEND de config.json) :
+- "msgspec" : décodage typé du format MARC-in-JSON (MarcRecord) ; une
+  notice mal formée rejette la page avec le chemin fautif ;
+- "orjson"  : décodage rapide sans validation ;
+- "json"    : bibliothèque standard, en flux élément par élément ;
+- "auto"    : le premier installé parmi msgspec, orjson, json.
+Avec msgspec/orjson, une page est décodée d'un bloc : les pages sont
+bornées (pagination adaptative), le flux n'apporte alors rien de plus.
+"""
+
+from __future__ import annotations
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, Iterator, List, Optional, TypedDict, Union
+
+import codecs
+import gc
+import json
+import threading
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+CHUNK_SIZE = 64 * 1024
+_WHITESPACE = " \t\n\r"
+
+
+# ==============================
+# Schéma MARC-in-JSON (décodage typé)
+# ==============================
+
+class _DataFieldBase(TypedDict):
+    subfields: List[Dict[str, str]]
+
+
+class DataField(_DataFieldBase, total=False):
+    ind1: str
+    ind2: str
+
+
+class _MarcRecordBase(TypedDict):
+    fields: List[Dict[str, Union[str, DataField]]]
+
+
+class MarcRecord(_MarcRecordBase, total=False):
+    leader: str
+
+
+# ==============================
+# Backends
+# ==============================
+
+BACKENDS = ("msgspec", "orjson", "json")
+BACKEND = "json"
+_decoders: Dict[str, Any] = {}
+
+
+def _available(name: str) -> bool:
+    return {"msgspec": msgspec, "orjson": orjson, "json": json}[name] is not None
+
+
+def set_backend(name: str = "auto") -> str:
+    """Choisit le décodeur ; retombe sur la bibliothèque standard s'il n'est pas installé."""
+    global BACKEND
+    name = (name or "auto").lower()
+    if name == "auto":
+        name = next(b for b in BACKENDS if _available(b))
+    elif name not in BACKENDS:
+        raise ValueError(f"JSON_BACKEND inconnu: {name} (attendu: auto, {', '.join(BACKENDS)})")
+    elif not _available(name):
+        print(f"Decodeur JSON {name} non installe, utilisation de json")
+        name = "json"
+    BACKEND = name
+    if name == "msgspec":
+        _decoders["any"] = msgspec.json.Decoder()
+        # Tableau de notices typées, ou enveloppe {records|items|data} laissée générique
+        _decoders["marc"] = msgspec.json.Decoder(Union[List[MarcRecord], Dict[str, Any]])
+    return name
+
+
+_gc_lock = threading.Lock()
+_gc_pauses = 0
+_gc_was_enabled = False
+
+
+@contextmanager
+def _gc_paused():
+    """
+    Suspend le ramasse-miettes cyclique pendant un décodage : une page crée
+    des centaines de milliers de dicts/listes sans cycle, et les collectes
+    déclenchées par ces allocations coûtent plus que le décodage lui-même.
+    Compté entre threads (pages décodées en parallèle par le paginator).
+    """
+    global _gc_pauses, _gc_was_enabled
+    with _gc_lock:
+        if _gc_pauses == 0:
+            _gc_was_enabled = gc.isenabled()
+            gc.disable()
+        _gc_pauses += 1
+    try:
+        yield
+    finally:
+        with _gc_lock:
+            _gc_pauses -= 1
+            if _gc_pauses == 0 and _gc_was_enabled:
+                gc.enable()
+
+
+def loads(data: Union[bytes, str]) -> Any:
+    """Décode un document JSON complet avec le backend courant."""
+    with _gc_paused():
+        if BACKEND == "msgspec":
+            return _decoders["any"].decode(data)
+        if BACKEND == "orjson":
+            return orjson.loads(data)
+        return json.loads(data)
+
+
+def decode(data: Union[bytes, str], marc: bool = False) -> Any:
+    """
+    Comme loads() ; avec marc=True et msgspec, chaque notice d'un tableau est
+    validée contre MarcRecord (ValueError avec le chemin fautif sinon).
+    """
+    if marc and BACKEND == "msgspec":
+        try:
+            with _gc_paused():
+                return _decoders["marc"].decode(data)
+        except msgspec.ValidationError as e:
+            raise ValueError(f"Notice MARC-in-JSON invalide: {e}") from None
+    return loads(data)
+
+
+def decode_records(data: Union[bytes, str], marc: bool = False) -> List[Any]:
+    """Notices d'un document complet (tableau ou enveloppe {records|items|data})."""
+    return _records_from_document(decode(data, marc=marc))
+
+
+class _Buffer:
+    """Tampon texte alimenté à la demande par un itérateur d'octets."""
+
+    def __init__(self, chunks: Iterable[bytes]):
+        self._chunks = iter(chunks)
+        self._utf8 = codecs.getincrementaldecoder("utf-8")()
+        self.text = ""
+        self.pos = 0
+        self.eof = False
+
+    def fill(self) -> bool:
+        """Ajoute le prochain chunk au tampon. Retourne False en fin de flux."""
+        if self.eof:
+            return False
+        self.text = self.text[self.pos:]
+        self.pos = 0
+        for chunk in self._chunks:
+            decoded = self._utf8.decode(chunk)
+            if decoded:
+                self.text += decoded
+                return True
+        self.text += self._utf8.decode(b"", final=True)
+        self.eof = True
+        return False
+
+    def peek(self) -> Optional[str]:
+        """Retourne le prochain caractère non blanc (sans le consommer), None en fin de flux."""
+        while True:
+            while self.pos < len(self.text) and self.text[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.text):
+                return self.text[self.pos]
+            if not self.fill():
+                return None
+
+    def rest(self) -> str:
+        while self.fill():
+            pass
+        return self.text[self.pos:]
+
+
+def _records_from_document(data: Any) -> list:
+    """Même tolérance que les fetchers : liste brute ou dict {records|items|data}."""
+    if isinstance(data, dict):
+        return data.get("records") or data.get("items") or data.get("data") or []
+    return data if isinstance(data, list) else []
+
+
+_NUMBER_TAIL = ".eE+-0123456789"
+
+
+def _is_number(obj) -> bool:
+    return isinstance(obj, (int, float)) and not isinstance(obj, bool)
+
+
+def iter_json_records(chunks: Iterable[bytes]) -> Iterator[Any]:
+    """Itère les éléments d'un tableau JSON reçu par morceaux.
+
+    Si le document n'est pas un tableau (ex: enveloppe {"records": [...]}),
+    on retombe sur un décodage complet.
+    """
+    decoder = json.JSONDecoder()
+    buf = _Buffer(chunks)
+
+    first = buf.peek()
+    if first is None:
+        return
+    if first != "[":
+        yield from _records_from_document(json.loads(buf.rest()))
+        return
+    buf.pos += 1
+
+    if buf.peek() == "]":
+        return
+
+    while True:
+        if buf.peek() is None:
+            raise ValueError("JSON tronqué: tableau non terminé")
+        # Un élément peut chevaucher plusieurs chunks : on réessaie après
+        # chaque ajout. Un nombre n'est accepté que suivi d'un délimiteur :
+        # "12" de "123", "12." de "12.5" ou "1e" de "1e3" attendent la suite.
+        while True:
+            try:
+                obj, end = decoder.raw_decode(buf.text, buf.pos)
+                if buf.eof:
+                    break
+                if end < len(buf.text) and not (_is_number(obj) and buf.text[end] in _NUMBER_TAIL):
+                    break
+            except json.JSONDecodeError:
+                if buf.eof:
+                    raise
+            buf.fill()
+        buf.pos = end
+        yield obj
+
+        sep = buf.peek()
+        if sep == ",":
+            buf.pos += 1
+        elif sep == "]":
+            return
+        elif sep is None:
+            raise ValueError("JSON tronqué: tableau non terminé")
+        else:
+            raise ValueError(f"JSON invalide: séparateur inattendu {sep!r}")
+
+
+def iter_response_records(resp, chunk_size: int = CHUNK_SIZE, marc: bool = False) -> Iterator[Any]:
+    """Itère les enregistrements d'une réponse requests ouverte avec stream=True."""
+    try:
+        if BACKEND == "json":
+            yield from iter_json_records(resp.iter_content(chunk_size=chunk_size))
+        else:
+            yield from decode_records(resp.content, marc=marc)
+    finally:
+        resp.close()
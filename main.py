@@ -1,5 +1,10 @@
-import requests
 from requests.auth import HTTPBasicAuth
+import argparse
+from contextlib import contextmanager
+import multiprocessing
+import os
+import socket
+import threading
 from datetime import datetime, timedelta, time as dtime
 import time
 import re
@@ -10,8 +15,15 @@ except ImportError:
     class ZoneInfoNotFoundError(Exception): ...
     pass
 
+import checkpoint
 import db
+import extraction
+import http_client
+import json_stream
 import marc_in_json_helper as marc
+import paginator
+import pipeline
+import snapshot
 import json
 
 CONFIG = db.get_config()
@@ -22,11 +34,43 @@ BASE_URL = "https://ludov.inlibro.net/api/v1"
 ENDPOINT = "/biblios"
 USERNAME = CONFIG["API_USERNAME"]
 PASSWORD = CONFIG["API_PASSWORD"]
+KOHA_AUTH = HTTPBasicAuth(USERNAME, PASSWORD)
 
-PER_PAGE = 999999
-CHECK_DATE = False
+# Session HTTP partagée (pools keep-alive par hôte)
+HTTP = http_client.from_config(CONFIG)
+# Décodeur JSON des réponses Koha : auto | msgspec | orjson | json
+JSON_BACKEND = json_stream.set_backend(CONFIG.get("JSON_BACKEND") or "auto")
 
-ALL_BIBLIOS = []
+# Taille initiale des pages du catalogue complet : chaque page est conservée
+# au checkpoint, une reprise ne retélécharge que les pages manquantes.
+CATALOG_PAGE_SIZE = int(CONFIG.get("KOHA_CATALOG_PAGE_SIZE") or 1000)
+# Pagination adaptative : `_per_page` varie entre KOHA_PAGE_MIN et KOHA_PAGE_MAX
+# pour que chaque page prenne ~KOHA_PAGE_TARGET_SECONDS (recul sur timeout/5xx)
+ADAPTIVE_PAGING = bool(CONFIG.get("KOHA_ADAPTIVE_PAGING", True))
+PAGE_TARGET_SECONDS = float(CONFIG.get("KOHA_PAGE_TARGET_SECONDS") or paginator.DEFAULT_TARGET_SECONDS)
+PAGE_MIN = int(CONFIG.get("KOHA_PAGE_MIN") or paginator.DEFAULT_MIN_PAGE_SIZE)
+PAGE_MAX = int(CONFIG.get("KOHA_PAGE_MAX") or paginator.DEFAULT_MAX_PAGE_SIZE)
+CHECKPOINT_PATH = CONFIG.get("CHECKPOINT_PATH") or checkpoint.DEFAULT_CHECKPOINT_PATH
+# Nombre de pages Koha téléchargées en parallèle
+KOHA_CONCURRENCY = int(CONFIG.get("KOHA_CONCURRENCY") or paginator.DEFAULT_CONCURRENCY)
+# Sync incrémentale : revérifie aussi le 005 côté client (si Koha ignore le filtre)
+CHECK_DATE = bool(CONFIG.get("CHECK_DATE", False))
+HIGH_WATER_KEY = "koha_high_water"
+# Extraction MARC dans un pool de processus (0 ou 1 = dans le processus principal)
+EXTRACT_WORKERS = int(CONFIG.get("EXTRACT_WORKERS") or 0)
+EXTRACT_CHUNK_SIZE = int(CONFIG.get("EXTRACT_CHUNK_SIZE") or extraction.DEFAULT_CHUNK_SIZE)
+# Crawls dédiés en flux : taille des lots d'upsert et des files entre étapes
+UPSERT_BATCH_SIZE = int(CONFIG.get("UPSERT_BATCH_SIZE") or 1000)
+PIPELINE_QUEUE_SIZE = int(CONFIG.get("PIPELINE_QUEUE_SIZE") or pipeline.DEFAULT_QUEUE_SIZE)
+# Lots d'upsert écrits en parallèle, chacun sur une connexion du pool (db.DB_POOL_SIZE)
+UPSERT_WORKERS = int(CONFIG.get("UPSERT_WORKERS") or 1)
+# Réconciliation : au-delà de cette part d'une table à retirer, on suppose un crawl incomplet
+RECONCILE_MAX_REMOVE_RATIO = float(CONFIG.get("RECONCILE_MAX_REMOVE_RATIO") or 0.2)
+# Reseed blue/green : pas de bascule si une table fantôme a moins que cette part des lignes live
+SHADOW_MIN_RATIO = float(CONFIG.get("SHADOW_MIN_RATIO") or 0.9)
+# Covers IGDB : écrites par lots de COVER_BATCH_SIZE, au plus tard toutes les COVER_FLUSH_SECONDS
+COVER_BATCH_SIZE = int(CONFIG.get("COVER_BATCH_SIZE") or 200)
+COVER_FLUSH_SECONDS = float(CONFIG.get("COVER_FLUSH_SECONDS") or 30)
 
 # URLs Ludov pour mapping plateforme
 LUDOV_CONSOLES_URL = "https://www.ludov.ca/koha/consoles/catalogue_source_consoles.json"
@@ -99,13 +143,13 @@ PLATFORM_NAME_TO_IGDB = {
     "Macintosh Plus": 14,
 }
 
-print("""
+BANNER = """
 =========================================
    LUDOV SEEDER v2.0
    Générateur de données pour LUDOV
    + Intégration IGDB
 =========================================
-""")
+"""
 
 # ============================================
 # Classes IGDB
@@ -114,9 +158,10 @@ print("""
 class IGDBClient:
     """Client pour récupérer les covers depuis IGDB"""
     
-    def __init__(self, client_id: str, client_secret: str):
+    def __init__(self, client_id: str, client_secret: str, http: http_client.HttpClient = None):
         self.client_id = client_id
         self.client_secret = client_secret
+        self.http = http or HTTP
         self.access_token = None
         self.token_expiry = 0
         
@@ -132,7 +177,7 @@ class IGDBClient:
             "grant_type": "client_credentials"
         }
         
-        resp = requests.post(url, params=params, timeout=10)
+        resp = self.http.post(url, params=params, timeout=10)
         data = resp.json()
         
         self.access_token = data["access_token"]
@@ -167,7 +212,7 @@ class IGDBClient:
             '''
         
         try:
-            resp = requests.post(
+            resp = self.http.post(
                 "https://api.igdb.com/v4/games",
                 headers=headers,
                 data=query,
@@ -210,12 +255,12 @@ def load_ludov_platform_mapping():
     
     try:
         # Fetch consoles
-        resp_consoles = requests.get(LUDOV_CONSOLES_URL, timeout=30)
+        resp_consoles = HTTP.get(LUDOV_CONSOLES_URL, cached=True, timeout=30)
         consoles_data = resp_consoles.json()
         console_map = {c["id"]: c["console"] for c in consoles_data}
         
         # Fetch jeux
-        resp_jeux = requests.get(LUDOV_JEUX_URL, timeout=30)
+        resp_jeux = HTTP.get(LUDOV_JEUX_URL, cached=True, timeout=30)
         jeux_data = resp_jeux.json()
         
         # Créer mapping biblio_id -> (console_name, igdb_id, koha_console_id)
@@ -241,46 +286,34 @@ def load_ludov_platform_mapping():
         print(f"ERREUR chargement Ludov: {e}")
         return {}
 
-def ensure_igdb_columns(conn):
-    """S'assure que les colonnes nécessaires pour IGDB existent"""
-    cursor = conn.cursor()
-    
-    print("\nVerification des colonnes IGDB...")
-    
-    # Vérifie si les colonnes existent
-    cursor.execute("""
-        SELECT COUNT(*) 
-        FROM INFORMATION_SCHEMA.COLUMNS 
-        WHERE TABLE_SCHEMA = DATABASE()
-        AND TABLE_NAME = 'games' 
-        AND COLUMN_NAME = 'platform'
-    """)
-    
-    exists = cursor.fetchone()[0] > 0
-    
-    if not exists:
-        print("Ajout des colonnes platform...")
-        try:
-            cursor.execute("""
-                ALTER TABLE games 
-                ADD COLUMN platform VARCHAR(100) NULL AFTER titre,
-                ADD COLUMN platform_id INT NULL AFTER platform,
-                ADD COLUMN console_koha_id VARCHAR(20) NULL AFTER platform_id
-            """)
-            conn.commit()
-            print(">>> Colonnes ajoutees avec succes")
-        except Exception as e:
-            print(f"ERREUR ajout colonnes: {e}")
-    else:
-        print(">>> Colonnes deja presentes")
-    
-    cursor.close()
-
 # ============================================
 # Fonctions principales
 # ============================================
 
-def main():
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="LUDOV Seeder")
+    parser.add_argument("--export-snapshot", metavar="FICHIER",
+                        help="Lors d'un seed complet, ecrire tout ce qui a ete recupere "
+                             "(notices, mapping, covers) dans un snapshot .jsonl.gz")
+    parser.add_argument("--from-snapshot", metavar="FICHIER",
+                        help="Vider la BD et la reconstruire depuis un snapshot, sans reseau")
+    parser.add_argument("--yes", action="store_true",
+                        help="Ne pas demander de confirmation avant de vider la BD")
+    parser.add_argument("--resume", action="store_true",
+                        help="Reprendre le dernier run interrompu depuis son checkpoint")
+    parser.add_argument("--shards", type=int, default=1, metavar="N",
+                        help="Seed complet : decouper le crawl des jeux en N plages de biblio_id")
+    parser.add_argument("--workers", type=int, default=None, metavar="W",
+                        help="Processus locaux pour les shards (defaut: min(N, nb de CPU))")
+    parser.add_argument("--shard-worker", action="store_true",
+                        help="Participer au seed shard en cours sur la BD cible (autre machine)")
+    parser.add_argument("--rollback-reseed", action="store_true",
+                        help="Annuler la derniere bascule blue/green (remet les tables __old en service)")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    print(BANNER)
+    args = parse_args(argv)
     conn = db.create_connection()
     if conn is None:
         return
@@ -288,6 +321,41 @@ def main():
     try:
         db.ensure_database(conn)
         db.use_database(conn)
+        db.migrate(conn)
+        
+        if args.from_snapshot:
+            seed_from_snapshot(conn, args.from_snapshot, confirm=not args.yes)
+            return
+        
+        if args.rollback_reseed:
+            db.rollback_shadow_swap(conn)
+            return
+        
+        if args.shard_worker:
+            run_id = db.get_state(conn, SHARD_RUN_KEY)
+            if not run_id:
+                print("Aucun seed shard en cours sur cette BD.")
+                return
+            shard_worker(run_id)
+            return
+        
+        ckpt = checkpoint.Checkpoint(CHECKPOINT_PATH)
+        if args.resume:
+            if not ckpt.exists():
+                print(f"Aucun checkpoint a reprendre ({CHECKPOINT_PATH}).")
+                return
+            done = ", ".join(ckpt.state.get("done", [])) or "aucune"
+            print(f"\n>>> Reprise du run '{ckpt.mode}' (etapes terminees: {done})")
+            if ckpt.mode == "seed":
+                # Tant que "wipe" n'est pas fait, la reprise redemande la confirmation
+                run_full_seed(conn, ckpt, args.export_snapshot, confirm=not args.yes,
+                              shards=args.shards, workers=args.workers)
+            else:
+                run_cover_update(conn, ckpt)
+            return
+        if ckpt.exists():
+            print(f"\nUn run '{ckpt.mode}' interrompu peut etre repris avec --resume "
+                  f"(il sera remplace si vous lancez un nouveau run).")
         
         # OPTION: Wipe ou non
         print("\n" + "="*50)
@@ -295,59 +363,44 @@ def main():
         print("="*50)
         print("y = Oui, vider et reconstruire (SUPPRIME TOUT)")
         print("n = Non, conserver les donnees existantes")
-        wipe_choice = input("\nVotre choix (y/n): ").lower().strip()
+        print("s = Synchronisation incrementale (notices modifiees depuis le dernier seed)")
+        print("r = Reconciliation (crawl complet, retire ce qui a ete supprime de Koha)")
+        print("b = Reconstruire sans interruption (tables fantomes puis bascule atomique)")
+        wipe_choice = input("\nVotre choix (y/n/s/r/b): ").lower().strip()
         
         if wipe_choice == 'y':
-            db.preview_wipe(conn)
-            input("\nLa BD sera videe. Appuyez sur Entree pour confirmer...")
-            db.confirm_and_wipe(conn)
-            
-            print("\n=== Import du SQL embarque ===")
-            db.run_embedded_sql(conn)
-            print(">>> Schema importe avec succes")
-            
-            # S'assurer que les colonnes IGDB existent
-            ensure_igdb_columns(conn)
+            ckpt.start("seed")
+            run_full_seed(conn, ckpt, args.export_snapshot, confirm=not args.yes,
+                          shards=args.shards, workers=args.workers)
+        elif wipe_choice == 'b':
+            if run_shadow_reseed(conn):
+                print("\nSouhaitez-vous fetcher les covers manquantes depuis IGDB?")
+                if input("Votre choix (y/n): ").lower().strip() == 'y':
+                    update_game_covers(conn, load_ludov_platform_mapping(), fetch_all=False)
+        elif wipe_choice == 'r':
+            reconcile_catalog(conn, load_ludov_platform_mapping())
+        elif wipe_choice == 's':
+            print("\n>>> Synchronisation incrementale")
             
-            # Charger le mapping des plateformes
             platform_mapping = load_ludov_platform_mapping()
             
-            fetch_all_biblios()
-            fetch_console(conn)
-            fetch_accessoires(conn)
-            fetch_games_from_marc(conn, platform_mapping)
+            sync_catalog(conn, platform_mapping)
             
-            # Après le seed, proposer de fetch les covers
-            print("\n" + "="*50)
-            print("SEED TERMINE - Les jeux ont ete importes avec plateformes")
-            print("="*50)
-            print("Souhaitez-vous maintenant fetcher les covers depuis IGDB?")
+            # Les nouveaux jeux n'ont pas encore de cover
+            print("\nSouhaitez-vous fetcher les covers manquantes depuis IGDB?")
             fetch_covers_choice = input("Votre choix (y/n): ").lower().strip()
             
             if fetch_covers_choice == 'y':
-                update_game_covers(conn, platform_mapping, fetch_all=True)
+                update_game_covers(conn, platform_mapping, fetch_all=False)
         else:
             print("\n>>> Conservation des donnees existantes")
-            
-            # S'assurer que les colonnes IGDB existent
-            ensure_igdb_columns(conn)
-            
-            # Charger le mapping des plateformes
-            platform_mapping = load_ludov_platform_mapping()
-            
-            # OPTION: Fetch toutes les covers ou seulement les manquantes
-            print("\n" + "="*50)
-            print("OPTION: Quelles covers souhaitez-vous fetcher?")
-            print("="*50)
-            print("1 = Toutes les covers (remplace les existantes)")
-            print("2 = Uniquement les covers manquantes")
-            cover_choice = input("\nVotre choix (1/2): ").strip()
-            
-            fetch_all = (cover_choice == '1')
-            
-            update_game_covers(conn, platform_mapping, fetch_all)
+            ckpt.start("covers")
+            run_cover_update(conn, ckpt)
             
     finally:
+        HTTP.print_stats()
+        HTTP.close()
+        db.print_pool_stats()
         try:
             if conn.is_connected():
                 conn.close()
@@ -355,6 +408,228 @@ def main():
         except NameError:
             pass
 
+def checkpointed_platform_mapping(ckpt):
+    """Mapping Ludov, relu depuis le checkpoint s'il a déjà été chargé pendant ce run."""
+    if ckpt.is_done("mapping"):
+        platform_mapping = ckpt.load_json("mapping")
+        if platform_mapping is not None:
+            print(f">>> Reprise: {len(platform_mapping)} jeux avec plateforme (checkpoint)")
+            return platform_mapping
+    platform_mapping = load_ludov_platform_mapping()
+    ckpt.save_json("mapping", platform_mapping)
+    ckpt.mark_done("mapping")
+    return platform_mapping
+
+def run_full_seed(conn, ckpt, export_snapshot=None, confirm=True, shards=1, workers=None):
+    """
+    Wipe + schéma + seed complet + covers, chaque étape étant checkpointée.
+    Avec shards > 1, le crawl des jeux est découpé en plages de biblio_id.
+    confirm : demander avant de vider la BD (reprise comprise, si le wipe
+    n'a pas encore eu lieu).
+    """
+    if not ckpt.is_done("wipe"):
+        if confirm:
+            db.preview_wipe(conn)
+            input("\nLa BD sera videe. Appuyez sur Entree pour confirmer...")
+        db.confirm_and_wipe(conn)
+        
+        print("\n=== Creation du schema ===")
+        db.migrate(conn)
+        ckpt.mark_done("wipe")
+    else:
+        print(">>> Reprise: BD deja videe et schema deja importe")
+    
+    # Charger le mapping des plateformes
+    platform_mapping = checkpointed_platform_mapping(ckpt)
+    
+    writer = None
+    try:
+        if export_snapshot:
+            writer = snapshot.SnapshotWriter(export_snapshot, APP_VERSION)
+            writer.set_platform_mapping(platform_mapping)
+        
+        sharded = shards > 1 or bool(ckpt.cursor("JEU").get("run_id"))
+        if sharded:
+            if writer:
+                print("Snapshot non disponible en mode shards, export ignore.")
+                writer.abort()
+                writer = None
+            high_water = run_sharded_seed(conn, ckpt, platform_mapping, shards, workers)
+        else:
+            # Un seul telechargement du catalogue, reparti par item_type
+            high_water = ingest_catalog(conn, platform_mapping, snapshot_writer=writer, ckpt=ckpt)
+        save_high_water(conn, high_water)
+        
+        if not ckpt.is_done("covers"):
+            if ckpt.cursor("covers"):
+                fetch_covers_choice = 'y'
+            else:
+                # Après le seed, proposer de fetch les covers
+                print("\n" + "="*50)
+                print("SEED TERMINE - Les jeux ont ete importes avec plateformes")
+                print("="*50)
+                print("Souhaitez-vous maintenant fetcher les covers depuis IGDB?")
+                fetch_covers_choice = input("Votre choix (y/n): ").lower().strip()
+            
+            if fetch_covers_choice == 'y':
+                update_game_covers(conn, platform_mapping, fetch_all=True, ckpt=ckpt)
+        
+        if writer:
+            writer.add_covers(db.get_game_covers(conn))
+            writer.close()
+    finally:
+        if writer:
+            writer.abort()
+    ckpt.clear()
+
+def run_cover_update(conn, ckpt):
+    """Mise à jour des covers seulement (BD conservée), reprenable."""
+    # Charger le mapping des plateformes
+    platform_mapping = checkpointed_platform_mapping(ckpt)
+    
+    cursor = ckpt.cursor("covers")
+    if "fetch_all" in cursor:
+        fetch_all = cursor["fetch_all"]
+    else:
+        # OPTION: Fetch toutes les covers ou seulement les manquantes
+        print("\n" + "="*50)
+        print("OPTION: Quelles covers souhaitez-vous fetcher?")
+        print("="*50)
+        print("1 = Toutes les covers (remplace les existantes)")
+        print("2 = Uniquement les covers manquantes")
+        cover_choice = input("\nVotre choix (1/2): ").strip()
+        
+        fetch_all = (cover_choice == '1')
+    
+    update_game_covers(conn, platform_mapping, fetch_all, ckpt=ckpt)
+    ckpt.clear()
+
+# ============================================
+# Crawl shardé par plages de biblio_id
+# ============================================
+# Les jeux (le gros du catalogue) sont découpés en plages [lo, hi) de
+# biblio_id via le filtre `q` de Koha. Les plages sont enregistrées dans la
+# table seed_shards de la BD cible : processus locaux et autres machines
+# (--shard-worker) se les réservent, crawlent et upsertent chacun la leur.
+
+SHARD_RUN_KEY = "shard_run_id"
+SHARD_STALE_MINUTES = 30
+
+def fetch_max_biblio_id(query=None):
+    """Plus grand biblio_id correspondant à `query` (une seule notice, tri décroissant)."""
+    headers = {
+        "Accept": "application/json",
+    }
+    params = {"_per_page": 1, "_order_by": "-biblio_id"}
+    if query:
+        params["q"] = json.dumps(query)
+    resp = HTTP.get(f"{BASE_URL}{ENDPOINT}", auth=KOHA_AUTH, headers=headers, params=params)
+    resp.raise_for_status()
+    data = resp.json()
+    return int(data[0]["biblio_id"]) if data else 0
+
+def shard_ranges(max_id, shards):
+    """Découpe [0, max_id] en `shards` plages [lo, hi) de même largeur."""
+    width = max_id // shards + 1
+    return [(i * width, (i + 1) * width) for i in range(shards)]
+
+def crawl_shard(conn, platform_mapping, lo, hi, progress=None):
+    query = {"item_type": "JEU", "biblio_id": {">=": lo, "<": hi}}
+    return stream_games(conn, platform_mapping, iter_marc_records(query), progress=progress)
+
+def work_on_shards(conn, run_id, owner, platform_mapping):
+    """Réserve et traite des shards jusqu'à ce qu'il n'y en ait plus en attente."""
+    done = 0
+    while True:
+        shard = db.claim_shard(conn, run_id, owner)
+        if shard is None:
+            return done
+        shard_no, lo, hi = shard
+        print(f"\n[{owner}] Shard {shard_no}: biblio_id [{lo}, {hi})")
+        # Battement après chaque lot écrit : un shard long n'est pas pris pour mort
+        count = crawl_shard(conn, platform_mapping, lo, hi,
+                            progress=lambda n: db.touch_shard(conn, run_id, shard_no, owner, n))
+        if not db.complete_shard(conn, run_id, shard_no, owner, count):
+            print(f"[{owner}] Shard {shard_no} repris par un autre worker entre-temps")
+        done += 1
+
+def shard_worker(run_id, platform_mapping=None):
+    """Point d'entrée d'un worker (processus local ou --shard-worker sur une autre machine)."""
+    conn = db.create_connection()
+    try:
+        db.use_database(conn)
+        if platform_mapping is None:
+            platform_mapping = load_ludov_platform_mapping()
+        owner = f"{socket.gethostname()}:{os.getpid()}"
+        done = work_on_shards(conn, run_id, owner, platform_mapping)
+        print(f">>> [{owner}] {done} shards traites")
+    finally:
+        conn.close()
+
+def run_sharded_seed(conn, ckpt, platform_mapping, shards, workers=None):
+    """
+    Seed complet avec crawl des jeux shardé. Consoles et accessoires (petits)
+    passent d'abord par leur crawl dédié : les jeux en dépendent.
+    Retourne le high-water mark (début du run, conservé au checkpoint).
+    """
+    cursor = ckpt.cursor("JEU")
+    if cursor.get("started"):
+        started = iso_to_toronto(cursor["started"])
+    else:
+        # Avant le crawl des consoles : une reprise garde le début du premier run
+        started = datetime.now(TIMEZONE)
+        ckpt.set_cursor("JEU", started=started.isoformat())
+    if not ckpt.is_done("CONSOLE"):
+        fetch_console(conn)
+        ckpt.mark_done("CONSOLE")
+    if not ckpt.is_done("ACCESSOIRE"):
+        fetch_accessoires(conn)
+        ckpt.mark_done("ACCESSOIRE")
+    if ckpt.is_done("JEU"):
+        return started
+
+    run_id = cursor.get("run_id")
+    if not run_id:
+        run_id = started.strftime("%Y%m%d%H%M%S")
+        max_id = fetch_max_biblio_id({"item_type": "JEU"})
+        ranges = shard_ranges(max_id, shards)
+        db.create_shards(conn, run_id, ranges)
+        db.set_state(conn, SHARD_RUN_KEY, run_id)
+        ckpt.set_cursor("JEU", run_id=run_id, started=started.isoformat())
+        print(f"\n=== SEED JEUX SHARDE : {len(ranges)} plages jusqu'a biblio_id {max_id} (run {run_id}) ===")
+    else:
+        print(f"\n>>> Reprise du seed shard {run_id}")
+        db.requeue_shards(conn, run_id)
+
+    workers = workers if workers is not None else min(shards, os.cpu_count() or 1)
+    # spawn : chaque worker a sa propre session HTTP et sa propre connexion MySQL
+    ctx = multiprocessing.get_context("spawn")
+    procs = [ctx.Process(target=shard_worker, args=(run_id, platform_mapping))
+             for _ in range(max(workers - 1, 0))]
+    for p in procs:
+        p.start()
+
+    # Le coordinateur travaille aussi, puis attend les shards des autres workers
+    owner = f"{socket.gethostname()}:{os.getpid()}"
+    while True:
+        work_on_shards(conn, run_id, owner, platform_mapping)
+        for p in procs:
+            if p.exitcode not in (None, 0):
+                db.requeue_shards(conn, run_id, owner=f"{socket.gethostname()}:{p.pid}")
+        progress = db.shard_progress(conn, run_id)
+        print(f"Shards: {progress['done']} termines / {progress['running']} en cours / "
+              f"{progress['pending']} en attente ({progress['records']} jeux)")
+        if not progress["pending"] and not progress["running"]:
+            break
+        db.requeue_shards(conn, run_id, stale_minutes=SHARD_STALE_MINUTES)
+        time.sleep(5)
+
+    for p in procs:
+        p.join()
+    db.set_state(conn, SHARD_RUN_KEY, "")
+    ckpt.mark_done("JEU")
+    return started
+
 def get_toronto_tz():
     if ZoneInfo:
         try:
@@ -385,197 +660,178 @@ def iso_to_toronto(iso_str: str) -> datetime:
         dt = dt.replace(tzinfo=ZoneInfo("UTC") if ZoneInfo else None)
     return dt.astimezone(TIMEZONE)
 
-def fetch_all_biblios():
-    global ALL_BIBLIOS
-    page = 1
-    ALL_BIBLIOS = []
-    total = 0
-    print("\n=== TELECHARGEMENT DES DONNEES KOHA ===")
+def page_sizer(initial):
+    """Contrôleur de `_per_page` pour un crawl Koha (taille fixe si KOHA_ADAPTIVE_PAGING=false)."""
+    if not ADAPTIVE_PAGING:
+        return paginator.PageSizer.fixed(initial)
+    return paginator.PageSizer(initial, min_size=PAGE_MIN, max_size=PAGE_MAX,
+                               target_seconds=PAGE_TARGET_SECONDS)
 
-    while True:
-        try:
-            batch = fetch_biblios_page(page)
-        except Exception as e:
-            print(f"Erreur reseau/API page {page}: {e}")
-            break
+def iter_catalog_checkpointed(ckpt, item_type, accept="application/marc-in-json"):
+    """
+    Notices d'un item_type, page par page, avec reprise : les pages déjà
+    conservées au checkpoint sont rejouées depuis le disque, puis le
+    téléchargement continue à la page suivante.
+    """
+    stage = f"ingest_{item_type}"
+    query = {"item_type": item_type}
+    cursor = ckpt.cursor(stage)
+    offset = cursor.get("offset", 0)
 
-        if not batch:
-            break
+    replayed = 0
+    for _, records in ckpt.spooled_pages(stage):
+        replayed += 1
+        yield from records
+    if replayed:
+        print(f">>> Reprise: {replayed} pages {item_type} rejouees depuis le checkpoint")
 
-        ALL_BIBLIOS.extend(batch)
-        total += len(batch)
+    if ckpt.is_done(stage):
+        return
 
-        if len(batch) < PER_PAGE:
-            break
-        page += 1
+    print(f"\n=== TELECHARGEMENT DES NOTICES KOHA ({item_type}) ===")
 
-    print(f">>> Donnees Koha telechargees : {len(ALL_BIBLIOS)} enregistrements")
-    return ALL_BIBLIOS
+    sizer = page_sizer(CATALOG_PAGE_SIZE)
+
+    def fetch(page=None, page_size=None, url=None):
+        return list(fetch_biblios_page(page, accept, page_size, query)), None
+
+    try:
+        pages = paginator.iter_pages(fetch, sizer, KOHA_CONCURRENCY,
+                                     start_page=cursor.get("page", 0) + 1, start_offset=offset)
+        for page, records in pages:
+            offset += len(records)
+            ckpt.spool_page(stage, page, records, offset=offset)
+            print(f"Page {page}: {len(records)} notices (checkpoint)")
+            yield from records
+    except Exception as e:
+        print(f"Erreur reseau/API: {e}")
+        print("Relancez avec --resume pour reprendre apres la derniere page conservee.")
+        raise
+    print(sizer.summary())
+    ckpt.mark_done(stage)
 
-def fetch_biblios_page(page: int):
+def fetch_biblios_page(page: int, accept="application/json", page_size=CATALOG_PAGE_SIZE, query=None):
+    """Ouvre une page Koha en streaming et retourne un générateur de notices."""
     url = f"{BASE_URL}{ENDPOINT}"
     headers = {
-        "Accept": "application/json",
-        "Accept-Encoding": "gzip",
-        "User-Agent": "LUDOVSeeder/2.0",
+        "Accept": accept,
     }
-    params = {"_page": page, "_per_page": PER_PAGE}
-    resp = requests.get(
-        url,
-        auth=HTTPBasicAuth(USERNAME, PASSWORD),
-        headers=headers,
-        params=params,
-        timeout=60
-    )
-    resp.raise_for_status()
-    return resp.json()
+    params = {"_page": page, "_per_page": page_size}
+    if query:
+        params["q"] = json.dumps(query)
+    resp = HTTP.get(url, auth=KOHA_AUTH, headers=headers, params=params, stream=True)
+    try:
+        resp.raise_for_status()
+    except Exception:
+        resp.close()
+        raise
+    return json_stream.iter_response_records(resp, marc=accept == "application/marc-in-json")
+
+MARC_PAGE_SIZE = int(CONFIG.get("KOHA_MARC_PAGE_SIZE") or 500)
+
+def marc_005_to_toronto(iso_005):
+    """005 ("YYYYMMDDhhmmss.f", heure locale du serveur Koha) -> datetime Toronto, ou None."""
+    try:
+        core = (iso_005 or "").split('.')[0]
+        return datetime.strptime(core, "%Y%m%d%H%M%S").replace(tzinfo=TIMEZONE)
+    except ValueError:
+        return None
+
+def iso_005_to_datetime(iso_005):
+    return extraction.iso_005_to_datetime(iso_005, TIMEZONE)
 
-def fetch_games_from_marc(conn, platform_mapping):
+def iter_marc_records(query=None, page_size=MARC_PAGE_SIZE):
     """
-    Importe/maj les JEUX depuis l'API Koha en MARC-in-JSON.
-    Utilise en priorité platform_mapping (Ludov), sinon 753$a.
+    Génère les notices MARC-in-JSON d'une requête Koha (q JSON optionnel).
+    Suit le lien `next` si l'API le fournit, sinon pagine avec `_page` ;
+    les pages suivantes sont préchargées en parallèle (KOHA_CONCURRENCY)
+    et `page_size` n'est que la taille initiale (pagination adaptative).
     """
-    print("\n=== SEED JEUX (MARC-in-JSON) : démarrage ===")
-    url = f"{BASE_URL}{ENDPOINT}"
-    page_size = min(PER_PAGE if isinstance(PER_PAGE, int) and PER_PAGE > 0 else 500, 500)
+    endpoint = f"{BASE_URL}{ENDPOINT}"
     headers = {
         "Accept": "application/marc-in-json",
-        "Accept-Encoding": "gzip",
-        "User-Agent": "LUDOVSeeder/2.0",
     }
-    params = {"_per_page": page_size, "q": json.dumps({"item_type": "JEU"})}
-
-    type_map = db.get_console_type_id_map(conn)  # {name_lower: id}
-    to_upsert = []
-    stats = {"total": 0, "mapped_ludov": 0, "mapped_753": 0}
+    base_params = {}
+    if query:
+        base_params["q"] = json.dumps(query)
+    sizer = page_sizer(page_size)
 
-    def resolve_platforms(row):
-        """
-        Retourne (platform_name, platform_id, console_koha_id, console_type_id).
-        Priorité: platform_mapping (Ludov) -> 753$a (première plateforme reconnue).
-        """
-        biblio_id = str(row["biblio_id"])
-        # 1) Mapping Ludov si dispo
-        pm = platform_mapping.get(biblio_id)
-        if pm:
-            name = pm.get("console")
-            igdb_id = pm.get("igdb_id")
-            koha_console_id = pm.get("koha_console_id")
-            ctid = type_map.get((name or "").strip().lower())
-            return (name, int(igdb_id) if igdb_id is not None else None,
-                    int(koha_console_id) if koha_console_id is not None else None,
-                    int(ctid) if ctid is not None else None, True)
-
-        # 2) Sinon 753$a (choisir la première reconnue)
-        for candidate in (row.get("platforms") or []):
-            name = candidate.strip()
-            if not name:
-                continue
-            igdb_id = PLATFORM_NAME_TO_IGDB.get(name)  # mapping existant
-            ctid = type_map.get(name.strip().lower())
-            if igdb_id or ctid:
-                return (name,
-                        int(igdb_id) if igdb_id is not None else None,
-                        None,
-                        int(ctid) if ctid is not None else None,
-                        False)
-        return (None, None, None, None, None)
-
-    def iso_005_to_datetime(iso_005):
-        # 005 ~ "YYYYMMDDhhmmss.s" -> on tolère, sinon NOW()
-        from datetime import datetime
-        try:
-            core = iso_005.split('.')[0]
-            dt = datetime.strptime(core, "%Y%m%d%H%M%S")
-            return dt.strftime("%Y-%m-%d %H:%M:%S")
-        except Exception:
-            # fallback: utiliser fenêtre Toronto déjà définie si tu veux,
-            # ici on fait simple:
-            from datetime import datetime
-            return datetime.now(TIMEZONE).strftime("%Y-%m-%d %H:%M:%S")
-
-    # 1ère page
-    resp = requests.get(url, auth=HTTPBasicAuth(USERNAME, PASSWORD), headers=headers, params=params, timeout=60)
-    resp.raise_for_status()
-    data = resp.json()
-    if isinstance(data, dict):
-        records = data.get("records") or data.get("items") or data.get("data") or []
-        next_url = data.get("next") or (data.get("_links", {}) or {}).get("next")
-    else:
-        records = data if isinstance(data, list) else []
-        next_url = None
-
-    known_acc_ids = db.get_known_accessory_ids(conn)
-
-    def consume(recs):
-        added = 0
-        for rec in recs:
-            row = marc.extract_game_row(rec)
-            if not row:
-                continue
-            platform_name, platform_id, console_koha_id, console_type_id, via_ludov = resolve_platforms(row)
-            if via_ludov is True:
-                stats["mapped_ludov"] += 1
-            elif via_ludov is False:
-                stats["mapped_753"] += 1
-
-            req_acc = row.get("required_accessories") or []
-            req_acc = [i for i in req_acc if i in known_acc_ids]
-
-            req_acc_json = json.dumps(req_acc) if req_acc else None
-
-            to_upsert.append((
-                row["biblio_id"],                # biblio_id
-                row["titre"],                    # titre
-                row.get("author"),               # author
-                platform_name,                   # platform
-                platform_id,                     # platform_id
-                console_koha_id,                 # console_koha_id
-                console_type_id,                 # console_type_id
-                req_acc_json,                    # required_accessories
-                iso_005_to_datetime(row.get("timestamp") or ""),  # createdAt
-            ))
-            stats["total"] += 1
-        return added
-
-    consume(records)
-    page_idx = 1
-    while next_url:
-        page_idx += 1
-        r = requests.get(next_url, auth=HTTPBasicAuth(USERNAME, PASSWORD), headers=headers, timeout=60)
-        r.raise_for_status()
-        data = r.json()
+    # Pas de cache disque pour les pages : avec la taille adaptative et le `q`
+    # horodaté de la sync, la même (page, taille, requête) ne revient presque jamais.
+    def fetch(page=None, page_size=None, url=None):
+        if url:
+            resp = HTTP.get(url, auth=KOHA_AUTH, headers=headers)
+        else:
+            params = dict(base_params, _page=page, _per_page=page_size)
+            resp = HTTP.get(endpoint, auth=KOHA_AUTH, headers=headers, params=params)
+        resp.raise_for_status()
+        data = json_stream.decode(resp.content, marc=True)
         if isinstance(data, dict):
             records = data.get("records") or data.get("items") or data.get("data") or []
             next_url = data.get("next") or (data.get("_links", {}) or {}).get("next")
         else:
             records = data if isinstance(data, list) else []
             next_url = None
-        consume(records)
-
-    # Fallback pagination _page si next absent
-    if not next_url and len(records) == page_size:
-        page = 2
-        while True:
-            params["_page"] = page
-            r = requests.get(url, auth=HTTPBasicAuth(USERNAME, PASSWORD), headers=headers, params=params, timeout=60)
-            r.raise_for_status()
-            data = r.json()
-            if isinstance(data, dict):
-                page_records = data.get("records") or data.get("items") or data.get("data") or []
-            else:
-                page_records = data if isinstance(data, list) else []
-            if not page_records:
-                break
-            consume(page_records)
-            if len(page_records) < page_size:
-                break
-            page += 1
-
-    if not to_upsert:
-        print("Aucun jeu à insérer (MARC).")
+        return records, next_url, len(resp.content)
+
+    for page, records in paginator.iter_pages(fetch, sizer, KOHA_CONCURRENCY):
+        print(f"Page {page}: {len(records)} notices reçues")
+        yield from records
+    if sizer.stats["pages"] > 1:
+        print(sizer.summary())
+
+def extraction_lookups(platform_mapping, conn):
+    """
+    Tables en lecture seule de l'extraction (chargées une fois par worker).
+    Consoles et accessoires doivent déjà être en base (voir SEED_ORDER).
+    """
+    return {
+        "platform_mapping": platform_mapping or {},
+        "name_to_igdb": PLATFORM_NAME_TO_IGDB,
+        "timezone": TIMEZONE,
+        "type_map": db.get_console_type_id_map(conn),  # {name_lower: id}
+        "known_acc_ids": db.get_known_accessory_ids(conn),
+    }
+
+@contextmanager
+def extraction_pool(lookups):
+    """Pool de processus d'extraction si EXTRACT_WORKERS > 1, sinon None (série)."""
+    if EXTRACT_WORKERS <= 1:
+        yield None
         return
+    with extraction.ExtractionPool(EXTRACT_WORKERS, lookups, EXTRACT_CHUNK_SIZE) as pool:
+        yield pool
+
+# ============================================
+# Consommateurs par item_type
+# ============================================
+# Chaque item_type a son propre flux de notices, écrit dans SEED_ORDER :
+# consoles (peu nombreuses, en un lot), puis accessoires et jeux en flux
+# borné (pipeline + upserts par lots), une fois leurs dépendances en base.
+
+class ConsoleSeeder:
+    def __init__(self):
+        self.consoles = []
+
+    def add(self, record):
+        row = marc.extract_console_row(record)
+        row.timestamp = iso_005_to_datetime(row.timestamp)
+        self.consoles.append(row)
+        return True
 
+    def finish(self, conn):
+        print("\n=== SEED CONSOLES: demarrage ===")
+        db.insert_console(conn, self.consoles)
+        return self.consoles
+
+def count_game(stats, row):
+    stats["total"] += 1
+    if row.via_ludov is True:
+        stats["mapped_ludov"] += 1
+    elif row.via_ludov is False:
+        stats["mapped_753"] += 1
+
+def print_game_stats(stats):
     print(f"\n{'='*60}")
     print("STATISTIQUES SEED JEUX (MARC)")
     print(f"{'='*60}")
@@ -583,12 +839,302 @@ def fetch_games_from_marc(conn, platform_mapping):
     print(f"Plateforme via Ludov    : {stats['mapped_ludov']}")
     print(f"Plateforme via 753$a    : {stats['mapped_753']}")
 
-    db.insertGameIntoDatabase(conn, to_upsert)
-    print("=== SEED JEUX (MARC-in-JSON) : terminé ===")
+def stream_games(conn, platform_mapping, records, progress=None):
+    """
+    Jeux en flux quand consoles et accessoires sont déjà en base :
+    fetch Koha -> extraction + résolution -> upserts par lots (UPSERT_BATCH_SIZE),
+    reliés par des files bornées. Retourne le nombre de jeux écrits.
+    progress(total) est appelé après chaque lot (sérialisé, sur `conn`).
+    """
+    print("\n=== SEED JEUX (MARC-in-JSON, flux) : démarrage ===")
+    lookups = extraction_lookups(platform_mapping, conn)
+    stats = {"total": 0, "mapped_ludov": 0, "mapped_753": 0}
+    writes = {"inserted": 0, "updated": 0, "unchanged": 0}
+    lock = threading.Lock()
+    # Vide au départ (seed, reseed) : tous les lots passent par LOAD DATA, pas seulement le premier
+    table_empty = db.table_is_empty(conn, db.table("games"))
+
+    def write(batch):
+        if UPSERT_WORKERS > 1:
+            with db.pooled() as wconn:
+                result = db.insertGameIntoDatabase(wconn, batch, table_empty)
+        else:
+            result = db.insertGameIntoDatabase(conn, batch, table_empty)
+        with lock:
+            for key, value in result.items():
+                writes[key] += value
+            for row in batch:
+                count_game(stats, row)
+            if progress is not None:
+                progress(stats["total"])
+
+    with extraction_pool(lookups) as pool:
+        if pool is not None:
+            stream = pool.stream("games")
+            extract = pipeline.Stage("extract", lambda record: [row for row, _ in stream.add(record)],
+                                     flush=lambda: [row for row, _ in stream.drain()], unit="notices")
+        else:
+            def extract_one(record):
+                row = extraction.extract_game(record, TIMEZONE)
+                return [extraction.resolve_game(row, lookups)] if row is not None else None
+            extract = pipeline.Stage("extract", extract_one, unit="notices")
+
+        flow = pipeline.Pipeline("jeux", PIPELINE_QUEUE_SIZE)
+        flow.run("fetch", records, extract,
+                 pipeline.batch_stage("upsert", UPSERT_BATCH_SIZE, write, unit="jeux",
+                                      workers=UPSERT_WORKERS),
+                 unit="notices")
+
+    flow.print_stats()
+    print_game_stats(stats)
+    db.print_write_stats("Total jeux", writes)
+    print("=== SEED JEUX (MARC-in-JSON, flux) : terminé ===")
+    return stats["total"]
 
+# Ordre d'écriture : les accessoires et les jeux résolvent console_type,
+# et les jeux filtrent leurs accessoires requis sur ceux déjà en base.
+SEED_ORDER = ("CONSOLE", "ACCESSOIRE", "JEU")
 
-def update_game_covers(conn, platform_mapping, fetch_all=False):
-    """Met à jour UNIQUEMENT les covers des jeux existants (ne touche pas aux plateformes)"""
+def ingest_catalog(conn, platform_mapping, source=None, snapshot_writer=None, ckpt=None, seen_ids=None,
+                   started=None):
+    """
+    Importe le catalogue MARC-in-JSON item_type par item_type (SEED_ORDER),
+    chacun en flux : rien n'est accumulé en mémoire en attendant les autres.
+    `source(item_type)` fournit les notices d'un item_type (défaut : crawl
+    Koha filtré sur 942$c ; sinon ex: sync incrémentale, snapshot) ;
+    `snapshot_writer` reçoit une copie de chaque notice.
+    Avec `ckpt`, le téléchargement et chaque écriture sont checkpointés :
+    les étapes déjà terminées ne sont pas refaites.
+    `seen_ids` ({item_type: set}) reçoit le biblionumber de chaque notice.
+    Retourne le high-water mark : min(début du run, plus récent 005 vu).
+    Le début du run (`started`, défaut : maintenant, relu du checkpoint à
+    la reprise) est pris avant la première page ; une notice modifiée
+    pendant le crawl, après le passage de sa page, est donc revue par la
+    prochaine sync.
+    """
+    if ckpt is not None:
+        stored = ckpt.cursor("ingest").get("started")
+        if stored:
+            started = iso_to_toronto(stored)
+        else:
+            started = started or datetime.now(TIMEZONE)
+            ckpt.set_cursor("ingest", started=started.isoformat())
+    elif started is None:
+        started = datetime.now(TIMEZONE)
+
+    if source is None and ckpt is not None:
+        source = lambda item_type: iter_catalog_checkpointed(ckpt, item_type)
+    elif source is None:
+        source = lambda item_type: iter_marc_records({"item_type": item_type})
+
+    writers = {
+        "CONSOLE": lambda records: fetch_console(conn, records),
+        "ACCESSOIRE": lambda records: fetch_accessoires(conn, records),
+        "JEU": lambda records: stream_games(conn, platform_mapping, records),
+    }
+    high_water = None
+
+    def routed(item_type):
+        nonlocal high_water
+        for record in source(item_type):
+            # Un seul parcours des champs : 005, biblionumber et l'extraction lisent l'index
+            view = marc.index_record(record)
+            ts = marc_005_to_toronto(marc.get_control_field(view, "005"))
+            if ts and (high_water is None or ts > high_water):
+                high_water = ts
+            if seen_ids is not None:
+                biblio_id = marc.get_biblio_id(view)
+                if biblio_id is not None:
+                    seen_ids[item_type].add(biblio_id)
+            if snapshot_writer is not None:
+                snapshot_writer.add_record(item_type, record)
+            yield view
+
+    for item_type in SEED_ORDER:
+        if ckpt is not None and ckpt.is_done(item_type):
+            print(f">>> Reprise: {item_type} deja importes, etape ignoree")
+            if snapshot_writer is not None:
+                # Pages rejouées depuis le spool : le snapshot reste complet
+                for record in source(item_type):
+                    snapshot_writer.add_record(item_type, record)
+            continue
+        writers[item_type](routed(item_type))
+        if ckpt is not None:
+            ckpt.mark_done(item_type)
+    return min(started, high_water) if high_water else started
+
+def save_high_water(conn, high_water):
+    if high_water is None:
+        return
+    db.set_state(conn, HIGH_WATER_KEY, high_water.isoformat())
+    print(f">>> High-water mark enregistre : {high_water.isoformat()}")
+
+def seed_from_snapshot(conn, path, confirm=True):
+    """Vide la BD et la reconstruit depuis un snapshot (aucun appel réseau)."""
+    print(f"\n=== SEED DEPUIS SNAPSHOT : {path} ===")
+    reader = snapshot.SnapshotReader(path)
+    print(f"Snapshot v{reader.header['version']} cree le {reader.header.get('created_at')} "
+          f"(seeder {reader.header.get('app_version')})")
+
+    if confirm:
+        db.preview_wipe(conn)
+        input("\nLa BD sera videe. Appuyez sur Entree pour confirmer...")
+    db.confirm_and_wipe(conn)
+    db.migrate(conn)
+
+    platform_mapping = reader.platform_mapping()
+    print(f">>> {len(platform_mapping)} jeux avec plateforme (snapshot)")
+
+    # Les notices datent de la création du snapshot, pas de ce run
+    created = reader.header.get("created_at")
+    started = iso_to_toronto(created) if created else None
+    high_water = ingest_catalog(conn, platform_mapping, reader.records, started=started)
+    save_high_water(conn, high_water)
+    db.apply_game_covers(conn, reader.covers())
+    print("=== SEED DEPUIS SNAPSHOT : termine ===")
+
+def sync_catalog(conn, platform_mapping):
+    """
+    Sync incrémentale : ne récupère que les notices modifiées depuis le
+    dernier high-water mark (filtre Koha sur `timestamp`) et les upsert.
+    Sans mark enregistré, on prend la fenêtre depuis hier 5h (Toronto).
+    """
+    print("\n=== SYNC INCREMENTALE KOHA ===")
+    stored = db.get_state(conn, HIGH_WATER_KEY)
+    if stored:
+        since = iso_to_toronto(stored)
+    else:
+        since, _ = window_for_today_5am_toronto()
+        print("Aucun high-water mark enregistre, fenetre par defaut depuis hier 5h.")
+    print(f"Notices modifiees depuis : {since.isoformat()}")
+
+    def changed_records(item_type):
+        # >= : une notice modifiée dans la même seconde que le mark est repassée
+        # (upsert idempotent) plutôt que perdue.
+        query = {"item_type": item_type, "timestamp": {">=": since.isoformat()}}
+        for record in iter_marc_records(query):
+            if CHECK_DATE:
+                ts = marc_005_to_toronto(marc.get_control_field(record, "005"))
+                if ts and ts < since:
+                    continue
+            yield record
+
+    high_water = ingest_catalog(conn, platform_mapping, changed_records)
+    save_high_water(conn, high_water)
+
+
+def reconcile_catalog(conn, platform_mapping):
+    """
+    Crawl complet sans wipe : upserts habituels, puis retrait des consoles,
+    accessoires et jeux absents de Koha (différence d'ensembles entre les
+    biblionumbers vus dans Koha et ceux actifs en BD). Les lignes encore
+    référencées par une réservation sont désactivées plutôt que supprimées.
+    """
+    print("\n=== RECONCILIATION KOHA ===")
+    seen_ids = {item_type: set() for item_type in SEED_ORDER}
+    high_water = ingest_catalog(conn, platform_mapping, seen_ids=seen_ids)
+    save_high_water(conn, high_water)
+
+    print(f"\n{'='*60}")
+    print("STATISTIQUES RECONCILIATION")
+    print(f"{'='*60}")
+    # Jeux d'abord : ils référencent consoles et accessoires
+    for item_type in reversed(SEED_ORDER):
+        seen = seen_ids[item_type]
+        active = set(db.iter_active_keys(conn, item_type))
+        removed = active - seen
+        label = f"{item_type:<10}: {len(seen)} dans Koha, {len(active)} actifs en BD"
+        if len(removed) > max(len(active) * RECONCILE_MAX_REMOVE_RATIO, 10):
+            print(f"{label}, {len(removed)} a retirer : au-dela de "
+                  f"{RECONCILE_MAX_REMOVE_RATIO:.0%}, retrait annule (crawl incomplet ?)")
+            continue
+        stats = db.retire_rows(conn, item_type, removed)
+        print(f"{label}, {len(active & seen)} conserves, "
+              f"{stats['deleted']} supprimes, {stats['retired']} desactives")
+    print(f"{'='*60}")
+
+def run_shadow_reseed(conn):
+    """
+    Reseed blue/green : le catalogue complet est écrit dans games__new,
+    accessoires__new et console_stock__new pendant que l'app continue de lire
+    les tables live ; après reprise des id / covers et contrôle des comptes,
+    un seul RENAME TABLE bascule les trois tables. Les anciennes restent en
+    __old (--rollback-reseed). Un run interrompu laisse les tables live intactes.
+    Retourne True si la bascule a eu lieu.
+    """
+    print("\n=== RESEED BLUE/GREEN ===")
+    platform_mapping = load_ludov_platform_mapping()
+
+    db.create_shadow_tables(conn)
+    with db.shadow_writes():
+        high_water = ingest_catalog(conn, platform_mapping)
+    carried = db.carry_over_shadow(conn)
+    ok, counts = db.validate_shadow(conn, SHADOW_MIN_RATIO)
+
+    print(f"\n{'='*60}")
+    print("CONTROLE DES TABLES FANTOMES")
+    print(f"{'='*60}")
+    for item_type, spec in db.RECONCILE_TABLES.items():
+        live, shadow = counts[spec["table"]]
+        print(f"{spec['table']:<14}: live {live:>7}, fantome {shadow:>7} "
+              f"(dont {carried[item_type]} retires de Koha mais references)")
+    if not ok:
+        print(f"Bascule annulee : une table fantome a moins de {SHADOW_MIN_RATIO:.0%} des lignes live. "
+              f"Tables live inchangees, tables {db.SHADOW_SUFFIX} conservees pour inspection.")
+        return False
+    orphans = db.shadow_orphans(conn)
+    if orphans:
+        for child_fk, count in orphans.items():
+            print(f"{child_fk}: {count} lignes pointeraient vers un id absent des tables fantomes")
+        print(f"Bascule annulee : reservations orphelines apres bascule. "
+              f"Tables live inchangees, tables {db.SHADOW_SUFFIX} conservees pour inspection.")
+        return False
+
+    db.swap_shadow_tables(conn)
+    save_high_water(conn, high_water)
+    print(f"=== RESEED BLUE/GREEN : termine (anciennes tables en {db.OLD_SUFFIX}) ===")
+    return True
+
+class CoverWriter:
+    """
+    Tampon des covers trouvées, écrit par db.write_game_covers quand il
+    atteint COVER_BATCH_SIZE ou que COVER_FLUSH_SECONDS sont écoulées.
+    Le checkpoint n'avance qu'au flush : une reprise ne saute jamais un jeu
+    dont la cover n'a pas été écrite.
+    """
+
+    def __init__(self, conn, ckpt=None, fetch_all=False):
+        self.conn = conn
+        self.ckpt = ckpt
+        self.fetch_all = fetch_all
+        self.pending = []
+        self.last_id = None
+        self.written = 0
+        self.flushed_at = time.monotonic()
+
+    def add(self, game_id, cover_url):
+        self.pending.append((game_id, cover_url))
+
+    def done(self, game_id):
+        """Jeu traité (cover trouvée ou non) ; flush si un seuil est atteint."""
+        self.last_id = game_id
+        if (len(self.pending) >= COVER_BATCH_SIZE
+                or time.monotonic() - self.flushed_at >= COVER_FLUSH_SECONDS):
+            self.flush()
+
+    def flush(self):
+        if self.pending:
+            self.written += db.write_game_covers(self.conn, self.pending, batch=COVER_BATCH_SIZE)
+            self.pending = []
+        if self.ckpt is not None and self.last_id is not None:
+            self.ckpt.set_cursor("covers", fetch_all=self.fetch_all, last_id=self.last_id)
+        self.flushed_at = time.monotonic()
+
+def update_game_covers(conn, platform_mapping, fetch_all=False, ckpt=None):
+    """
+    Met à jour UNIQUEMENT les covers des jeux existants (ne touche pas aux plateformes).
+    Avec `ckpt`, le dernier jeu traité est checkpointé et une reprise continue après lui.
+    """
     print("\n=== MISE A JOUR DES COVERS IGDB ===")
     
     # Initialiser client IGDB
@@ -614,7 +1160,14 @@ def update_game_covers(conn, platform_mapping, fetch_all=False):
         """
         print("Mode: Uniquement les covers manquantes (jeux avec plateforme uniquement)")
     
-    cursor.execute(query)
+    last_id = ckpt.cursor("covers").get("last_id", 0) if ckpt is not None else 0
+    if last_id:
+        print(f">>> Reprise apres le jeu id={last_id}")
+    query += " AND id > %s ORDER BY id"
+    if ckpt is not None:
+        ckpt.set_cursor("covers", fetch_all=fetch_all, last_id=last_id)
+    
+    cursor.execute(query, (last_id,))
     games = cursor.fetchall()
     total = len(games)
     
@@ -628,57 +1181,60 @@ def update_game_covers(conn, platform_mapping, fetch_all=False):
     stats = {"processed": 0, "found": 0, "failed": 0}
     failed_games = []
     start_time = time.time()
+    writer = CoverWriter(conn, ckpt, fetch_all)
     
-    for idx, game in enumerate(games, 1):
-        game_id = game['id']
-        titre = game['titre']
-        platform_id = game['platform_id']
-        
-        # Calcul progression
-        elapsed = time.time() - start_time
-        rate = idx / elapsed if elapsed > 0 else 0
-        remaining = total - idx
-        eta = remaining / rate if rate > 0 else 0
-        
-        print(f"\n[{idx}/{total}] {titre[:50]}")
-        print(f"    Stats: {stats['found']} trouvees / {stats['failed']} manquees")
-        print(f"    Vitesse: {rate:.1f} jeux/sec | ETA: {eta/60:.1f} min")
-        
-        try:
-            cover_url = igdb_client.search_game_cover(titre, platform_id)
+    try:
+        for idx, game in enumerate(games, 1):
+            game_id = game['id']
+            titre = game['titre']
+            platform_id = game['platform_id']
+            
+            # Calcul progression
+            elapsed = time.time() - start_time
+            rate = idx / elapsed if elapsed > 0 else 0
+            remaining = total - idx
+            eta = remaining / rate if rate > 0 else 0
             
-            if cover_url:
-                # Met à jour UNIQUEMENT la cover (pas les infos de plateforme)
-                cursor.execute("""
-                    UPDATE games 
-                    SET picture = %s,
-                        lastUpdatedAt = NOW()
-                    WHERE id = %s
-                """, (cover_url, game_id))
-                conn.commit()
+            print(f"\n[{idx}/{total}] {titre[:50]}")
+            print(f"    Stats: {stats['found']} trouvees / {stats['failed']} manquees")
+            print(f"    Vitesse: {rate:.1f} jeux/sec | ETA: {eta/60:.1f} min")
+            
+            try:
+                cover_url = igdb_client.search_game_cover(titre, platform_id)
                 
-                stats["found"] += 1
-                print(f"    >>> Cover trouvee")
-            else:
+                if cover_url:
+                    # Met à jour UNIQUEMENT la cover (pas les infos de plateforme), au prochain flush
+                    writer.add(game_id, cover_url)
+                    
+                    stats["found"] += 1
+                    print(f"    >>> Cover trouvee")
+                else:
+                    stats["failed"] += 1
+                    failed_games.append({
+                        "titre": titre,
+                        "biblio_id": game.get('biblio_id')
+                    })
+                    print(f"    XXX Pas de cover")
+                
+                stats["processed"] += 1
+                time.sleep(0.26)
+                
+            except Exception as e:
                 stats["failed"] += 1
                 failed_games.append({
                     "titre": titre,
-                    "biblio_id": game.get('biblio_id')
+                    "erreur": str(e)
                 })
-                print(f"    XXX Pas de cover")
-            
-            stats["processed"] += 1
-            time.sleep(0.26)
+                print(f"    ERREUR: {e}")
             
-        except Exception as e:
-            stats["failed"] += 1
-            failed_games.append({
-                "titre": titre,
-                "erreur": str(e)
-            })
-            print(f"    ERREUR: {e}")
+            writer.done(game_id)
+    finally:
+        # Aussi sur Ctrl+C / erreur : aucune cover trouvée n'est perdue
+        writer.flush()
     
     cursor.close()
+    if ckpt is not None:
+        ckpt.mark_done("covers")
     
     # Stats finales
     total_time = time.time() - start_time
@@ -687,6 +1243,7 @@ def update_game_covers(conn, platform_mapping, fetch_all=False):
     print(f"{'='*60}")
     print(f"Jeux traites: {stats['processed']}")
     print(f"Covers trouvees: {stats['found']}")
+    print(f"Covers ecrites en BD: {writer.written}")
     print(f"Covers manquantes: {stats['failed']}")
     print(f"Taux de succes: {stats['found']/stats['processed']*100:.1f}%" if stats['processed'] > 0 else "N/A")
     print(f"Temps total: {total_time/60:.1f} min")
@@ -703,118 +1260,58 @@ def update_game_covers(conn, platform_mapping, fetch_all=False):
         if len(failed_games) > 50:
             print(f"\n... et {len(failed_games) - 50} autres jeux")
 
-def fetch_console(conn):
-    print("\n=== SEED CONSOLES: demarrage ===")
-    url = f"{BASE_URL}{ENDPOINT}"
-    headers = {
-        "Accept": "application/json",
-        "Accept-Encoding": "gzip",
-        "User-Agent": "LUDOVSeeder/2.0",
-    }
-    params = {"_per_page": PER_PAGE, "q" : json.dumps({"item_type": "CONSOLE"})}
-    resp = requests.get(
-        url,
-        auth=HTTPBasicAuth(USERNAME, PASSWORD),
-        headers=headers,
-        params=params,
-        timeout=60
-    )
-    resp.raise_for_status()
-
-    consoles = resp.json()
+def fetch_console(conn, records=None):
+    if records is None:
+        records = iter_marc_records({"item_type": "CONSOLE"})
+    seeder = ConsoleSeeder()
+    for record in records:
+        seeder.add(record)
+    return seeder.finish(conn)
 
-    db.insert_console(conn, consoles)
-    return consoles
-
-def fetch_accessoires(conn):
-    print("\n=== SEED ACCESSOIRES: démarrage ===")
-    url = f"{BASE_URL}{ENDPOINT}"
-
-    page_size = min(PER_PAGE if isinstance(PER_PAGE, int) and PER_PAGE > 0 else 500, 500)
-    headers = {
-        "Accept": "application/marc-in-json",
-        "Accept-Encoding": "gzip",
-        "User-Agent": "LUDOVSeeder/2.0",
-    }
-    params = {
-        "_per_page": page_size,
-        "q": json.dumps({"item_type": "ACCESSOIRE"})
-    }
+def fetch_accessoires(conn, records=None):
+    if records is None:
+        records = iter_marc_records({"item_type": "ACCESSOIRE"})
+    print("\n=== SEED ACCESSOIRES (flux): démarrage ===")
+    seen_koha = set()
+    written = []
+    writes = {"inserted": 0, "updated": 0, "unchanged": 0}
+    table_empty = db.table_is_empty(conn, db.table("accessoires"))
 
-    results, seen_koha = [], set()
-
-    def consume(records_list):
-        added = 0
-        for rec in records_list:
-            row = marc.extract_accessoire_row(rec)
-            if not (row.get("name") or row.get("koha_id") or row.get("hidden")):
-                continue
-            kid = row.get("koha_id")
-            if kid:
-                try:
-                    kid_int = int(kid)
-                except Exception:
-                    continue
-                if kid_int in seen_koha:
-                    continue
-                seen_koha.add(kid_int)
-                row["koha_id"] = kid_int
-            results.append(row); added += 1
-        return added
+    def accept(row):
+        """Filtre les notices vides et les koha_id déjà vus (koha_id converti en int)."""
+        if not (row.name or row.koha_id or row.hidden):
+            return False
+        kid = row.koha_id
+        if kid:
+            try:
+                kid_int = int(kid)
+            except Exception:
+                return False
+            if kid_int in seen_koha:
+                return False
+            seen_koha.add(kid_int)
+            row.koha_id = kid_int
+        return True
 
-    resp = requests.get(url, auth=HTTPBasicAuth(USERNAME, PASSWORD), headers=headers, params=params, timeout=60)
-    resp.raise_for_status()
-    data = resp.json()
-    if isinstance(data, dict):
-        records = data.get("records") or data.get("items") or data.get("data") or []
-        next_url = data.get("next") or (data.get("_links", {}) or {}).get("next")
-    else:
-        records = data if isinstance(data, list) else []
-        next_url = None
+    def extract(record):
+        row = extraction.extract_accessory(record)
+        return [row] if accept(row) else None
 
-    added = consume(records)
-    print(f"Page 1: {len(records)} reçus / {added} ajoutés (cumul: {len(results)})")
+    def write(batch):
+        for key, value in (db.insert_accessoires(conn, batch, table_empty) or {}).items():
+            writes[key] += value
+        written.append(len(batch))
 
-    page_idx = 1
-    while next_url:
-        page_idx += 1
-        resp = requests.get(next_url, auth=HTTPBasicAuth(USERNAME, PASSWORD), headers=headers, timeout=60)
-        resp.raise_for_status()
-        data = resp.json()
-        if isinstance(data, dict):
-            records = data.get("records") or data.get("items") or data.get("data") or []
-            next_url = data.get("next") or (data.get("_links", {}) or {}).get("next")
-        else:
-            records = data if isinstance(data, list) else []
-            next_url = None
-        added = consume(records)
-        print(f"Page (next) {page_idx}: {len(records)} reçus / {added} ajoutés (cumul: {len(results)})")
-
-    if not next_url and len(records) == page_size:
-        page = 2
-        while True:
-            params["_page"] = page
-            resp = requests.get(url, auth=HTTPBasicAuth(USERNAME, PASSWORD), headers=headers, params=params, timeout=60)
-            resp.raise_for_status()
-            data = resp.json()
-            if isinstance(data, dict):
-                page_records = data.get("records") or data.get("items") or data.get("data") or []
-            else:
-                page_records = data if isinstance(data, list) else []
-            if not page_records:
-                break
-            added = consume(page_records)
-            print(f"Page {page}: {len(page_records)} reçus / {added} ajoutés (cumul: {len(results)})")
-            if len(page_records) < page_size:
-                break
-            page += 1
-
-    print(f">>> Total accessoires prêts à insérer: {len(results)}")
-    if results:
-        db.insert_accessoires(conn, results)
-
-    print("=== SEED ACCESSOIRES: terminé ===")
-    return results
+    flow = pipeline.Pipeline("accessoires", PIPELINE_QUEUE_SIZE)
+    flow.run("fetch", records,
+             pipeline.Stage("extract", extract, unit="notices"),
+             pipeline.batch_stage("upsert", UPSERT_BATCH_SIZE, write, unit="lignes"),
+             unit="notices")
+    flow.print_stats()
+    print(f">>> Total accessoires envoyés: {sum(written)}")
+    db.print_write_stats("Total accessoires", writes)
+    return sum(written)
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support()
     main()
\ No newline at end of file
@@ -9,28 +9,93 @@ Fonctions publiques conservant les mêmes noms que ton code existant :
 - first_subfield(record, tag, code)
 - all_subfields(record, tag, code)
 - record_to_flat_map(record)
+- get_item_type(record)
+- index_record(record) / MarcIndex
+- Col / compile_plan(columns) (plans ACCESSOIRE_PLAN, CONSOLE_PLAN, GAME_PLAN)
 - extract_accessoire_row(record)
+- extract_console_row(record)
+- extract_game_row(record)
 
 Améliorations :
 - Typage léger (facultatif) et docstrings.
+- Extraction par plans déclaratifs (ACCESSOIRE_PLAN, CONSOLE_PLAN,
+  GAME_PLAN) compilés une fois, qui produisent des lignes typées de rows.py.
 - Nettoyage/normalisation des plateformes (753$a) :
   - split sur virgules/points-virgules/espaces multiples,
   - trim, déduplication, suppression des vides.
-- Retour JSON valide pour "console" (liste de plateformes) ou "null" si aucune.
+- Vue indexée (MarcIndex) : `fields` est parcouru une seule fois, puis
+  chaque recherche tag/sous-zone est un accès dict. Les primitives
+  acceptent indifféremment une notice brute ou un MarcIndex.
 """
 
 from __future__ import annotations
-from typing import Any, Dict, Iterator, List, Optional, Tuple
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
 
 import re
 
+from rows import AccessoryRow, ConsoleRow, GameRow
+
 
 # ==============================
-# MARC primitives (inchangées)
+# Vue indexée
+# ==============================
+
+class MarcIndex:
+    """Notice MARC-JSON indexée : un seul parcours de `fields`, tag -> champs.
+
+    Les sous-zones (tag, code) sont résolues à la première demande puis
+    gardées en cache : seuls les tags réellement consultés sont dépliés
+    (les 952 d'exemplaires, nombreux et volumineux, ne le sont jamais).
+    """
+
+    __slots__ = ("record", "control", "data", "subfields")
+
+    def __init__(self, record: Dict[str, Any]):
+        self.record = record
+        self.control: Dict[str, str] = {}
+        self.data: Dict[str, List[Dict[str, Any]]] = {}
+        self.subfields: Dict[Tuple[str, str], List[Any]] = {}
+        control, data = self.control, self.data
+        for item in record.get("fields", []):
+            for tag, value in item.items():
+                if isinstance(value, dict):
+                    if tag in data:
+                        data[tag].append(value)
+                    else:
+                        data[tag] = [value]
+                elif isinstance(value, str) and tag not in control:
+                    control[tag] = value
+
+    def _values(self, tag: str, code: str) -> List[Any]:
+        key = (tag, code)
+        vals = self.subfields.get(key)
+        if vals is None:
+            vals = [sf[code] for field in self.data.get(tag, ())
+                    for sf in field.get("subfields", []) if code in sf]
+            self.subfields[key] = vals
+        return vals
+
+    def first(self, tag: str, code: str) -> Optional[Any]:
+        vals = self._values(tag, code)
+        return vals[0] if vals else None
+
+    def all(self, tag: str, code: str) -> List[Any]:
+        return list(self._values(tag, code))
+
+
+def index_record(record) -> MarcIndex:
+    """Retourne la vue indexée d'une notice (inchangée si déjà indexée)."""
+    return record if isinstance(record, MarcIndex) else MarcIndex(record)
+
+
+# ==============================
+# MARC primitives
 # ==============================
 
 def iter_fields(record: Dict[str, Any]) -> Iterator[Tuple[str, Any]]:
     """Itère (tag, value) sur chaque champ d'une notice MARC-JSON."""
+    if isinstance(record, MarcIndex):
+        record = record.record
     for item in record.get("fields", []):
         ((tag, value),) = item.items()
         yield tag, value
@@ -38,6 +103,8 @@ def iter_fields(record: Dict[str, Any]) -> Iterator[Tuple[str, Any]]:
 
 def get_control_field(record: Dict[str, Any], tag: str) -> Optional[str]:
     """Retourne la valeur chaîne d'un champ de contrôle (ex: 005, 008)."""
+    if isinstance(record, MarcIndex):
+        return record.control.get(tag)
     for t, v in iter_fields(record):
         if t == tag and isinstance(v, str):
             return v
@@ -46,6 +113,8 @@ def get_control_field(record: Dict[str, Any], tag: str) -> Optional[str]:
 
 def get_data_fields(record: Dict[str, Any], tag: str) -> List[Dict[str, Any]]:
     """Retourne toutes les occurrences d'un champ de données (avec subfields)."""
+    if isinstance(record, MarcIndex):
+        return list(record.data.get(tag, ()))
     out: List[Dict[str, Any]] = []
     for t, v in iter_fields(record):
         if t == tag and isinstance(v, dict):
@@ -55,6 +124,8 @@ def get_data_fields(record: Dict[str, Any], tag: str) -> List[Dict[str, Any]]:
 
 def first_subfield(record: Dict[str, Any], tag: str, code: str) -> Optional[str]:
     """Retourne la première sous-zone code (ex: 245 $a) ou None."""
+    if isinstance(record, MarcIndex):
+        return record.first(tag, code)
     for field in get_data_fields(record, tag):
         for sf in field.get("subfields", []):
             if code in sf:
@@ -64,6 +135,8 @@ def first_subfield(record: Dict[str, Any], tag: str, code: str) -> Optional[str]
 
 def all_subfields(record: Dict[str, Any], tag: str, code: str) -> List[str]:
     """Retourne toutes les valeurs d'une sous-zone donnée (ex: 300 $a multiples)."""
+    if isinstance(record, MarcIndex):
+        return record.all(tag, code)
     vals: List[str] = []
     for field in get_data_fields(record, tag):
         for sf in field.get("subfields", []):
@@ -80,6 +153,17 @@ def record_to_flat_map(record: Dict[str, Any]) -> Dict[str, List[Any]]:
     return flat
 
 
+def get_item_type(record: Dict[str, Any]) -> Optional[str]:
+    """Retourne le type de document Koha (942 $c, ex: JEU, CONSOLE, ACCESSOIRE)."""
+    itype = first_subfield(record, "942", "c")
+    return itype.strip().upper() if itype else None
+
+
+def get_biblio_id(record: Dict[str, Any]) -> Optional[int]:
+    """Retourne le biblionumber Koha (999 $c, sinon $d), ou None."""
+    return _to_int(first_subfield(record, "999", "c") or first_subfield(record, "999", "d"))
+
+
 # ==============================
 # Utilitaires internes
 # ==============================
@@ -98,85 +182,261 @@ def _split_platforms(raw):
     return out
 
 
+def _split_ids(raw):
+    """538$9 : "5001, 5002;5003" -> [5001, 5002, 5003] (valeurs non entières ignorées)."""
+    out = []
+    for part in str(raw).replace(",", ";").split(";"):
+        val = part.strip()
+        if val:
+            try:
+                out.append(int(val))
+            except ValueError:
+                pass
+    return out
+
+
+def _to_int(raw):
+    try:
+        return int(str(raw).strip())
+    except (TypeError, ValueError):
+        return None
+
+
+def _strip_or_none(raw):
+    return raw.strip() if raw else None
+
+
+def _strip_punct(raw):
+    return raw.strip(" /:;., ")
+
+
+def _unique(values):
+    return list(dict.fromkeys(values))
+
+
+def _is_true(raw):
+    return 1 if raw.strip().lower() in ("1", "true", "yes") else 0
+
+
+# ==============================
+# Plans d'extraction déclaratifs
+# ==============================
+#
+# Un plan décrit, par entité, quelle zone alimente quelle colonne :
+#   Col("biblio_id", "999$c", "999$d", convert=_to_int, required=True)
+# - sources : "TAG$code" (sous-zone) ou "TAG" (champ de contrôle), essayées
+#   dans l'ordre, la première valeur non vide l'emporte ;
+# - many    : toutes les valeurs de toutes les sources (ex: 538$9 répétés) ;
+# - split   : découpe chaque valeur en liste (aplatie) ;
+# - convert : appliqué au résultat s'il existe, sinon `default` ;
+# - required: colonne vide -> la notice est rejetée (None).
+# Les valeurs, dans l'ordre des colonnes, sont passées à `build` (ex: le
+# constructeur de rows.GameRow). compile_plan() calcule une seule fois les
+# tags/codes utiles : l'extracteur obtenu fait un seul parcours de `fields`
+# et ignore les autres tags.
+
+_MISSING = object()
+
+
+class Col:
+    __slots__ = ("name", "sources", "many", "split", "convert", "default", "required")
+
+    def __init__(self, name: str, *sources: str, many: bool = False,
+                 split: Optional[Callable[[Any], List[Any]]] = None,
+                 convert: Optional[Callable[[Any], Any]] = None,
+                 default: Any = None, required: bool = False):
+        self.name = name
+        self.sources = tuple(_parse_source(src) for src in sources)
+        self.many = many
+        self.split = split
+        self.convert = convert
+        self.default = default
+        self.required = required
+
+
+def _parse_source(src: str) -> Tuple[str, Optional[str]]:
+    tag, _, code = src.partition("$")
+    return tag, (code or None)
+
+
+def _copy_default(value):
+    return list(value) if isinstance(value, list) else value
+
+
+class ExtractionPlan:
+    """Plan compilé : plan(record) retourne build(*valeurs des colonnes), ou None si rejetée."""
+
+    def __init__(self, columns: List[Col], build: Callable[..., Any]):
+        self.columns = list(columns)
+        self.build = build
+        # tag -> codes utiles (None = champ de contrôle)
+        wanted: Dict[str, set] = {}
+        for col in self.columns:
+            for tag, code in col.sources:
+                wanted.setdefault(tag, set()).add(code)
+        self.wanted = {tag: frozenset(codes) for tag, codes in wanted.items()}
+        self._resolvers = [self._compile_column(col) for col in self.columns]
+
+    @staticmethod
+    def _compile_column(col: Col):
+        sources, split, convert = col.sources, col.split, col.convert
+        default, required = col.default, col.required
+
+        if col.many:
+            def pick(values):
+                out = []
+                for key in sources:
+                    out.extend(values.get(key, ()))
+                return out or None
+        elif len(sources) == 1:
+            (key,) = sources
+            def pick(values):
+                found = values.get(key)
+                return found[0] if found else None
+        else:
+            def pick(values):
+                for key in sources:
+                    found = values.get(key)
+                    if found and found[0]:
+                        return found[0]
+                return None
+
+        def resolve(values):
+            value = pick(values)
+            if value is not None and split is not None:
+                if col.many:
+                    value = [part for item in value for part in split(item)]
+                else:
+                    value = split(value)
+            if value is not None and convert is not None:
+                value = convert(value)
+            if value is None:
+                value = _copy_default(default)
+            if required and not value and value != 0:
+                return _MISSING
+            return value
+
+        return resolve
+
+    def _gather(self, record) -> Dict[Tuple[str, Optional[str]], List[Any]]:
+        """Un seul parcours de `fields`, limité aux tags du plan."""
+        wanted = self.wanted
+        values: Dict[Tuple[str, Optional[str]], List[Any]] = {}
+        if isinstance(record, MarcIndex):
+            for tag, codes in wanted.items():
+                if None in codes and tag in record.control:
+                    values[(tag, None)] = [record.control[tag]]
+                for code in codes:
+                    if code is not None:
+                        values[(tag, code)] = record._values(tag, code)
+            return values
+
+        for item in record.get("fields", ()):
+            for tag, value in item.items():
+                codes = wanted.get(tag)
+                if codes is None:
+                    continue
+                if isinstance(value, dict):
+                    for sf in value.get("subfields", ()):
+                        for code, v in sf.items():
+                            if code in codes:
+                                key = (tag, code)
+                                if key in values:
+                                    values[key].append(v)
+                                else:
+                                    values[key] = [v]
+                elif isinstance(value, str) and None in codes and (tag, None) not in values:
+                    values[(tag, None)] = [value]
+        return values
+
+    def _build(self, values):
+        out = []
+        for resolve in self._resolvers:
+            value = resolve(values)
+            if value is _MISSING:
+                return None
+            out.append(value)
+        return self.build(*out)
+
+    def __call__(self, record):
+        return self._build(self._gather(record))
+
+    def interpret(self, record):
+        """Même résultat sans le parcours compilé : via first_subfield/all_subfields (référence)."""
+        def lookup(tag, code):
+            if code is None:
+                value = get_control_field(record, tag)
+                return [value] if value is not None else []
+            return all_subfields(record, tag, code)
+
+        values = {key: lookup(*key) for col in self.columns for key in col.sources}
+        return self._build({key: vals for key, vals in values.items() if vals})
+
+
+def compile_plan(columns: List[Col], build: Callable[..., Any]) -> ExtractionPlan:
+    return ExtractionPlan(columns, build)
+
+
 # ==============================
 # Mapping accessoire
 # ==============================
 
-def extract_accessoire_row(record):
-    """Retourne {'name','platforms','koha_id'} (platforms = liste de noms)."""
-    titre = first_subfield(record, "245", "a")
-    plateforme_raw = first_subfield(record, "753", "a")
-    koha_id = first_subfield(record, "999", "c") or first_subfield(record, "999", "d")
-    hidden = first_subfield(record, "942", "n")
-
-    plateformes = _split_platforms(plateforme_raw)
-    return {
-        "name": (titre or "").strip(),
-        "platforms": plateformes,
-        "koha_id": koha_id,
-        "hidden" : 1 if hidden and hidden.strip().lower() in ['1', 'true', 'yes'] else 0
-    }
-
-# --- à APPEND dans marc_in_json_helper.py ---
-
-def extract_game_row(record):
-    """Retourne un dict jeu à partir d'une notice MARC-JSON.
-
-    Sortie:
-      {
-        "biblio_id": int,
-        "titre": str,
-        "author": Optional[str],
-        "platforms": List[str],  # 753$a, nettoyé/dédoublonné
-        "timestamp": str,        # ISO (005), fallback now si absent
-      }
-    """
-    # ID Koha (999$c ou 999$d)
-    koha_id = first_subfield(record, "999", "c") or first_subfield(record, "999", "d")
-    if not koha_id:
-        return {}
+ACCESSOIRE_PLAN = compile_plan([
+    Col("name", "245$a", convert=str.strip, default=""),
+    Col("platforms", "753$a", split=_split_platforms, default=[]),
+    Col("koha_id", "999$c", "999$d"),
+    Col("hidden", "942$n", convert=_is_true, default=0),
+], AccessoryRow)
 
-    try:
-        biblio_id = int(str(koha_id).strip())
-    except Exception:
-        return {}
-
-    # Titre (245 $a + $b optionnel)
-    t_a = first_subfield(record, "245", "a") or ""
-    t_b = first_subfield(record, "245", "b") or first_subfield(record, "245", "9") or ""
-    raw_title = f"{t_a} {t_b}".strip(" /:;., ").strip()
-    if not raw_title:
-        return {}
-
-    # Auteur (110 corporate, sinon 100 perso)
-    author = first_subfield(record, "110", "a") or first_subfield(record, "100", "a")
-
-    # Plateformes (753 $a, éventuellement multiples)
-    plateformes_raw = first_subfield(record, "753", "a")
-    platforms = _split_platforms(plateformes_raw)
-
-    #accessoires requis
-    raw_accessories = all_subfields(record, "538", "9")
-    required_accessories = []
-    for acc in raw_accessories:
-        for part in str(acc).replace(",", ";").split(";"):
-            val = part.strip()
-            if val:
-                try :
-                    required_accessories.append(int(val))
-                except Exception:
-                    pass
-
-    seen = set()
-    required_accessories = [x for x in required_accessories if not (x in seen or seen.add(x))]
-
-    # Timestamp (005)
-    ts = get_control_field(record, "005") or ""
-    return {
-        "biblio_id": biblio_id,
-        "titre": raw_title,
-        "author": author.strip() if author else None,
-        "platforms": platforms,
-        "required_accessories": list(dict.fromkeys(required_accessories)),
-        "timestamp": ts
-    }
+def extract_accessoire_row(record) -> AccessoryRow:
+    """Retourne un AccessoryRow (name, platforms = liste de noms, koha_id, hidden)."""
+    return ACCESSOIRE_PLAN(record)
+
+# ==============================
+# Mapping console
+# ==============================
+
+CONSOLE_PLAN = compile_plan([
+    Col("biblio_id", "999$c", "999$d", convert=_to_int),
+    Col("title", "245$a", convert=_strip_punct, default=""),
+    Col("subtitle", "245$b", convert=_strip_punct, default=""),
+    Col("timestamp", "005", default=""),
+], ConsoleRow)
+
+def extract_console_row(record) -> ConsoleRow:
+    """Retourne un ConsoleRow (biblio_id, title, subtitle, timestamp = 005 brut)."""
+    return CONSOLE_PLAN(record)
+
+# ==============================
+# Mapping jeu
+# ==============================
+
+def _game_row(biblio_id, title_a, title_b, author, platforms, required_accessories, timestamp):
+    # Titre = 245 $a + ($b, sinon $9)
+    title = f"{title_a} {title_b}".strip(" /:;., ").strip()
+    if not title:
+        return None
+    return GameRow(biblio_id, title, author, platforms, required_accessories, timestamp)
+
+GAME_PLAN = compile_plan([
+    Col("biblio_id", "999$c", "999$d", convert=_to_int, required=True),
+    Col("_title_a", "245$a", default=""),
+    Col("_title_b", "245$b", "245$9", default=""),
+    Col("author", "110$a", "100$a", convert=_strip_or_none),
+    Col("platforms", "753$a", split=_split_platforms, default=[]),
+    Col("required_accessories", "538$9", many=True, split=_split_ids, convert=_unique, default=[]),
+    Col("timestamp", "005", default=""),
+], _game_row)
+
+def extract_game_row(record) -> Optional[GameRow]:
+    """Retourne un GameRow à partir d'une notice MARC-JSON, ou None si inutilisable.
+
+    Champs remplis:
+      biblio_id            : int (999$c, sinon 999$d)
+      titre                : str (245$a + $b, sinon $9)
+      author               : Optional[str] (110$a, sinon 100$a)
+      platforms            : List[str]  # 753$a, nettoyé/dédoublonné
+      required_accessories : List[int]  # 538$9
+      timestamp            : str        # 005 brut ("" si absent)
+    """
+    return GAME_PLAN(record)
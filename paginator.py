@@ -0,0 +1,235 @@
+# -*- coding: utf-8 -*-
+"""
+Pagination Koha avec préchargement concurrent des pages.
+
+iter_pages() garde plusieurs requêtes de pages en vol pendant que les
+pages précédentes sont consommées, et rend toujours les pages dans
+l'ordre :
+- si Koha fournit un lien `next`, on le suit (une page d'avance : la
+  suivante se télécharge pendant que la courante est traitée) ;
+- sinon on lance `_page` = n+1, n+2, ... jusqu'à `concurrency` en vol.
+
+En mode `_page`, la taille des pages peut être pilotée par un PageSizer :
+il mesure la durée et le poids de chaque page, grossit ou réduit
+`_per_page` pour viser une durée cible, et recule après un timeout ou
+une erreur 5xx (la plage en échec est redemandée en pages plus petites).
+Les tailles restent sur une échelle min_size * 2^k : chaque page démarre
+à un décalage multiple de sa taille, donc `_page` reste exact quand la
+taille change en cours de route.
+"""
+
+from __future__ import annotations
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Iterator, List, Optional, Tuple, Union
+
+import threading
+import time
+
+import requests
+
+DEFAULT_CONCURRENCY = 4
+
+DEFAULT_TARGET_SECONDS = 5.0
+DEFAULT_MIN_PAGE_SIZE = 125
+DEFAULT_MAX_PAGE_SIZE = 8000
+DEFAULT_MAX_PAGE_BYTES = 32 * 1024 * 1024
+
+# fetch(page=..., page_size=..., url=...) -> (records, next_url) ou (records, next_url, nbytes)
+FetchPage = Callable[..., Tuple[Any, ...]]
+
+
+def is_retryable(exc: BaseException) -> bool:
+    """Timeout, connexion coupée ou 5xx : la page peut être redemandée plus petite."""
+    if isinstance(exc, (requests.Timeout, requests.ConnectionError)):
+        return True
+    if isinstance(exc, requests.HTTPError) and exc.response is not None:
+        return exc.response.status_code >= 500
+    return False
+
+
+class PageSizer:
+    """Contrôleur de taille de page (`_per_page`) partagé par les requêtes en vol."""
+
+    CEILING_PAGES = 16
+
+    def __init__(self, initial: int,
+                 min_size: int = DEFAULT_MIN_PAGE_SIZE,
+                 max_size: int = DEFAULT_MAX_PAGE_SIZE,
+                 target_seconds: float = DEFAULT_TARGET_SECONDS,
+                 max_bytes: int = DEFAULT_MAX_PAGE_BYTES):
+        self.min_size = max(1, int(min_size))
+        self.max_size = self._ladder(max(int(max_size), self.min_size))
+        self.size = min(self._ladder(max(int(initial), self.min_size)), self.max_size)
+        self.target_seconds = float(target_seconds)
+        self.max_bytes = int(max_bytes)
+        # Moyennes mobiles exponentielles par notice
+        self._sec_per_record: Optional[float] = None
+        self._bytes_per_record: Optional[float] = None
+        # Après un recul, plafond temporaire : levé après CEILING_PAGES pages sans erreur
+        self._ceiling: Optional[int] = None
+        self._clean_pages = 0
+        self._lock = threading.Lock()
+        self.stats = {"pages": 0, "records": 0, "seconds": 0.0, "bytes": 0,
+                      "grown": 0, "shrunk": 0, "backoffs": 0}
+
+    @classmethod
+    def fixed(cls, page_size: int) -> "PageSizer":
+        """Taille constante (aucune adaptation, aucun réessai)."""
+        return cls(page_size, min_size=page_size, max_size=page_size)
+
+    def _ladder(self, size: int) -> int:
+        """Plus grande taille min_size * 2^k <= size."""
+        step = self.min_size
+        while step * 2 <= size:
+            step *= 2
+        return step
+
+    def size_at(self, offset: int) -> int:
+        """Taille à utiliser pour une page commençant à `offset` (offset % taille == 0)."""
+        with self._lock:
+            size = self.size
+        while size > self.min_size and offset % size:
+            size //= 2
+        return size
+
+    def observe(self, requested: int, count: int, seconds: float, nbytes: Optional[int] = None):
+        """Enregistre une page reçue et ajuste la taille visée."""
+        with self._lock:
+            s = self.stats
+            s["pages"] += 1
+            s["records"] += count
+            s["seconds"] += seconds
+            s["bytes"] += nbytes or 0
+            if count <= 0 or self.min_size == self.max_size:
+                return
+
+            def ewma(old, value):
+                return value if old is None else 0.7 * old + 0.3 * value
+
+            self._sec_per_record = ewma(self._sec_per_record, seconds / count)
+            if nbytes:
+                self._bytes_per_record = ewma(self._bytes_per_record, nbytes / count)
+
+            ideal = self.target_seconds / max(self._sec_per_record, 1e-9)
+            if self._bytes_per_record:
+                ideal = min(ideal, self.max_bytes / self._bytes_per_record)
+
+            self._clean_pages += 1
+            if self._ceiling is not None and self._clean_pages >= self.CEILING_PAGES:
+                self._ceiling = None
+            limit = self._ceiling or self.max_size
+
+            if ideal >= self.size * 2 and count >= requested and self.size < limit:
+                self.size *= 2
+                s["grown"] += 1
+                return
+            if ideal <= self.size / 2 and self.size > self.min_size:
+                self.size //= 2
+                s["shrunk"] += 1
+
+    def backoff(self, failed_size: int) -> bool:
+        """Timeout / 5xx sur une page de `failed_size` : réduit. False si déjà au minimum."""
+        with self._lock:
+            if failed_size <= self.min_size:
+                return False
+            self.size = min(self.size, max(failed_size // 2, self.min_size))
+            self._ceiling = self.size
+            self._clean_pages = 0
+            self.stats["backoffs"] += 1
+            return True
+
+    def summary(self) -> str:
+        s = self.stats
+        rate = s["records"] / s["seconds"] if s["seconds"] else 0.0
+        return (f"Pagination adaptative: {s['pages']} pages, taille finale {self.size} "
+                f"({s['grown']} hausses / {s['shrunk']} baisses / {s['backoffs']} reculs), "
+                f"{rate:.0f} notices/s, {s['bytes'] / 1024 / 1024:.1f} Mo")
+
+
+def _timed(fetch: FetchPage, **kwargs) -> Tuple[List[Any], Optional[str], Optional[int], float]:
+    started = time.monotonic()
+    result = fetch(**kwargs)
+    elapsed = time.monotonic() - started
+    records, next_url = result[0], result[1]
+    nbytes = result[2] if len(result) > 2 else None
+    return records, next_url, nbytes, elapsed
+
+
+def iter_pages(fetch: FetchPage, page_size: Union[int, PageSizer],
+               concurrency: int = DEFAULT_CONCURRENCY,
+               start_page: int = 1, start_offset: int = 0) -> Iterator[Tuple[int, List[Any]]]:
+    """
+    Génère (numéro de page, notices) dans l'ordre, avec `concurrency` requêtes en vol.
+
+    Les numéros rendus sont séquentiels à partir de `start_page` ; ils ne
+    correspondent au `_page` Koha que si la taille est constante.
+    `start_offset` : nombre de notices déjà lues (reprise).
+    """
+    sizer = page_size if isinstance(page_size, PageSizer) else PageSizer.fixed(page_size)
+    concurrency = max(1, int(concurrency))
+
+    def fetch_at(offset: int, size: int):
+        return _timed(fetch, page=offset // size + 1, page_size=size)
+
+    page = start_page
+    offset = start_offset
+    size = sizer.size_at(offset)
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        # Première page hors du pool : elle décide du mode (`next` ou `_page`)
+        while True:
+            try:
+                records, next_url, nbytes, elapsed = fetch_at(offset, size)
+                break
+            except Exception as e:
+                if not (is_retryable(e) and sizer.backoff(size)):
+                    raise
+                size = sizer.size_at(offset)
+
+        if next_url:
+            # Mode `next` : l'URL suivante n'est connue qu'une fois la page lue
+            while True:
+                ahead = pool.submit(_timed, fetch, url=next_url) if next_url else None
+                yield page, records
+                if ahead is None:
+                    return
+                records, next_url, _, _ = ahead.result()
+                page += 1
+                if not records:
+                    yield page, records
+                    return
+
+        sizer.observe(size, len(records), elapsed, nbytes)
+        yield page, records
+        if not records or len(records) < size:
+            return
+        offset += size
+
+        # Mode `_page` : éventail de pages, chacune (décalage, taille)
+        in_flight = deque()
+        try:
+            while True:
+                while len(in_flight) < concurrency:
+                    size = sizer.size_at(offset)
+                    in_flight.append((offset, size, pool.submit(fetch_at, offset, size)))
+                    offset += size
+                start, size, future = in_flight.popleft()
+                try:
+                    records, _, nbytes, elapsed = future.result()
+                except Exception as e:
+                    if not (is_retryable(e) and sizer.backoff(size)):
+                        raise
+                    # Redemande la même plage en pages plus petites, en tête de file
+                    half = size // 2
+                    for sub in (start + half, start):
+                        in_flight.appendleft((sub, half, pool.submit(fetch_at, sub, half)))
+                    continue
+                sizer.observe(size, len(records), elapsed, nbytes)
+                page += 1
+                yield page, records
+                if not records or len(records) < size:
+                    return
+        finally:
+            for _, _, future in in_flight:
+                future.cancel()
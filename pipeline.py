@@ -0,0 +1,220 @@
+# -*- coding: utf-8 -*-
+"""
+Pipeline en flux à files bornées : source -> étape -> étape -> ...
+
+Chaque étape tourne dans son propre thread et reçoit les éléments de
+l'étape précédente par une queue.Queue(maxsize) : une étape lente bloque
+les précédentes (contre-pression) au lieu de laisser la mémoire grossir.
+Le réseau (fetch Koha), l'extraction et les upserts MySQL se recouvrent :
+la durée totale tend vers celle de l'étape la plus lente, pas vers la somme.
+
+Une étape est une fonction item -> itérable de sorties (0, 1 ou plusieurs),
+plus un `flush()` optionnel appelé en fin de flux (ex: dernier lot).
+Avec workers > 1, plusieurs threads consomment la même file (ex: upserts
+sur des connexions différentes du pool MySQL) ; `fn` doit alors être
+thread-safe et l'ordre des sorties n'est plus garanti.
+"""
+
+from __future__ import annotations
+from typing import Any, Callable, Iterable, List, Optional
+
+import queue
+import threading
+import time
+
+DEFAULT_QUEUE_SIZE = 1000
+
+_END = object()
+
+
+class PipelineAborted(Exception):
+    pass
+
+
+class Stage:
+    def __init__(self, name: str, fn: Callable[[Any], Optional[Iterable[Any]]],
+                 flush: Optional[Callable[[], Optional[Iterable[Any]]]] = None, unit: str = "elements",
+                 workers: int = 1):
+        self.name = name
+        self.fn = fn
+        self.flush = flush
+        self.unit = unit
+        self.workers = max(1, int(workers))
+        self.stats = {"in": 0, "out": 0, "busy": 0.0, "blocked": 0.0}
+        self._lock = threading.Lock()
+        self._running = self.workers
+
+    def count(self, key: str, value=1):
+        with self._lock:
+            self.stats[key] += value
+
+
+def batch_stage(name: str, size: int, write: Callable[[List[Any]], Any], unit: str = "elements",
+                workers: int = 1) -> Stage:
+    """
+    Étape terminale qui regroupe les éléments par lots de `size` et appelle write(lot).
+    Avec workers > 1, plusieurs lots peuvent s'écrire en même temps.
+    """
+    batch: List[Any] = []
+    lock = threading.Lock()
+
+    def add(item):
+        with lock:
+            batch.append(item)
+            if len(batch) < size:
+                return
+            full = batch[:]
+            batch.clear()
+        write(full)
+
+    def flush():
+        with lock:
+            rest = batch[:]
+            batch.clear()
+        if rest:
+            write(rest)
+
+    return Stage(name, add, flush, unit=unit, workers=workers)
+
+
+class Pipeline:
+    def __init__(self, name: str, queue_size: int = DEFAULT_QUEUE_SIZE):
+        self.name = name
+        self.queue_size = max(1, int(queue_size))
+        self._abort = threading.Event()
+        self._errors: List[BaseException] = []
+        self.elapsed = 0.0
+
+    # ---------- files ----------
+
+    def _put(self, q: queue.Queue, item, stage: Stage):
+        started = time.perf_counter()
+        while True:
+            if self._abort.is_set():
+                raise PipelineAborted()
+            try:
+                q.put(item, timeout=0.2)
+                break
+            except queue.Full:
+                continue
+        stage.count("blocked", time.perf_counter() - started)
+
+    def _get(self, q: queue.Queue):
+        while True:
+            if self._abort.is_set():
+                raise PipelineAborted()
+            try:
+                return q.get(timeout=0.2)
+            except queue.Empty:
+                continue
+
+    # ---------- threads ----------
+
+    def _emit(self, outputs, out_q, stage):
+        if outputs is None:
+            return
+        for out in outputs:
+            stage.count("out")
+            if out_q is not None:
+                self._put(out_q, out, stage)
+
+    def _run_source(self, source: Stage, items: Iterable[Any], out_q: queue.Queue):
+        it = iter(items)
+        try:
+            while True:
+                started = time.perf_counter()
+                try:
+                    item = next(it)
+                except StopIteration:
+                    break
+                finally:
+                    source.stats["busy"] += time.perf_counter() - started
+                source.stats["out"] += 1
+                self._put(out_q, item, source)
+            self._put(out_q, _END, source)
+        except PipelineAborted:
+            pass
+        except BaseException as e:
+            self._fail(e)
+        finally:
+            close = getattr(it, "close", None)
+            if close is not None:
+                close()  # générateur abandonné : libère ses requêtes en vol
+
+    def _run_stage(self, stage: Stage, in_q: queue.Queue, out_q: Optional[queue.Queue]):
+        try:
+            while True:
+                item = self._get(in_q)
+                if item is _END:
+                    in_q.put(_END)  # pour les autres threads de l'étape
+                    break
+                stage.count("in")
+                started = time.perf_counter()
+                outputs = stage.fn(item)
+                outputs = list(outputs) if outputs is not None else None
+                stage.count("busy", time.perf_counter() - started)
+                self._emit(outputs, out_q, stage)
+            with stage._lock:
+                stage._running -= 1
+                last = stage._running == 0
+            if not last:
+                return
+            # Dernier thread de l'étape : flush puis fin de flux vers l'aval
+            if stage.flush is not None:
+                started = time.perf_counter()
+                outputs = stage.flush()
+                outputs = list(outputs) if outputs is not None else None
+                stage.count("busy", time.perf_counter() - started)
+                self._emit(outputs, out_q, stage)
+            if out_q is not None:
+                self._put(out_q, _END, stage)
+        except PipelineAborted:
+            pass
+        except BaseException as e:
+            self._fail(e)
+
+    def _fail(self, e: BaseException):
+        self._errors.append(e)
+        self._abort.set()
+
+    def run(self, source_name: str, items: Iterable[Any], *stages: Stage, unit: str = "elements"):
+        """Exécute le pipeline jusqu'au bout ; relance la première erreur d'une étape."""
+        source = Stage(source_name, None, unit=unit)
+        self.stages = [source, *stages]
+        queues = [queue.Queue(self.queue_size) for _ in stages]
+        threads = [threading.Thread(target=self._run_source, args=(source, items, queues[0]),
+                                    name=f"{self.name}:{source_name}", daemon=True)]
+        for i, stage in enumerate(stages):
+            out_q = queues[i + 1] if i + 1 < len(queues) else None
+            for n in range(stage.workers):
+                threads.append(threading.Thread(target=self._run_stage, args=(stage, queues[i], out_q),
+                                                name=f"{self.name}:{stage.name}:{n}", daemon=True))
+
+        started = time.perf_counter()
+        for t in threads:
+            t.start()
+        try:
+            for t in threads:
+                while t.is_alive():
+                    t.join(0.5)
+        except KeyboardInterrupt:
+            self._abort.set()
+            for t in threads:
+                t.join()
+            raise
+        self.elapsed = time.perf_counter() - started
+        if self._errors:
+            raise self._errors[0]
+
+    def print_stats(self):
+        print(f"\n{'='*60}")
+        print(f"PIPELINE {self.name.upper()}")
+        print(f"{'='*60}")
+        for stage in self.stages:
+            s = stage.stats
+            count = s["out"] if stage.fn is None else s["in"]
+            rate = count / s["busy"] * stage.workers if s["busy"] else 0.0
+            name = stage.name if stage.workers == 1 else f"{stage.name} x{stage.workers}"
+            print(f"{name:<10}: {count:>7} {stage.unit:<9} actif {s['busy']:6.1f} s "
+                  f"({rate:>8.0f}/s), bloque en aval {s['blocked']:6.1f} s")
+        print(f"Duree totale : {self.elapsed:.1f} s")
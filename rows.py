@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+"""
+Lignes typées produites par l'extraction MARC et consommées par db.insert_*.
+
+Classes à __slots__ : pas de __dict__ par instance, donc nettement moins
+de mémoire et d'allocations qu'un dict par notice (voir `python bench.py rows`).
+Le pickle (pool d'extraction) se fait sous forme de tuple positionnel.
+"""
+
+from __future__ import annotations
+from typing import Any, Dict, List, Optional, Tuple
+
+
+class _Row:
+    __slots__ = ()
+
+    def astuple(self) -> Tuple[Any, ...]:
+        return tuple(getattr(self, name) for name in self.__slots__)
+
+    def asdict(self) -> Dict[str, Any]:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __reduce__(self):
+        return self.__class__, self.astuple()
+
+    def __eq__(self, other):
+        if other.__class__ is not self.__class__:
+            return NotImplemented
+        return self.astuple() == other.astuple()
+
+    def __repr__(self):
+        values = ", ".join(f"{name}={getattr(self, name)!r}" for name in self.__slots__)
+        return f"{self.__class__.__name__}({values})"
+
+
+class GameRow(_Row):
+    """
+    Jeu : champs MARC, puis colonnes résolues (extraction.resolve_game).
+    timestamp : 005 brut à l'extraction, DATETIME MySQL une fois converti.
+    """
+
+    __slots__ = ("biblio_id", "titre", "author", "platforms", "required_accessories", "timestamp",
+                 "platform", "platform_id", "console_koha_id", "console_type_id", "via_ludov")
+
+    def __init__(self, biblio_id: int, titre: str, author: Optional[str], platforms: List[str],
+                 required_accessories: List[int], timestamp: str,
+                 platform: Optional[str] = None, platform_id: Optional[int] = None,
+                 console_koha_id: Optional[int] = None, console_type_id: Optional[int] = None,
+                 via_ludov: Optional[bool] = None):
+        self.biblio_id = biblio_id
+        self.titre = titre
+        self.author = author
+        self.platforms = platforms
+        self.required_accessories = required_accessories
+        self.timestamp = timestamp
+        self.platform = platform
+        self.platform_id = platform_id
+        self.console_koha_id = console_koha_id
+        self.console_type_id = console_type_id
+        self.via_ludov = via_ludov
+
+
+class AccessoryRow(_Row):
+    __slots__ = ("name", "platforms", "koha_id", "hidden")
+
+    def __init__(self, name: str, platforms: List[str], koha_id: Any, hidden: int):
+        self.name = name
+        self.platforms = platforms
+        self.koha_id = koha_id
+        self.hidden = hidden
+
+
+class ConsoleRow(_Row):
+    __slots__ = ("biblio_id", "title", "subtitle", "timestamp")
+
+    def __init__(self, biblio_id: Optional[int], title: str, subtitle: str, timestamp: str):
+        self.biblio_id = biblio_id
+        self.title = title
+        self.subtitle = subtitle
+        self.timestamp = timestamp
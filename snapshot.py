@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+"""
+Snapshot compressé et versionné d'un run de seed.
+
+Format : fichier gzip de lignes JSON.
+- ligne 1 : en-tête {"format", "version", "app_version", "created_at"}
+- puis une ligne par entrée :
+    {"t": "platform_mapping", "data": {...}}
+    {"t": "record", "item_type": "JEU", "record": {...MARC-in-JSON...}}
+    {"t": "cover", "biblio_id": 123, "picture": "https://..."}
+
+Écriture et lecture se font en flux : la mémoire ne dépend pas de la
+taille du catalogue.
+"""
+
+from __future__ import annotations
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, Iterator, Optional, Tuple
+
+import gzip
+import json
+import os
+
+SNAPSHOT_FORMAT = "ludov-seeder-snapshot"
+SNAPSHOT_VERSION = 1
+
+
+class SnapshotError(Exception):
+    pass
+
+
+class SnapshotWriter:
+    """Écrit un snapshot dans un fichier temporaire, renommé à close()."""
+
+    def __init__(self, path: str, app_version: str):
+        self.path = path
+        self._tmp = path + ".tmp"
+        self._fh = gzip.open(self._tmp, "wt", encoding="utf-8")
+        self.counts = {"record": 0, "cover": 0}
+        self._write({
+            "format": SNAPSHOT_FORMAT,
+            "version": SNAPSHOT_VERSION,
+            "app_version": app_version,
+            "created_at": datetime.now(timezone.utc).isoformat(),
+        })
+
+    def _write(self, entry: Dict[str, Any]):
+        self._fh.write(json.dumps(entry, ensure_ascii=False, separators=(",", ":")))
+        self._fh.write("\n")
+
+    def set_platform_mapping(self, mapping: Dict[str, Any]):
+        self._write({"t": "platform_mapping", "data": mapping})
+
+    def add_record(self, item_type: str, record: Dict[str, Any]):
+        self._write({"t": "record", "item_type": item_type, "record": record})
+        self.counts["record"] += 1
+
+    def add_covers(self, covers: Iterable[Tuple[int, str]]):
+        for biblio_id, picture in covers:
+            self._write({"t": "cover", "biblio_id": biblio_id, "picture": picture})
+            self.counts["cover"] += 1
+
+    def close(self):
+        if self._fh is None:
+            return
+        self._fh.close()
+        self._fh = None
+        os.replace(self._tmp, self.path)
+        print(f">>> Snapshot ecrit : {self.path} "
+              f"({self.counts['record']} notices, {self.counts['cover']} covers)")
+
+    def abort(self):
+        """Abandonne un snapshot incomplet (aucun fichier final n'est produit)."""
+        if self._fh is None:
+            return
+        self._fh.close()
+        self._fh = None
+        try:
+            os.remove(self._tmp)
+        except OSError:
+            pass
+
+
+class SnapshotReader:
+    """Relit un snapshot ; chaque accesseur reparcourt le fichier en flux."""
+
+    def __init__(self, path: str):
+        self.path = path
+        with gzip.open(path, "rt", encoding="utf-8") as fh:
+            try:
+                self.header = json.loads(fh.readline())
+            except ValueError:
+                raise SnapshotError(f"{path}: en-tete de snapshot illisible")
+        if self.header.get("format") != SNAPSHOT_FORMAT:
+            raise SnapshotError(f"{path}: ce fichier n'est pas un snapshot LUDOV")
+        if self.header.get("version") != SNAPSHOT_VERSION:
+            raise SnapshotError(f"{path}: version de snapshot {self.header.get('version')} "
+                                f"non supportee (attendu {SNAPSHOT_VERSION})")
+
+    def _entries(self, kind: str) -> Iterator[Dict[str, Any]]:
+        with gzip.open(self.path, "rt", encoding="utf-8") as fh:
+            fh.readline()
+            for line in fh:
+                entry = json.loads(line)
+                if entry.get("t") == kind:
+                    yield entry
+
+    def platform_mapping(self) -> Dict[str, Any]:
+        for entry in self._entries("platform_mapping"):
+            return entry.get("data") or {}
+        return {}
+
+    def records(self, item_type: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        for entry in self._entries("record"):
+            if item_type is None or entry.get("item_type") == item_type:
+                yield entry["record"]
+
+    def covers(self) -> Iterator[Tuple[int, str]]:
+        for entry in self._entries("cover"):
+            yield entry["biblio_id"], entry["picture"]
@@ -0,0 +1,28 @@
+# -*- coding: utf-8 -*-
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from json_stream import iter_json_records
+
+
+def test_nombre_coupe_entre_deux_chunks():
+    assert list(iter_json_records([b"[12.", b"5, 3]"])) == [12.5, 3]
+    assert list(iter_json_records([b"[1e", b"3, 2E+", b"2, -", b"4]"])) == [1000.0, 200.0, -4]
+    assert list(iter_json_records([b"[12", b"3]"])) == [123]
+
+
+def test_toutes_les_coupures():
+    doc = [12.5, -3.25e-2, 7, True, None, "a.b", {"x": [1.25, 2]}]
+    data = json.dumps(doc).encode()
+    for cut in range(1, len(data)):
+        assert list(iter_json_records([data[:cut], data[cut:]])) == doc
+
+
+def test_separateur_invalide():
+    with pytest.raises(ValueError):
+        list(iter_json_records([b"[12x]"]))